@@ -0,0 +1,4 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
@@ -0,0 +1,175 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, Tuple
+from src.calculators.basin_extractor import BasinExtractor
+from src.calculators.flood_arrival_calculator import FloodArrivalCalculator
+from src.calculators.rational_method_calculator import RationalMethodCalculator
+from src.models.metadata import GISMetadata
+from src.models.sparse_basin import SparseBasin
+
+@dataclass
+class DenseBasin:
+    """
+    外接矩形の配列で表した流域のデータ（流域セルのみの形式以前の形式、比較用）
+    配列は[x, y]（yは南から北）で、流域外のセルは metadata.nodata
+    """
+    metadata: GISMetadata
+    basin: np.ndarray
+    distance: np.ndarray
+    elevation: np.ndarray
+    landuse: np.ndarray
+    # 元ラスタ上の範囲（行は北から、0始まり）(imin, imax, jmin, jmax)
+    bounds: Tuple[int, int, int, int]
+
+def extract_dense(extractor: BasinExtractor, row: int, col: int) -> DenseBasin:
+    """
+    指定セルを流域末端として上流域を抽出し、外接矩形の配列で返す（extract_sparseとの比較用）
+    
+    Parameters:
+    -----------
+    extractor : BasinExtractor
+        流域抽出クラス
+    row : int
+        流域末端セルの行番号（北から、0始まり）
+    col : int
+        流域末端セルの列番号（西から、0始まり）
+    
+    Returns:
+    --------
+    DenseBasin
+        流域の外接矩形で切り出した流域・流下距離・標高・土地利用データ
+    """
+    rows, cols, dists = extractor.find_upstream_cells(row, col)
+    imin, imax, jmin, jmax = extractor._bounds(rows, cols)
+    window = (slice(imin, imax + 1), slice(jmin, jmax + 1))
+    local = (rows - imin, cols - jmin)
+    shape = (imax - imin + 1, jmax - jmin + 1)
+    
+    def to_grid(values: np.ndarray) -> np.ndarray:
+        raster = np.full(shape, extractor.NODATA)
+        raster[local] = values
+        return extractor._to_grid(raster)
+    
+    def window_values(raster, filepath) -> np.ndarray:
+        data = raster[window] if raster is not None else extractor._read_window(filepath, window)
+        return data[local] if data is not None else extractor.NODATA
+    
+    return DenseBasin(
+        metadata=extractor._window_metadata(imin, imax, jmin, jmax),
+        basin=to_grid(1),
+        distance=to_grid(dists),
+        elevation=to_grid(window_values(extractor.dem_raster, extractor.dem_file)),
+        landuse=to_grid(window_values(extractor.landuse_raster, extractor.landuse_file)),
+        bounds=(imin, imax, jmin, jmax)
+    )
+
+def legacy_arrival_time(calculator: FloodArrivalCalculator) -> np.ndarray:
+    """
+    配列演算化以前の洪水到達時間の計算（FloodArrivalCalculator.calculate_arrival_timeとの比較用）
+
+    Parameters:
+    -----------
+    calculator : FloodArrivalCalculator
+        set_data済みの計算クラス
+
+    Returns:
+    --------
+    np.ndarray
+        洪水到達時間の配列
+    """
+    distance = calculator.distance_data
+    elevation = calculator.elevation_data
+    nodata = calculator.gis_reader.metadata.nodata
+    arrival_time = np.full_like(distance, nodata)
+
+    valid_mask = (distance != nodata) & (elevation != nodata)
+
+    valid_distances = distance > 0
+    slopes = np.zeros_like(distance)
+    slopes[valid_distances] = np.abs(elevation[valid_distances] / distance[valid_distances])
+
+    velocities = np.where(slopes >= 0.01, 3.5, np.where(slopes >= 0.005, 3.0, 2.1))
+
+    arrival_time[valid_mask] = distance[valid_mask] / velocities[valid_mask]
+    return arrival_time
+
+def legacy_calculate_flow(calculator: RationalMethodCalculator, rainfall_data: Dict[float, float],
+                          dtq: float) -> Dict[float, float]:
+    """
+    セル・時刻ごとのループによる流量計算（畳み込み化以前のcalculate_flow、比較用）
+
+    Parameters:
+    -----------
+    calculator : RationalMethodCalculator
+        set_data済みの計算クラス（cell_area_methodは'mean'）
+    rainfall_data : Dict[float, float]
+        時刻と雨量のディクショナリ {時刻(s): 雨量(mm/h)}
+    dtq : float
+        出力する時間間隔(s)
+
+    Returns:
+    --------
+    Dict[float, float]
+        時刻と流量のディクショナリ {時刻(s): 流量(m3/s)}
+    """
+    arrival_time = calculator.arrival_time
+    landuse = calculator.landuse
+    nodata = calculator.gis_reader.metadata.nodata
+
+    times = np.array(sorted(rainfall_data.keys()))
+    max_arrival_time = np.max(arrival_time[arrival_time != nodata])
+    output_times = np.arange(0, max(times) + max_arrival_time + dtq, dtq)
+    flow_results = {t: 0.0 for t in output_times}
+
+    valid_mask = (arrival_time != nodata) & (landuse != nodata)
+    for i in range(arrival_time.shape[0]):
+        for j in range(arrival_time.shape[1]):
+            if not valid_mask[i, j]:
+                continue
+            arrival_t = arrival_time[i, j]
+            f = calculator.get_runoff_coefficient(int(landuse[i, j]))
+            for t, r in rainfall_data.items():
+                output_t = dtq * np.floor((t + arrival_t) / dtq)
+                if output_t in flow_results:
+                    flow_results[output_t] += (1/3.6) * f * r * (calculator.cell_area / 1000000)
+
+    return flow_results
+
+def walk_path_arrival_time(calculator: FloodArrivalCalculator, basin: SparseBasin) -> np.ndarray:
+    """
+    セルごとに流路を流域末端までたどる到達時間の計算（travel_time_method='path'との比較用）
+
+    Parameters:
+    -----------
+    calculator : FloodArrivalCalculator
+        流速の計算に使用する計算クラス
+    basin : SparseBasin
+        BasinExtractor.extract_sparseで抽出した流域データ
+
+    Returns:
+    --------
+    np.ndarray
+        流域セルごとの洪水到達時間（標高が欠測のセルは basin.metadata.nodata）
+    """
+    nodata = basin.metadata.nodata
+    arrival_time = np.full(basin.n_cells, nodata)
+    for cell in range(basin.n_cells):
+        if basin.elevation[cell] == nodata:
+            continue
+        total = 0.0
+        current = cell
+        while basin.downstream[current] >= 0:
+            parent = basin.downstream[current]
+            length = basin.distance[current] - basin.distance[parent]
+            slope = 0.0
+            if length > 0 and basin.elevation[current] != nodata and basin.elevation[parent] != nodata:
+                slope = abs(basin.elevation[current] - basin.elevation[parent]) / length
+            total += length / calculator.calculate_velocity(slope)
+            current = parent
+        arrival_time[cell] = total
+    return arrival_time
@@ -0,0 +1,253 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+"""
+合成データによるSRFの処理段階ごとのベンチマーク
+
+    python -m benchmarks.run_benchmarks --rows 1000 --cols 1200 --points 20 --output bench.json
+
+処理段階（read_gis_file, 流域抽出, calculate_arrival_time, calculate_flow, merge_flow_results）ごとの
+実行時間・ピークメモリと、従来の計算方法（上流域の逐次探索、セルごとのループ）との数値の一致を出力する
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+from src.main import read_analysis_points, merge_flow_results
+from src.models.grid_geometry import GridGeometry
+from src.file_io.gis_reader import GISDataReader
+from src.file_io.file_utils import read_rainfall_data
+from src.calculators.basin_extractor import BasinExtractor
+from src.calculators.flow_network import FlowNetworkIndex
+from src.calculators.flood_arrival_calculator import FloodArrivalCalculator
+from src.calculators.rational_method_calculator import RationalMethodCalculator
+from src.utils.geo_utils import find_nearest_point_data
+from src.utils.profiling import StageProfiler
+from .synthetic import TERRAINS, write_synthetic_case
+from .legacy import extract_dense, legacy_arrival_time, legacy_calculate_flow, walk_path_arrival_time
+
+def _max_abs_diff(a: np.ndarray, b: np.ndarray) -> float:
+    """形状が異なる場合はinf"""
+    if a.shape != b.shape:
+        return float('inf')
+    return float(np.max(np.abs(a - b))) if a.size else 0.0
+
+def run_benchmark(args: argparse.Namespace, workdir: str) -> dict:
+    """
+    合成データを作成して全段階を計測する
+
+    Returns:
+    --------
+    dict
+        計測結果（条件・段階ごとの計測値・一致確認の結果）
+    """
+    profiler = StageProfiler(enabled=True, memory=not args.no_memory)
+    with profiler.stage('generate'):
+        paths = write_synthetic_case(
+            workdir, args.rows, args.cols, args.points, args.hours,
+            threshold=args.threshold, dtq=args.dtq, seed=args.seed, terrain=args.terrain
+        )
+
+    # メモリの計測は合成データの作成後から開始する
+    profiler.start()
+    try:
+        return _run_stages(args, workdir, paths, profiler)
+    finally:
+        profiler.stop()
+
+def _run_stages(args: argparse.Namespace, workdir: str, paths: Dict[str, str], profiler: StageProfiler) -> dict:
+    """合成データに対して各段階を計測する"""
+    parity: List[dict] = []
+
+    def check(name: str, point_id, diff: float, tolerance: float):
+        parity.append({'check': name, 'point': point_id, 'max_abs_diff': diff, 'ok': bool(diff <= tolerance)})
+
+    # ASCファイルの解析（バイナリキャッシュを作成）と、バイナリキャッシュからの読み込み
+    raster_keys = ('upg_file', 'dir_file', 'dem_file', 'landuse_file')
+    rasters = {}
+    reader = GISDataReader(cache_max_bytes=0)
+    reader.SIDECAR_MIN_BYTES = 0
+    with profiler.stage('read_gis_file'):
+        for key in raster_keys:
+            rasters[key], _ = reader.read_gis_file(paths[key])
+    metadata = reader.metadata
+    with profiler.stage('read_gis_file (sidecar)'):
+        for key in raster_keys:
+            np.ascontiguousarray(reader.read_gis_file(paths[key])[0])
+
+    with profiler.stage('flow_network'):
+        network = FlowNetworkIndex.build(rasters['dir_file'], metadata)
+
+    rainfall_data = read_rainfall_data(paths['rainfall_file'])
+    extractor = BasinExtractor(
+        rasters['dir_file'], metadata, rasters['dem_file'], rasters['landuse_file'], network=network
+    )
+    search_extractor = BasinExtractor(rasters['dir_file'], metadata, rasters['dem_file'], rasters['landuse_file'])
+    windowed_extractor = BasinExtractor(
+        rasters['dir_file'], metadata, network=network,
+        dem_file=paths['dem_file'], landuse_file=paths['landuse_file'], reader=reader
+    )
+    geometry = GridGeometry.from_metadata(metadata)
+
+    hydrographs = []
+    cells = 0
+    for point in read_analysis_points(paths['input_file']):
+        _, _, _, is_above, num_x, num_y = find_nearest_point_data(
+            geometry, rasters['upg_file'], point.lon, point.lat, args.threshold
+        )
+        if not is_above:
+            continue
+
+        with profiler.stage('extraction'):
+            basin = extract_dense(extractor, num_x - 1, num_y - 1)
+        with profiler.stage('extraction (search)'):
+            searched = extract_dense(search_extractor, num_x - 1, num_y - 1)
+        with profiler.stage('extraction (windowed)'):
+            windowed = extract_dense(windowed_extractor, num_x - 1, num_y - 1)
+        check('extraction basin', point.link_id,
+              0.0 if np.array_equal(basin.basin, searched.basin) else float('inf'), 0.0)
+        check('extraction distance', point.link_id, _max_abs_diff(basin.distance, searched.distance), 1e-6)
+        check('extraction window', point.link_id, max(
+            _max_abs_diff(basin.elevation, windowed.elevation),
+            _max_abs_diff(basin.landuse, windowed.landuse)
+        ), 0.0)
+        cells += int(np.sum(basin.basin != basin.metadata.nodata))
+
+        flood_calculator = FloodArrivalCalculator(GISDataReader(cache_max_bytes=0))
+        with profiler.stage('calculate_arrival_time'):
+            flood_calculator.set_data(basin.distance, basin.elevation, basin.metadata)
+            arrival_time = flood_calculator.calculate_arrival_time()
+        check('calculate_arrival_time', point.link_id,
+              _max_abs_diff(arrival_time, legacy_arrival_time(flood_calculator)), 1e-9)
+
+        rational_calculator = RationalMethodCalculator(GISDataReader(cache_max_bytes=0))
+        with profiler.stage('calculate_flow'):
+            rational_calculator.set_data(arrival_time, basin.landuse, basin.metadata)
+            output_times, flows = rational_calculator.calculate_flow_array(rainfall_data, args.dtq)
+        hydrographs.append((point.link_id, flows))
+
+        # 流域セルのみの形式での計算（main.process_pointと同じ経路）
+        with profiler.stage('extraction (sparse)'):
+            sparse = extractor.extract_sparse(num_x - 1, num_y - 1)
+        with profiler.stage('calculate_arrival_time (sparse)'):
+            sparse_arrival_time = flood_calculator.calculate_sparse_arrival_time(sparse)
+        sparse_calculator = RationalMethodCalculator(GISDataReader(cache_max_bytes=0))
+        with profiler.stage('calculate_flow (sparse)'):
+            sparse_calculator.set_sparse_data(sparse_arrival_time, sparse)
+            _, sparse_flows = sparse_calculator.calculate_flow_array(rainfall_data, args.dtq)
+        check('sparse basin', point.link_id, _max_abs_diff(flows, sparse_flows), 0.0)
+        
+        # 流路に沿った到達時間（travel_time_method='path'）
+        path_calculator = FloodArrivalCalculator(GISDataReader(cache_max_bytes=0), travel_time_method='path')
+        with profiler.stage('calculate_arrival_time (path)'):
+            path_arrival_time = path_calculator.calculate_sparse_arrival_time(sparse)
+        # セルごとに流路をたどる計算は計算量（セル数×流路の段数）が大きいため、小さい流域のみ比較する
+        depth = len(FlowNetworkIndex.upstream_levels(sparse.downstream, np.flatnonzero(sparse.downstream < 0)))
+        if sparse.n_cells * depth <= args.legacy_max_ops:
+            check('calculate_arrival_time (path)', point.link_id,
+                  _max_abs_diff(path_arrival_time, walk_path_arrival_time(path_calculator, sparse)), 1e-6)
+
+        # セルごとのループは計算量が大きいため、小さい流域のみ比較する
+        n_valid = int(np.sum(arrival_time != basin.metadata.nodata))
+        if n_valid * len(rainfall_data) <= args.legacy_max_ops:
+            with profiler.stage('calculate_flow (legacy loop)'):
+                legacy = legacy_calculate_flow(rational_calculator, rainfall_data, args.dtq)
+            legacy_flows = np.array([legacy[t] for t in sorted(legacy)])
+            check('calculate_flow', point.link_id, _max_abs_diff(flows, legacy_flows),
+                  1e-9 * max(1.0, float(np.max(np.abs(legacy_flows)))))
+
+    if not hydrographs:
+        raise RuntimeError("No analysis point was above the threshold")
+
+    merged_file = os.path.join(workdir, 'flow_results.csv')
+    with profiler.stage('merge_flow_results'):
+        merge_flow_results(hydrographs, merged_file, args.dtq)
+    merged = pd.read_csv(merged_file)
+    for link_id, flows in hydrographs:
+        column = merged[f'flow_{int(float(link_id))}'].to_numpy()
+        check('merge_flow_results', link_id, _max_abs_diff(column[:len(flows)], np.round(flows, 6)), 1e-9)
+
+    return {
+        'parameters': {
+            'rows': args.rows,
+            'cols': args.cols,
+            'points': len(hydrographs),
+            'hours': args.hours,
+            'dtq': args.dtq,
+            'threshold': args.threshold,
+            'seed': args.seed,
+            'terrain': args.terrain,
+            'basin_cells': cells,
+        },
+        'stages': profiler.stages,
+        'parity': parity,
+    }
+
+def print_report(report: dict):
+    """計測結果を表形式で表示する"""
+    parameters = report['parameters']
+    print(f"grid {parameters['rows']}x{parameters['cols']}, {parameters['points']} points, "
+          f"{parameters['basin_cells']} basin cells, {parameters['hours']} h rainfall")
+    print(f"{'stage':<32}{'calls':>7}{'seconds':>12}{'peak MB':>10}")
+    for name, stage in report['stages'].items():
+        peak = f"{stage['peak_bytes'] / 1024**2:.1f}" if 'peak_bytes' in stage else '-'
+        print(f"{name:<32}{stage['calls']:>7}{stage['seconds']:>12.4f}{peak:>10}")
+
+    failed = [item for item in report['parity'] if not item['ok']]
+    print(f"parity: {len(report['parity']) - len(failed)}/{len(report['parity'])} checks passed")
+    for item in failed:
+        print(f"  FAILED {item['check']} (point {item['point']}): max abs diff {item['max_abs_diff']}")
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """コマンドライン引数を解析する"""
+    parser = argparse.ArgumentParser(description="合成データによるSRFのベンチマーク")
+    parser.add_argument('--rows', type=int, default=500, help="ラスタの行数")
+    parser.add_argument('--cols', type=int, default=600, help="ラスタの列数")
+    parser.add_argument('--points', type=int, default=10, help="解析地点数")
+    parser.add_argument('--hours', type=int, default=24, help="降雨期間（時間）")
+    parser.add_argument('--dtq', type=float, default=600, help="出力時間間隔（秒）")
+    parser.add_argument('--threshold', type=float, default=15, help="河川セル判定閾値")
+    parser.add_argument('--seed', type=int, default=0, help="乱数のシード")
+    parser.add_argument(
+        '--terrain', choices=TERRAINS, default='cone',
+        help="合成地形の種類（terracedは流速表の全ての勾配区分を含む）"
+    )
+    parser.add_argument(
+        '--legacy-max-ops', type=float, default=5e5,
+        help="セルごとのループで比較する流域の上限（セル数×降雨時刻数）"
+    )
+    parser.add_argument(
+        '--no-memory', action='store_true',
+        help="ピークメモリを計測しない（計測中はPythonのループが多い段階が遅くなる）"
+    )
+    parser.add_argument('--workdir', default=None, help="合成データの出力先（省略時は一時ディレクトリを作成し、終了後に削除）")
+    parser.add_argument('--output', default=None, help="計測結果のJSONファイルパス")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    """ベンチマークを実行し、一致確認に失敗した場合は1を返す"""
+    args = parse_args(argv)
+    workdir = args.workdir or tempfile.mkdtemp(prefix='srf_benchmark_')
+    try:
+        report = run_benchmark(args, workdir)
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0 if all(item['ok'] for item in report['parity']) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
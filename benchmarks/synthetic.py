@@ -0,0 +1,181 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+import os
+import numpy as np
+from typing import Dict, List, Tuple
+from src.models.metadata import GISMetadata
+from src.calculators.basin_extractor import BasinExtractor
+from src.calculators.flow_network import FlowNetworkIndex
+
+# 合成データの格子（南西端の経度・緯度、セルサイズ(度)）
+XLLCORNER = 136.0
+YLLCORNER = 36.0
+CELLSIZE = 0.001
+NODATA = -9999.0
+
+# 地形の種類
+TERRAINS = ('cone', 'terraced')
+
+# 下流側セルの相対位置(行, 列) -> 流向値（BasinExtractor.UPSTREAM_NEIGHBORSの逆向き）
+DOWNSTREAM_DIRECTIONS = {(-di, -dj): direction for di, dj, direction in BasinExtractor.UPSTREAM_NEIGHBORS}
+
+def make_metadata(rows: int, cols: int) -> GISMetadata:
+    """合成データのメタデータ"""
+    return GISMetadata(
+        nx=cols,
+        ny=rows,
+        xllcorner=XLLCORNER,
+        yllcorner=YLLCORNER,
+        cellsize=CELLSIZE,
+        nodata=NODATA
+    )
+
+def make_synthetic_grids(rows: int, cols: int, seed: int = 0, terrain: str = 'cone') -> Dict[str, np.ndarray]:
+    """
+    合成した流域の流向(D8)・標高・土地利用・上流ピクセル数のデータを作成
+    標高は南端中央の流域末端に向かって下る円錐に乱数を加えたもので、流向は最急勾配の方向
+    'cone'は勾配が全て0.01以上（流速表の最上位の区分のみ）、'terraced'は緩い段と急な段を
+    交互に重ねた地形で、流速表の全ての区分の勾配を含む
+    
+    Parameters:
+    -----------
+    rows, cols : int
+        行数・列数
+    seed : int
+        乱数のシード
+    terrain : str
+        地形の種類（'cone'または'terraced'）
+
+    Returns:
+    --------
+    Dict[str, np.ndarray]
+        'dir', 'dem', 'landuse', 'acc' の配列（ASCファイルの行列の向き、行は北から）
+    """
+    if terrain not in TERRAINS:
+        raise ValueError(f"Unknown terrain: {terrain} (expected one of {TERRAINS})")
+    rng = np.random.default_rng(seed)
+    ii, jj = np.mgrid[0:rows, 0:cols]
+    radius = np.hypot(ii - (rows - 1), jj - cols // 2)
+    if terrain == 'cone':
+        dem = radius * 5.0 + rng.random((rows, cols)) * 3.0
+    else:
+        # 1セルあたりの標高差(m)が0.2の段と1.5の段を交互に重ねる（標高は流域末端からの距離に対して単調増加）
+        width = max(rows, cols) / 6
+        band = np.floor(radius / width)
+        rise = np.where(band % 2 == 0, 0.2, 1.5)
+        base = np.floor(band / 2) * width * 1.7 + np.where(band % 2 == 1, width * 0.2, 0.0)
+        dem = base + (radius - band * width) * rise + rng.random((rows, cols)) * 0.05
+
+    # 周囲8セルのうち勾配が最も急な低いセルへ流れる（低いセルがない場合は0）
+    padded = np.pad(dem, 1, constant_values=np.inf)
+    steepest = np.zeros((rows, cols))
+    direction = np.zeros((rows, cols))
+    for (di, dj), code in DOWNSTREAM_DIRECTIONS.items():
+        neighbor = padded[1 + di:1 + di + rows, 1 + dj:1 + dj + cols]
+        drop = (dem - neighbor) / np.hypot(di, dj)
+        steeper = (neighbor < dem) & (drop > steepest)
+        steepest = np.where(steeper, drop, steepest)
+        direction = np.where(steeper, code, direction)
+
+    landuse = rng.integers(1, 7, (rows, cols)).astype(float)
+
+    # 上流ピクセル数は流下ネットワークの部分木のセル数
+    metadata = make_metadata(rows, cols)
+    network = FlowNetworkIndex.build(BasinExtractor._to_grid(direction), metadata)
+    acc = np.asarray(network.subtree_size, dtype=float).reshape(rows, cols)
+
+    return {'dir': direction, 'dem': np.round(dem, 2), 'landuse': landuse, 'acc': acc}
+
+def select_points(acc: np.ndarray, n_points: int, threshold: float, seed: int = 0) -> List[Tuple[float, float, int]]:
+    """
+    上流ピクセル数が閾値を超えるセルから解析地点を選ぶ
+    流域の大きさが偏らないよう、上流ピクセル数の順位を等間隔に区切った区間から1点ずつ選ぶ
+
+    Returns:
+    --------
+    List[Tuple[float, float, int]]
+        (緯度, 経度, 地点ID) のリスト（座標はセルの中心）
+    """
+    rows, cols = np.nonzero(acc > threshold)
+    if rows.size == 0:
+        raise ValueError("No river cells in the synthetic grid")
+    rng = np.random.default_rng(seed)
+    ranked = np.argsort(acc[rows, cols], kind='stable')
+    n_selected = min(n_points, rows.size)
+    edges = np.linspace(0, rows.size, n_selected + 1).astype(int)
+    selected = ranked[[rng.integers(start, max(start + 1, end)) for start, end in zip(edges[:-1], edges[1:])]]
+    ni = acc.shape[0]
+    return [
+        (YLLCORNER + CELLSIZE * (ni - 1 - rows[k] + 0.5), XLLCORNER + CELLSIZE * (cols[k] + 0.5), 100 + n)
+        for n, k in enumerate(selected)
+    ]
+
+def write_asc(path: str, raster: np.ndarray, fmt: str):
+    """ASCファイルとして出力（行は北から）"""
+    rows, cols = raster.shape
+    with open(path, 'w') as f:
+        f.write(f"ncols {cols}\nnrows {rows}\nxllcorner {XLLCORNER}\nyllcorner {YLLCORNER}\n"
+                f"cellsize {CELLSIZE}\nNODATA_value {int(NODATA)}\n")
+        np.savetxt(f, raster, fmt=fmt)
+
+def write_synthetic_case(directory: str, rows: int, cols: int, n_points: int, hours: int,
+                         threshold: float = 15, dtq: float = 600, seed: int = 0,
+                         terrain: str = 'cone') -> Dict[str, str]:
+    """
+    合成データ一式（ラスタ・解析地点・雨量）をファイルに出力
+
+    Parameters:
+    -----------
+    directory : str
+        出力先ディレクトリ
+    rows, cols : int
+        ラスタの行数・列数
+    n_points : int
+        解析地点数
+    hours : int
+        降雨期間（時間）。雨量はdtqごと
+    threshold : float
+        河川セル判定閾値
+    dtq : float
+        雨量の時間間隔(s)
+    seed : int
+        乱数のシード
+    terrain : str
+        地形の種類（make_synthetic_gridsを参照）
+    
+    Returns:
+    --------
+    Dict[str, str]
+        config.ymlのfile_paths・analysis_pointsと同じ名前のファイルパス
+    """
+    os.makedirs(directory, exist_ok=True)
+    grids = make_synthetic_grids(rows, cols, seed, terrain)
+    paths = {
+        'dir_file': os.path.join(directory, 'dir.txt'),
+        'dem_file': os.path.join(directory, 'dem.txt'),
+        'landuse_file': os.path.join(directory, 'landuse.txt'),
+        'upg_file': os.path.join(directory, 'acc.txt'),
+        'rainfall_file': os.path.join(directory, 'rainfall.csv'),
+        'input_file': os.path.join(directory, 'analysis_points.csv'),
+    }
+    write_asc(paths['dir_file'], grids['dir'], '%d')
+    write_asc(paths['dem_file'], grids['dem'], '%.2f')
+    write_asc(paths['landuse_file'], grids['landuse'], '%d')
+    write_asc(paths['upg_file'], grids['acc'], '%d')
+
+    with open(paths['input_file'], 'w') as f:
+        f.write("target_lat,target_lon,target_linkid\n")
+        for lat, lon, link_id in select_points(grids['acc'], n_points, threshold, seed):
+            f.write(f"{lat},{lon},{link_id}\n")
+
+    rng = np.random.default_rng(seed + 1)
+    n_steps = int(hours * 3600 / dtq)
+    with open(paths['rainfall_file'], 'w') as f:
+        f.write("time,Rainfall\n")
+        for step in range(n_steps):
+            f.write(f"{(step + 1) * dtq:g},{rng.gamma(0.8, 4.0):.6f}\n")
+
+    return paths
@@ -1,5 +1,10 @@
 from .cell_size_calculator import CellSizeCalculator
 from .flood_arrival_calculator import FloodArrivalCalculator
 from .rational_method_calculator import RationalMethodCalculator
+from .basin_extractor import BasinExtractor
+from .flow_network import FlowNetworkIndex
+from .streaming_flow_accumulator import StreamingFlowAccumulator
+from .river_snapper import RiverCellIndex
 
-__all__ = ['CellSizeCalculator', 'FloodArrivalCalculator', 'RationalMethodCalculator']
+__all__ = ['CellSizeCalculator', 'FloodArrivalCalculator', 'RationalMethodCalculator', 'BasinExtractor',
+           'StreamingFlowAccumulator', 'FlowNetworkIndex', 'RiverCellIndex']
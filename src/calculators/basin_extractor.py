@@ -0,0 +1,285 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+import numpy as np
+from typing import Optional, Tuple
+from ..models.metadata import GISMetadata
+from ..models.sparse_basin import SparseBasin
+from ..file_io.gis_reader import GISDataReader
+from ..utils.geo_utils import calc_planar_distance
+from .flow_network import FlowNetworkIndex
+
+class BasinExtractor:
+    """
+    流向(D8)データから流域を抽出するクラス
+    extract_basin(Fortran)の find_basin を反復処理で置き換えたもの
+    """
+
+    NODATA = -9999.0
+
+    # 流域抽出の起点として有効な流向値
+    VALID_DIRECTIONS = (1, 2, 4, 8, 16, 32, 64, 128, 0, 255, -1)
+
+    # 上流側セルの相対位置(行, 列)と、そのセルが現在のセルに流れ込む場合の流向値
+    # --------> j
+    # |              64
+    # |         32----|----128
+    # |     16--------|--------1
+    # |          8----|----2
+    # |               4
+    # i
+    UPSTREAM_NEIGHBORS = (
+        (0, 1, 16),
+        (1, 1, 32),
+        (1, 0, 64),
+        (1, -1, 128),
+        (0, -1, 1),
+        (-1, -1, 2),
+        (-1, 0, 4),
+        (-1, 1, 8),
+    )
+
+    def __init__(self, dir_data: np.ndarray, metadata: GISMetadata,
+                 dem_data: Optional[np.ndarray] = None,
+                 landuse_data: Optional[np.ndarray] = None,
+                 network: Optional[FlowNetworkIndex] = None,
+                 dem_file: Optional[str] = None,
+                 landuse_file: Optional[str] = None,
+                 reader: Optional[GISDataReader] = None):
+        """
+        Parameters:
+        -----------
+        dir_data : np.ndarray
+            流向データ（GISDataReader.read_gis_fileの戻り値）
+        metadata : GISMetadata
+            流向データのメタデータ
+        dem_data : np.ndarray, optional
+            標高データ（流向データと同じ格子）
+        landuse_data : np.ndarray, optional
+            土地利用データ（流向データと同じ格子）
+        network : FlowNetworkIndex, optional
+            流向データから作成した流下ネットワークの索引（指定時は上流域を探索せずに取り出す）
+        dem_file : str, optional
+            標高データのファイルパス（dem_dataを指定しない場合、流域の外接矩形の範囲のみを読み込む）
+        landuse_file : str, optional
+            土地利用データのファイルパス（landuse_dataを指定しない場合、流域の外接矩形の範囲のみを読み込む）
+        reader : GISDataReader, optional
+            dem_file, landuse_fileの読み込みに使用するリーダー
+        """
+        self.metadata = metadata
+        # ASCファイルと同じ行列の向き（行は北から南）で参照する
+        self.dir_raster = self._to_raster(dir_data)
+        self.dem_raster = self._to_raster(dem_data) if dem_data is not None else None
+        self.landuse_raster = self._to_raster(landuse_data) if landuse_data is not None else None
+        self.network = network
+        self.dem_file = dem_file
+        self.landuse_file = landuse_file
+        self.reader = reader if reader is not None else GISDataReader(cache_max_bytes=0)
+
+    @staticmethod
+    def _to_raster(data: np.ndarray) -> np.ndarray:
+        """[x, y]配列をASCファイルの行列の向きに変換（コピーなし）"""
+        return np.flipud(data.T)
+    
+    @staticmethod
+    def _to_grid(raster: np.ndarray) -> np.ndarray:
+        """ASCファイルの行列の向きの配列を[x, y]配列に変換"""
+        return np.flipud(raster).T
+
+    def extract_sparse(self, row: int, col: int) -> SparseBasin:
+        """
+        指定セルを流域末端として上流域を抽出し、流域セルのみの形式で返す
+        外接矩形の配列を作らないため、細長い流域でもメモリ・計算量は流域セル数に比例する
+        
+        Parameters:
+        -----------
+        row : int
+            流域末端セルの行番号（北から、0始まり）
+        col : int
+            流域末端セルの列番号（西から、0始まり）
+        
+        Returns:
+        --------
+        SparseBasin
+            流域セルごとの流下距離・標高・土地利用データ
+        
+        Raises:
+        -------
+        ValueError
+            指定セルに流向データが存在しない場合
+        """
+        return self._build_sparse_basin(*self.find_upstream_cells(row, col))
+    
+    def find_upstream_cells(self, row: int, col: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        指定セルを流域末端とする上流域のセルと流下距離を求める
+        
+        Parameters:
+        -----------
+        row : int
+            流域末端セルの行番号（北から、0始まり）
+        col : int
+            流域末端セルの列番号（西から、0始まり）
+        
+        Returns:
+        --------
+        Tuple[np.ndarray, np.ndarray, np.ndarray]
+            流域セルの (行番号, 列番号, 流下距離(m))
+        
+        Raises:
+        -------
+        ValueError
+            指定セルに流向データが存在しない場合
+        """
+        ni, nj = self.dir_raster.shape
+        if not (0 <= row < ni and 0 <= col < nj) or self.dir_raster[row, col] not in self.VALID_DIRECTIONS:
+            raise ValueError(f"That point does not have any data: ({row}, {col})")
+        
+        # 索引がある場合は部分木の範囲として取り出す（循環する流向の場合は探索する）
+        if self.network is not None:
+            cells = self.network.upstream_cells(row, col)
+            if cells is not None:
+                return cells
+
+        xll = self.metadata.xllcorner
+        yll = self.metadata.yllcorner
+        csize = self.metadata.cellsize
+
+        visited = np.zeros((ni, nj), dtype=bool)
+        visited[row, col] = True
+
+        rows = np.array([row])
+        cols = np.array([col])
+        dists = np.array([0.0])
+        found_rows, found_cols, found_dists = [rows], [cols], [dists]
+
+        # 下流から上流へ1セルずつ探索範囲を広げる
+        while rows.size > 0:
+            lat1 = yll + csize * (ni - 1 - rows)
+            lon1 = xll + csize * cols
+
+            next_rows, next_cols, next_dists = [], [], []
+            for di, dj, direction in self.UPSTREAM_NEIGHBORS:
+                ip = rows + di
+                jp = cols + dj
+                # 外周セルは探索しない（extract_basinと同じ条件）
+                inside = (ip > 0) & (ip < ni - 1) & (jp > 0) & (jp < nj - 1)
+                ip, jp = ip[inside], jp[inside]
+                upstream = (self.dir_raster[ip, jp] == direction) & ~visited[ip, jp]
+                if not upstream.any():
+                    continue
+
+                ip, jp = ip[upstream], jp[upstream]
+                visited[ip, jp] = True
+
+                # 経度は列番号(1始まり)を用いる（extract_basinの計算結果と一致させるため）
+                lat2 = yll + csize * (ni - 1 - ip)
+                lon2 = xll + csize * (jp + 1)
+                step = calc_planar_distance(lat1[inside][upstream], lon1[inside][upstream], lat2, lon2)
+
+                next_rows.append(ip)
+                next_cols.append(jp)
+                next_dists.append(dists[inside][upstream] + step)
+
+            if not next_rows:
+                break
+            rows = np.concatenate(next_rows)
+            cols = np.concatenate(next_cols)
+            dists = np.concatenate(next_dists)
+            found_rows.append(rows)
+            found_cols.append(cols)
+            found_dists.append(dists)
+
+        return np.concatenate(found_rows), np.concatenate(found_cols), np.concatenate(found_dists)
+
+    def _build_sparse_basin(self, rows: np.ndarray, cols: np.ndarray, dists: np.ndarray) -> SparseBasin:
+        """
+        流域セルの一覧から流域セルのみの形式のデータを作成
+        
+        Parameters:
+        -----------
+        rows, cols : np.ndarray
+            流域セルの行・列番号
+        dists : np.ndarray
+            流域セルの流下距離(m)
+        
+        Returns:
+        --------
+        SparseBasin
+            抽出した流域データ
+        """
+        imin, imax, jmin, jmax = self._bounds(rows, cols)
+        window = (slice(imin, imax + 1), slice(jmin, jmax + 1))
+        ny = imax - imin + 1
+        
+        # 外接矩形の[x, y]配列の通し番号の順に並べる（外接矩形の配列をマスクで参照する場合と同じ順）
+        index = (cols - jmin) * ny + (imax - rows)
+        order = np.argsort(index, kind='stable')
+        rows, cols, index = rows[order], cols[order], index[order]
+        local = (rows - imin, cols - jmin)
+        
+        # 流域内の下流セルの位置（find_upstream_cellsの最初のセルが流域末端）
+        down_rows, down_cols = rows.copy(), cols.copy()
+        directions = self.dir_raster[rows, cols]
+        for di, dj, direction in self.UPSTREAM_NEIGHBORS:
+            flows = directions == direction
+            down_rows[flows] -= di
+            down_cols[flows] -= dj
+        inside = (down_rows >= imin) & (down_rows <= imax) & (down_cols >= jmin) & (down_cols <= jmax)
+        down_index = (down_cols - jmin) * ny + (imax - down_rows)
+        position = np.minimum(np.searchsorted(index, down_index), index.size - 1)
+        downstream = np.where(inside & (index[position] == down_index), position, -1)
+        downstream[position == np.arange(index.size)] = -1
+        downstream[np.flatnonzero(order == 0)] = -1
+        
+        def cell_values(raster, filepath):
+            if raster is not None:
+                return raster[rows, cols].astype(float)
+            values = self._read_window(filepath, window)
+            if values is None:
+                return np.full(index.size, self.NODATA)
+            return values[local].astype(float)
+        
+        return SparseBasin(
+            metadata=self._window_metadata(imin, imax, jmin, jmax),
+            index=index,
+            distance=np.asarray(dists, dtype=float)[order],
+            elevation=cell_values(self.dem_raster, self.dem_file),
+            landuse=cell_values(self.landuse_raster, self.landuse_file),
+            bounds=(imin, imax, jmin, jmax),
+            downstream=downstream
+        )
+    
+    @staticmethod
+    def _bounds(rows: np.ndarray, cols: np.ndarray) -> Tuple[int, int, int, int]:
+        """流域セルの外接矩形 (imin, imax, jmin, jmax)"""
+        return int(rows.min()), int(rows.max()), int(cols.min()), int(cols.max())
+    
+    def _window_metadata(self, imin: int, imax: int, jmin: int, jmax: int) -> GISMetadata:
+        """外接矩形のメタデータ"""
+        ni = self.dir_raster.shape[0]
+        return GISMetadata(
+            nx=jmax - jmin + 1,
+            ny=imax - imin + 1,
+            xllcorner=self.metadata.xllcorner + self.metadata.cellsize * jmin,
+            yllcorner=self.metadata.yllcorner + self.metadata.cellsize * (ni - 1 - imax),
+            cellsize=self.metadata.cellsize,
+            nodata=self.NODATA
+        )
+    
+    def _read_window(self, filepath: Optional[str], window: Tuple[slice, slice]) -> Optional[np.ndarray]:
+        """
+        外接矩形の範囲のデータをファイルから読み込み、ASCファイルの行列の向きで取得
+        （ファイルパスがない場合はNone）
+        """
+        if filepath is None:
+            return None
+        rows, cols = window
+        data, _ = self.reader.read_window(
+            filepath,
+            (rows.start, rows.stop - 1, cols.start, cols.stop - 1),
+            expected_metadata=self.metadata
+        )
+        return self._to_raster(data)
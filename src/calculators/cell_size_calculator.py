@@ -4,6 +4,8 @@
 # see https://opensource.org/licenses/MIT
 
 import numpy as np
+from functools import lru_cache
+from typing import Optional, Tuple
 from ..models.metadata import GISMetadata
 
 class CellSizeCalculator:
@@ -17,25 +19,25 @@ class CellSizeCalculator:
         
     def hubeny_distance(self, x1_deg: float, y1_deg: float, x2_deg: float, y2_deg: float) -> float:
         """
-        2点間の距離をHubenyの式で計算
+        2点間の距離をHubenyの式で計算（配列入力にも対応）
         
         Parameters:
         -----------
-        x1_deg, y1_deg : float
+        x1_deg, y1_deg : float or np.ndarray
             始点の経度、緯度（度）
-        x2_deg, y2_deg : float
+        x2_deg, y2_deg : float or np.ndarray
             終点の経度、緯度（度）
-            
+        
         Returns:
         --------
-        float
+        float or np.ndarray
             2点間の距離（メートル）
         """
         # 度からラジアンに変換
-        x1 = x1_deg * self.PI / 180.0
-        y1 = y1_deg * self.PI / 180.0
-        x2 = x2_deg * self.PI / 180.0
-        y2 = y2_deg * self.PI / 180.0
+        x1 = np.asarray(x1_deg) * self.PI / 180.0
+        y1 = np.asarray(y1_deg) * self.PI / 180.0
+        x2 = np.asarray(x2_deg) * self.PI / 180.0
+        y2 = np.asarray(y2_deg) * self.PI / 180.0
         
         # 緯度差、経度差、平均緯度
         dy = y1 - y2
@@ -53,7 +55,40 @@ class CellSizeCalculator:
         # 距離の計算
         d = np.sqrt((dy * m)**2 + (dx * n * np.cos(mu))**2)
         
-        return d
+        return d if d.ndim else float(d)
+    
+    def calculate_row_cell_sizes(self, metadata: GISMetadata, raster_metadata: Optional[GISMetadata] = None
+                                 ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        緯度ごと（データ配列[x, y]のyごと）のセルサイズを計算
+        セルサイズは経度によらないため、ラスタ全体の緯度ごとの値を1回だけ計算して保持し、
+        ラスタから切り出した流域の格子ではその範囲の行を取り出す
+        
+        Parameters:
+        -----------
+        metadata : GISMetadata
+            GISファイル（または流域の外接矩形）のメタデータ
+        raster_metadata : GISMetadata, optional
+            metadataの格子を切り出した元のラスタのメタデータ（省略時はmetadataの格子全体）
+        
+        Returns:
+        --------
+        Tuple[np.ndarray, np.ndarray, np.ndarray]
+            (dx, dy, area) : 南から北へ並んだセルの東西・南北サイズ(m)、面積(m2) (ny,)
+        """
+        if raster_metadata is None:
+            raster_metadata = metadata
+        if metadata.cellsize != raster_metadata.cellsize:
+            raise ValueError(f"Cell size {metadata.cellsize} differs from raster cell size {raster_metadata.cellsize}")
+        offset = int(round((metadata.yllcorner - raster_metadata.yllcorner) / raster_metadata.cellsize))
+        if offset < 0 or offset + metadata.ny > raster_metadata.ny:
+            raise ValueError("Grid is not within the raster")
+        
+        sizes = _row_cell_sizes(
+            self.SEMI_MAJOR_AXIS, self.SEMI_MINOR_AXIS,
+            int(raster_metadata.ny), float(raster_metadata.yllcorner), float(raster_metadata.cellsize)
+        )
+        return tuple(size[offset:offset + metadata.ny] for size in sizes)
     
     def calculate_cell_size(self, metadata: GISMetadata) -> tuple:
         """
@@ -107,4 +142,26 @@ class CellSizeCalculator:
         length = np.sqrt(dx * dy)
         area = dx * dy
         
-        return dx, dy, length, area
\ No newline at end of file
+        return dx, dy, length, area
+
+@lru_cache(maxsize=16)
+def _row_cell_sizes(semi_major_axis: float, semi_minor_axis: float,
+                    ny: int, yllcorner: float, cellsize: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """CellSizeCalculator.calculate_row_cell_sizesの計算本体（ラスタごとに結果を保持）"""
+    calculator = CellSizeCalculator()
+    calculator.SEMI_MAJOR_AXIS = semi_major_axis
+    calculator.SEMI_MINOR_AXIS = semi_minor_axis
+
+    # 各セルの南端・北端の緯度
+    south = yllcorner + cellsize * np.arange(ny)
+    north = south + cellsize
+
+    # 東西方向は南端・北端の長さの平均、南北方向は西端の長さ
+    dx = (calculator.hubeny_distance(0.0, south, cellsize, south)
+          + calculator.hubeny_distance(0.0, north, cellsize, north)) / 2.0
+    dy = calculator.hubeny_distance(0.0, south, 0.0, north)
+    area = dx * dy
+
+    for array in (dx, dy, area):
+        array.flags.writeable = False
+    return dx, dy, area
@@ -4,22 +4,78 @@
 # see https://opensource.org/licenses/MIT
 
 import numpy as np
+from typing import Optional, Sequence, Tuple
 from ..file_io.gis_reader import GISDataReader
+from ..file_io.binary_output import write_raster_npz
+from ..models.sparse_basin import SparseBasin
+from ..models.metadata import GISMetadata
+from .flow_network import FlowNetworkIndex
 
 class FloodArrivalCalculator:
     """洪水到達時間を計算するクラス"""
     
-    def __init__(self, gis_reader: GISDataReader):
+    # 勾配の下限と流速(m/s)の対応（勾配の大きい順、最後の行は他のどの行にも該当しない勾配にも使う）
+    VELOCITY_TABLE = (
+        (0.01, 3.5),           # 1/100以上
+        (0.005, 3.0),          # 1/200以上1/100未満
+        (float('-inf'), 2.1)   # 1/200未満
+    )
+    # 到達時間の計算方法（average: 流下距離とセルの標高から求めた1つの勾配、path: 流路に沿った区間ごとの勾配）
+    TRAVEL_TIME_METHODS = ('average', 'path')
+    
+    def __init__(self, gis_reader: GISDataReader, velocity_table: Optional[Sequence[Sequence[float]]] = None,
+                 travel_time_method: str = 'average'):
         """
         Parameters:
         -----------
         gis_reader : GISDataReader
             GISデータを読み込むためのリーダークラスのインスタンス
+        velocity_table : Sequence[Sequence[float]], optional
+            勾配の下限と流速(m/s)の対応（省略時は VELOCITY_TABLE）
+        travel_time_method : str
+            到達時間の計算方法。'average'は流下距離をセルの標高/流下距離の勾配の流速で割る（従来の計算）、
+            'path'は流路（D8）の区間ごとの勾配の流速で区間の流下時間を求め、流域末端まで合計する
+            （流域セルのみの形式のデータのみ）
         """
+        if travel_time_method not in self.TRAVEL_TIME_METHODS:
+            raise ValueError(f"Invalid travel time method: {travel_time_method}")
         self.gis_reader = gis_reader
+        self.travel_time_method = travel_time_method
         self.distance_data = None
         self.elevation_data = None
+        self.velocity_table = self.normalize_velocity_table(velocity_table)
+        # np.searchsorted用の勾配の下限（昇順）と対応する流速
+        self._min_slopes = np.array([min_slope for min_slope, _ in reversed(self.velocity_table)])
+        self._velocities = np.array([velocity for _, velocity in reversed(self.velocity_table)])
+    
+    @classmethod
+    def normalize_velocity_table(cls, velocity_table: Optional[Sequence[Sequence[float]]] = None
+                                 ) -> Tuple[Tuple[float, float], ...]:
+        """
+        勾配の下限と流速の対応を検証し、(勾配の下限, 流速) のタプルに変換する
+        
+        Parameters:
+        -----------
+        velocity_table : Sequence[Sequence[float]], optional
+            勾配の下限と流速(m/s)の対応（勾配の大きい順）。省略時は VELOCITY_TABLE
         
+        Returns:
+        --------
+        Tuple[Tuple[float, float], ...]
+            (勾配の下限, 流速) のタプル
+        """
+        if velocity_table is None:
+            return cls.VELOCITY_TABLE
+        table = tuple((float(min_slope), float(velocity)) for min_slope, velocity in velocity_table)
+        if not table:
+            raise ValueError("Velocity table must not be empty")
+        min_slopes = [min_slope for min_slope, _ in table]
+        if any(upper <= lower for upper, lower in zip(min_slopes, min_slopes[1:])):
+            raise ValueError(f"Velocity table must be sorted by descending slope: {min_slopes}")
+        if any(velocity <= 0 for _, velocity in table):
+            raise ValueError(f"Velocities must be positive: {[velocity for _, velocity in table]}")
+        return table
+
     def load_data(self, distance_file: str, elevation_file: str):
         """
         距離データと標高データを読み込む
@@ -32,35 +88,53 @@ class FloodArrivalCalculator:
             標高データのファイルパス
         """
         # 距離データの読み込み
-        self.distance_data, _, _ = self.gis_reader.read_gis_file(distance_file)
+        self.distance_data, _ = self.gis_reader.read_gis_file(distance_file)
         
         # 標高データの読み込み（距離データのメタデータを使用して検証）
-        self.elevation_data, _, _ = self.gis_reader.read_gis_file(
+        self.elevation_data, _ = self.gis_reader.read_gis_file(
             elevation_file, 
             expected_metadata=self.gis_reader.metadata
         )
     
-    @staticmethod
-    def calculate_velocity(slope: float) -> float:
+    def set_data(self, distance_data: np.ndarray, elevation_data: np.ndarray, metadata: GISMetadata):
         """
-        勾配から流速を計算
+        読み込み済みの距離データと標高データを設定する
         
         Parameters:
         -----------
-        slope : float
+        distance_data : np.ndarray
+            距離データ
+        elevation_data : np.ndarray
+            標高データ
+        metadata : GISMetadata
+            両データのメタデータ
+        """
+        if distance_data.shape != elevation_data.shape:
+            raise ValueError(f"Invalid dimensions: distance {distance_data.shape}, elevation {elevation_data.shape}")
+        
+        self.gis_reader.metadata = metadata
+        self.distance_data = distance_data
+        self.elevation_data = elevation_data
+    
+    def calculate_velocity(self, slope):
+        """
+        勾配から流速を計算（配列入力にも対応）
+        勾配の下限を np.searchsorted で検索し、勾配の大きい順で最初に下限以上となる行の流速とする
+        
+        Parameters:
+        -----------
+        slope : float or np.ndarray
             勾配
-            
+        
         Returns:
         --------
-        float
+        float or np.ndarray
             流速 (m/s)
         """
-        if slope >= 0.01:  # 1/100以上
-            return 3.5
-        elif slope >= 0.005:  # 1/200以上1/100未満
-            return 3.0
-        else:  # 1/200未満
-            return 2.1
+        # どの下限も下回る勾配は最後の行（最も緩い勾配）の流速
+        classes = np.searchsorted(self._min_slopes, slope, side='right') - 1
+        velocities = self._velocities[np.maximum(classes, 0)]
+        return velocities if np.ndim(velocities) else float(velocities)
     
     def calculate_arrival_time(self) -> np.ndarray:
         """
@@ -73,29 +147,111 @@ class FloodArrivalCalculator:
         """
         if self.distance_data is None or self.elevation_data is None:
             raise ValueError("Distance and elevation data must be loaded first")
-        
+        if self.travel_time_method != 'average':
+            raise ValueError(f"Travel time method '{self.travel_time_method}' requires a sparse basin")
+
         nodata = self.gis_reader.metadata.nodata
         arrival_time = np.full_like(self.distance_data, nodata)
         
         # データが存在する部分のみ計算
         valid_mask = (self.distance_data != nodata) & (self.elevation_data != nodata)
-        
-        # 勾配の計算
-        valid_distances = self.distance_data > 0
-        slopes = np.zeros_like(self.distance_data)
-        slopes[valid_distances] = np.abs(
-            self.elevation_data[valid_distances] / self.distance_data[valid_distances]
+        arrival_time[valid_mask] = self._travel_time(
+            self.distance_data[valid_mask],
+            self.elevation_data[valid_mask]
         )
         
-        # 速度の計算（配列演算を使用）
-        velocities = np.where(slopes >= 0.01, 3.5,
-                    np.where(slopes >= 0.005, 3.0, 2.1))
+        return arrival_time
+    
+    def calculate_sparse_arrival_time(self, basin: SparseBasin) -> np.ndarray:
+        """
+        流域セルのみの形式のデータから洪水到達時間を計算
         
-        # 到達時間の計算
-        arrival_time[valid_mask] = self.distance_data[valid_mask] / velocities[valid_mask]
+        Parameters:
+        -----------
+        basin : SparseBasin
+            BasinExtractor.extract_sparseで抽出した流域データ
         
+        Returns:
+        --------
+        np.ndarray
+            流域セルごとの洪水到達時間（標高が欠測のセルは basin.metadata.nodata）
+        """
+        nodata = basin.metadata.nodata
+        arrival_time = np.full(basin.n_cells, nodata)
+        valid = (basin.distance != nodata) & (basin.elevation != nodata)
+        if self.travel_time_method == 'path':
+            arrival_time[valid] = self._path_travel_time(basin)[valid]
+        else:
+            arrival_time[valid] = self._travel_time(basin.distance[valid], basin.elevation[valid])
         return arrival_time
     
+    def _path_travel_time(self, basin: SparseBasin) -> np.ndarray:
+        """
+        流路に沿って区間ごとの流下時間を流域末端から上流へ累積した到達時間を計算
+        区間（セルから下流セルまで）の勾配は両セルの標高差/区間長とし、
+        いずれかの標高が欠測の区間は勾配0（最も遅い流速）とする
+        
+        Parameters:
+        -----------
+        basin : SparseBasin
+            BasinExtractor.extract_sparseで抽出した流域データ（downstreamを設定済み）
+        
+        Returns:
+        --------
+        np.ndarray
+            流域セルごとの到達時間(s)
+        """
+        if basin.downstream is None:
+            raise ValueError("Sparse basin has no downstream cells")
+        
+        nodata = basin.metadata.nodata
+        downstream = basin.downstream
+        cells = np.flatnonzero(downstream >= 0)
+        parents = downstream[cells]
+        
+        # 区間長は流下距離の差、勾配は標高差から
+        lengths = basin.distance[cells] - basin.distance[parents]
+        upper = basin.elevation[cells]
+        lower = basin.elevation[parents]
+        slopes = np.zeros(cells.size)
+        valid = (upper != nodata) & (lower != nodata) & (lengths > 0)
+        slopes[valid] = np.abs(upper[valid] - lower[valid]) / lengths[valid]
+        segment_time = np.zeros(basin.n_cells)
+        segment_time[cells] = lengths / self.calculate_velocity(slopes)
+        
+        # 流域末端から上流へ1段ずつ下流セルの到達時間に区間の流下時間を加算
+        travel_time = np.zeros(basin.n_cells)
+        levels = FlowNetworkIndex.upstream_levels(downstream, np.flatnonzero(downstream < 0))
+        for level in levels[1:]:
+            travel_time[level] = travel_time[downstream[level]] + segment_time[level]
+        return travel_time
+
+    def _travel_time(self, distance: np.ndarray, elevation: np.ndarray) -> np.ndarray:
+        """
+        有効なセルの流下距離・標高から到達時間を計算
+        
+        Parameters:
+        -----------
+        distance : np.ndarray
+            流下距離(m)
+        elevation : np.ndarray
+            標高(m)
+        
+        Returns:
+        --------
+        np.ndarray
+            到達時間(s)
+        """
+        # 勾配の計算（流下距離が0のセルは0）
+        slopes = np.zeros_like(distance)
+        positive = distance > 0
+        slopes[positive] = np.abs(elevation[positive] / distance[positive])
+        
+        # 速度の計算（勾配の区分を一括で検索）
+        velocities = self.calculate_velocity(slopes)
+        
+        return distance / velocities
+    
     def process_and_save(self, distance_file: str, elevation_file: str, output_file: str):
         """
         データの読み込みから計算、保存までの一連の処理を実行
@@ -116,4 +272,45 @@ class FloodArrivalCalculator:
         arrival_time = self.calculate_arrival_time()
         
         # 結果の保存
-        self.gis_reader.export_to_asc(arrival_time, output_file)
\ No newline at end of file
+        self.gis_reader.export_to_asc(arrival_time, output_file)
+    
+    def process_sparse_basin_and_save(self, basin: SparseBasin, output_file: str) -> np.ndarray:
+        """
+        流域セルのみの形式の流域データから到達時間を計算して保存する
+        （出力ファイルは流域の外接矩形の範囲）
+        
+        Parameters:
+        -----------
+        basin : SparseBasin
+            BasinExtractor.extract_sparseで抽出した流域データ
+        output_file : str
+            出力ファイルパス（拡張子が.npzの場合はNumPy形式、それ以外はASC形式）
+        
+        Returns:
+        --------
+        np.ndarray
+            流域セルごとの洪水到達時間
+        """
+        arrival_time = self.calculate_sparse_arrival_time(basin)
+        
+        self.save_arrival_time(basin.to_grid(arrival_time), basin.metadata, output_file)
+        return arrival_time
+    
+    def save_arrival_time(self, arrival_time: np.ndarray, metadata: GISMetadata, output_file: str):
+        """
+        洪水到達時間の配列を保存する
+        
+        Parameters:
+        -----------
+        arrival_time : np.ndarray
+            洪水到達時間の[x, y]配列
+        metadata : GISMetadata
+            配列のメタデータ
+        output_file : str
+            出力ファイルパス（拡張子が.npzの場合はNumPy形式、それ以外はASC形式）
+        """
+        self.gis_reader.metadata = metadata
+        if output_file.endswith('.npz'):
+            write_raster_npz(arrival_time, metadata, output_file)
+        else:
+            self.gis_reader.export_to_asc(arrival_time, output_file)
@@ -0,0 +1,196 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from ..models.metadata import GISMetadata
+from ..utils.geo_utils import calc_planar_distance
+
+class FlowNetworkIndex:
+    """
+    流向(D8)データ全体の流下ネットワークの索引
+    全セルの下流セル・トポロジカル順序・ネットワーク末端までの流下距離と、
+    前順序（preorder）での上流域（部分木）の範囲を1回の走査で作成する。
+    任意の地点の上流域と流下距離は部分木の範囲の切り出しのみで求まるため、
+    同じ河川上の複数の地点でも上流域を地点ごとに探索しなくてよい
+
+    セルの接続はBasinExtractor（extract_basin）と同じで、外周以外のセルの流向のみを使う。
+    循環する流向に含まれる・流れ込むセルは索引に含めない（upstream_cellsはNoneを返す）
+    """
+
+    # 索引の配列（共有メモリでの受け渡し用）
+    ARRAY_NAMES = ('downstream', 'topological_order', 'flow_length', 'preorder', 'preorder_index', 'subtree_size')
+
+    def __init__(self, metadata: GISMetadata, shape: Tuple[int, int], arrays: Dict[str, np.ndarray]):
+        """
+        作成済みの索引の配列から作成する（新規作成はbuildを使用）
+
+        Parameters:
+        -----------
+        metadata : GISMetadata
+            流向データのメタデータ
+        shape : Tuple[int, int]
+            ASCファイルの行列の向きの形状 (行数, 列数)
+        arrays : Dict[str, np.ndarray]
+            ARRAY_NAMESの各配列
+        """
+        self.metadata = metadata
+        self.shape = tuple(shape)
+        self.arrays = arrays
+        # 下流セルの通し番号（行 * 列数 + 列）。ネットワーク末端は-1
+        self.downstream = arrays['downstream']
+        # 下流から上流への順序（索引に含まれるセルのみ）
+        self.topological_order = arrays['topological_order']
+        # ネットワーク末端までの流下距離(m)
+        self.flow_length = arrays['flow_length']
+        # 前順序でのセルの並びと、各セルの位置（索引に含まれないセルは-1）・部分木のセル数
+        self.preorder = arrays['preorder']
+        self.preorder_index = arrays['preorder_index']
+        self.subtree_size = arrays['subtree_size']
+
+    @classmethod
+    def build(cls, dir_data: np.ndarray, metadata: GISMetadata) -> "FlowNetworkIndex":
+        """
+        流向データから索引を作成
+
+        Parameters:
+        -----------
+        dir_data : np.ndarray
+            流向データ（GISDataReader.read_gis_fileの戻り値）
+        metadata : GISMetadata
+            流向データのメタデータ
+
+        Returns:
+        --------
+        FlowNetworkIndex
+            流下ネットワークの索引
+        """
+        from .basin_extractor import BasinExtractor
+
+        raster = BasinExtractor._to_raster(dir_data)
+        ni, nj = raster.shape
+        n_cells = ni * nj
+        index_dtype = np.int32 if n_cells < 2**31 else np.int64
+
+        xll = metadata.xllcorner
+        yll = metadata.yllcorner
+        csize = metadata.cellsize
+
+        # 下流セルと下流セルまでの距離（外周セルは接続しない）
+        downstream = np.full(n_cells, -1, dtype=index_dtype)
+        step = np.zeros(n_cells)
+        interior = np.zeros((ni, nj), dtype=bool)
+        interior[1:-1, 1:-1] = True
+        for di, dj, direction in BasinExtractor.UPSTREAM_NEIGHBORS:
+            # セル(i, j)は流向directionで(i - di, j - dj)に流れ込む
+            ci, cj = np.nonzero(interior & (raster == direction))
+            pi, pj = ci - di, cj - dj
+            cells = ci * nj + cj
+            downstream[cells] = pi * nj + pj
+            # 経度は列番号(1始まり)を用いる（extract_basinの計算結果と一致させるため）
+            step[cells] = calc_planar_distance(
+                yll + csize * (ni - 1 - pi), xll + csize * pj,
+                yll + csize * (ni - 1 - ci), xll + csize * (cj + 1)
+            )
+
+        # ネットワーク末端から上流へ1段ずつたどり、段ごとのセルを記録
+        levels = cls.upstream_levels(downstream, np.flatnonzero(downstream < 0).astype(index_dtype))
+
+        # 部分木のセル数（上流側の段から集計）
+        subtree_size = np.ones(n_cells, dtype=index_dtype)
+        for level in reversed(levels[1:]):
+            np.add.at(subtree_size, downstream[level], subtree_size[level])
+
+        # 前順序での位置と流下距離（下流側の段から）
+        preorder_index = np.full(n_cells, -1, dtype=index_dtype)
+        flow_length = np.zeros(n_cells)
+        roots = levels[0]
+        preorder_index[roots] = np.cumsum(subtree_size[roots]) - subtree_size[roots]
+        for level in levels[1:]:
+            parents = downstream[level]
+            sizes = subtree_size[level]
+            cumsum = np.cumsum(sizes)
+            # 同じ下流セルの上流セルは連続して並ぶため、下流セルごとに累積して配置
+            group_first = np.flatnonzero(np.r_[True, parents[1:] != parents[:-1]])
+            group_offset = np.repeat(cumsum[group_first] - sizes[group_first],
+                                     np.diff(np.r_[group_first, level.size]))
+            preorder_index[level] = preorder_index[parents] + 1 + (cumsum - sizes - group_offset)
+            flow_length[level] = flow_length[parents] + step[level]
+
+        topological_order = np.concatenate(levels)
+        preorder = np.empty(topological_order.size, dtype=index_dtype)
+        preorder[preorder_index[topological_order]] = topological_order
+        # 循環に含まれるセルの部分木のセル数は使用しない
+        subtree_size[preorder_index < 0] = 0
+
+        return cls(metadata, (ni, nj), {
+            'downstream': downstream,
+            'topological_order': topological_order,
+            'flow_length': flow_length,
+            'preorder': preorder,
+            'preorder_index': preorder_index,
+            'subtree_size': subtree_size
+        })
+
+    @staticmethod
+    def upstream_levels(downstream: np.ndarray, roots: np.ndarray) -> List[np.ndarray]:
+        """
+        末端のセルから上流へ1段ずつたどり、段ごとのセルの一覧を作成
+        各段では同じ下流セルの上流セルが連続して並び、下流セルの順は前の段と同じ
+        
+        Parameters:
+        -----------
+        downstream : np.ndarray
+            セルごとの下流セルの番号（末端は-1）
+        roots : np.ndarray
+            末端のセルの番号
+        
+        Returns:
+        --------
+        List[np.ndarray]
+            段ごとのセルの番号（最初の段はroots）。循環する流向に含まれる・流れ込むセルは含まない
+        """
+        # 下流セルごとの上流セルの一覧（CSR形式）
+        child_cells = np.flatnonzero(downstream >= 0)
+        children = child_cells[np.argsort(downstream[child_cells], kind='stable')].astype(downstream.dtype)
+        n_children = np.bincount(downstream[child_cells], minlength=downstream.size)
+        child_start = np.cumsum(n_children) - n_children
+        
+        levels = [roots]
+        while True:
+            frontier = levels[-1]
+            counts = n_children[frontier]
+            total = int(counts.sum())
+            if total == 0:
+                break
+            offsets = np.repeat(child_start[frontier] - (np.cumsum(counts) - counts), counts)
+            levels.append(children[offsets + np.arange(total)])
+        return levels
+    
+    def upstream_cells(self, row: int, col: int) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        指定セルを流域末端とする上流域のセルと流下距離を取得
+
+        Parameters:
+        -----------
+        row : int
+            流域末端セルの行番号（北から、0始まり）
+        col : int
+            流域末端セルの列番号（西から、0始まり）
+
+        Returns:
+        --------
+        Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]
+            (行番号, 列番号, 流域末端までの流下距離(m))。
+            指定セルが循環する流向に含まれる・流れ込む場合はNone
+        """
+        cell = row * self.shape[1] + col
+        start = int(self.preorder_index[cell])
+        if start < 0:
+            return None
+
+        cells = self.preorder[start:start + int(self.subtree_size[cell])]
+        rows, cols = np.divmod(cells.astype(np.int64), self.shape[1])
+        return rows, cols, self.flow_length[cells] - self.flow_length[cell]
@@ -3,40 +3,103 @@
 # This software is released under the MIT License.
 # see https://opensource.org/licenses/MIT
 
+import dataclasses
 import numpy as np
-from typing import Dict
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
 from ..file_io.gis_reader import GISDataReader
+from ..file_io.binary_output import write_flow_csv, write_flow_npz, write_flow_stream
+from ..models.metadata import GISMetadata
+from ..models.grid_geometry import GridGeometry
+from ..models.basin_response import BasinResponse
+from ..models.sparse_basin import SparseBasin
+from ..utils.geo_utils import grid_cell_indices
 from .cell_size_calculator import CellSizeCalculator
+from .streaming_flow_accumulator import StreamingFlowAccumulator
 
 class RationalMethodCalculator:
     """合成合理式を使用して流量を計算するクラス"""
     
-    def __init__(self, gis_reader: GISDataReader):
+    # 土地利用別の流出係数
+    # 参考：中小河川計画検討会, 中小河川計画の手引き(案) H11.9 p.60
+    # データ参考：旭一岳・清水康行, RRIモデルを例とした流域治水推進に向けたデータ・解析ツールの整備・公開について, 河川技術論文集27, 2021.6
+    # https://www.jstage.jst.go.jp/article/river/27/0/27_PS3-22/_pdf
+    DEFAULT_RUNOFF_COEFFICIENTS = {
+        1: 0.7,  # 水田
+        2: 0.6,  # 畑地
+        3: 0.7,  # 山地
+        4: 0.8,  # 都市
+        5: 1.0   # 水域
+    }
+    # 上記以外の土地利用の流出係数
+    DEFAULT_RUNOFF_COEFFICIENT = 0.5
+    # セル面積の計算方法（mean: 領域全体の平均、row: 緯度ごと）
+    CELL_AREA_METHODS = ('mean', 'row')
+    
+    def __init__(self, gis_reader: GISDataReader, cell_area_method: str = 'mean',
+                 runoff_coefficients: Optional[Mapping[int, float]] = None,
+                 default_runoff_coefficient: Optional[float] = None,
+                 raster_metadata: Optional[GISMetadata] = None):
         """
         Parameters:
         -----------
         gis_reader : GISDataReader
             GISデータを読み込むためのリーダークラスのインスタンス
+        cell_area_method : str
+            セル面積の計算方法。'mean'は領域全体の平均面積（従来の計算）、
+            'row'は緯度ごとの面積を使用する
+        runoff_coefficients : Mapping[int, float], optional
+            土地利用種別ごとの流出係数（省略時は DEFAULT_RUNOFF_COEFFICIENTS）
+        default_runoff_coefficient : float, optional
+            runoff_coefficientsにない土地利用の流出係数（省略時は DEFAULT_RUNOFF_COEFFICIENT）
+        raster_metadata : GISMetadata, optional
+            流域を切り出した元のラスタのメタデータ（'row'の場合、緯度ごとの面積をラスタ全体で
+            1回だけ計算して各流域の範囲を取り出す。省略時は流域ごとに計算する）
         """
+        if cell_area_method not in self.CELL_AREA_METHODS:
+            raise ValueError(f"Invalid cell area method: {cell_area_method}")
         self.gis_reader = gis_reader
+        self.cell_area_method = cell_area_method
         self.arrival_time = None
         self.landuse = None
+        # 流域セルのみの形式の場合の各セルの (x, y) 番号（配列形式の場合はNone）
+        self.cells = None
         self.cell_calculator = CellSizeCalculator()
         self.dx = None
         self.dy = None
         self.cell_area = None
-        # 土地利用別の流出係数
-        # 参考：中小河川計画検討会, 中小河川計画の手引き(案) H11.9 p.60
-        # データ参考：旭一岳・清水康行, RRIモデルを例とした流域治水推進に向けたデータ・解析ツールの整備・公開について, 河川技術論文集27, 2021.6
-        # https://www.jstage.jst.go.jp/article/river/27/0/27_PS3-22/_pdf
-        self.runoff_coefficients = {
-            1: 0.7,  # 水田
-            2: 0.6,  # 畑地
-            3: 0.7,  # 山地
-            4: 0.8,  # 都市
-            5: 1.0   # 水域
-        }
+        # 緯度ごとのセル面積(m2)（cell_area_methodが'row'の場合のみ）
+        self.row_cell_areas = None
+        self.raster_metadata = raster_metadata
+        # 保存済みの流域応答（設定時は到達時間・土地利用データなしで流量を計算できる）
+        self.response = None
+        self.runoff_coefficients = self.normalize_runoff_coefficients(runoff_coefficients)
+        self.default_runoff_coefficient = float(
+            self.DEFAULT_RUNOFF_COEFFICIENT if default_runoff_coefficient is None else default_runoff_coefficient
+        )
     
+    @classmethod
+    def normalize_runoff_coefficients(cls, runoff_coefficients: Optional[Mapping[int, float]] = None
+                                      ) -> Dict[int, float]:
+        """
+        土地利用種別ごとの流出係数を検証し、{土地利用種別(int): 流出係数(float)} に変換する
+        
+        Parameters:
+        -----------
+        runoff_coefficients : Mapping[int, float], optional
+            土地利用種別ごとの流出係数。省略時は DEFAULT_RUNOFF_COEFFICIENTS
+        
+        Returns:
+        --------
+        Dict[int, float]
+            土地利用種別ごとの流出係数
+        """
+        if runoff_coefficients is None:
+            return dict(cls.DEFAULT_RUNOFF_COEFFICIENTS)
+        coefficients = {int(landuse_type): float(f) for landuse_type, f in runoff_coefficients.items()}
+        if any(landuse_type < 0 for landuse_type in coefficients):
+            raise ValueError(f"Landuse types must be non-negative integers: {sorted(coefficients)}")
+        return coefficients
+
     def load_data(self, arrival_time_file: str, landuse_file: str):
         """
         到達時間と土地利用データを読み込み、セルサイズを計算
@@ -49,18 +112,69 @@ class RationalMethodCalculator:
             土地利用データのファイルパス
         """
         # 到達時間データの読み込み
-        self.arrival_time, _, _ = self.gis_reader.read_gis_file(arrival_time_file)
+        arrival_time, _ = self.gis_reader.read_gis_file(arrival_time_file)
         
         # 土地利用データの読み込み
-        self.landuse, _, _ = self.gis_reader.read_gis_file(
+        landuse, _ = self.gis_reader.read_gis_file(
             landuse_file, 
             expected_metadata=self.gis_reader.metadata
         )
         
-        # セルサイズの計算
+        self.set_data(arrival_time, landuse, self.gis_reader.metadata)
+    
+    def set_data(self, arrival_time: np.ndarray, landuse: np.ndarray, metadata: GISMetadata):
+        """
+        計算済みの到達時間と土地利用データを設定し、セルサイズを計算
+        
+        Parameters:
+        -----------
+        arrival_time : np.ndarray
+            到達時間データ
+        landuse : np.ndarray
+            土地利用データ
+        metadata : GISMetadata
+            両データのメタデータ
+        """
+        if arrival_time.shape != landuse.shape:
+            raise ValueError(f"Invalid dimensions: arrival time {arrival_time.shape}, landuse {landuse.shape}")
+        
+        self.gis_reader.metadata = metadata
+        self.arrival_time = arrival_time
+        self.landuse = landuse
+        self.cells = None
+        self._calculate_cell_size()
+    
+    def set_sparse_data(self, arrival_time: np.ndarray, basin: SparseBasin):
+        """
+        流域セルごとの到達時間と流域データを設定し、セルサイズを計算
+        到達時間・土地利用は流域セルのみの配列のまま保持し、外接矩形の配列は作らない
+        
+        Parameters:
+        -----------
+        arrival_time : np.ndarray
+            流域セルごとの到達時間（FloodArrivalCalculator.calculate_sparse_arrival_timeの戻り値）
+        basin : SparseBasin
+            BasinExtractor.extract_sparseで抽出した流域データ
+        """
+        if arrival_time.shape != basin.landuse.shape:
+            raise ValueError(f"Invalid dimensions: arrival time {arrival_time.shape}, landuse {basin.landuse.shape}")
+        
+        self.gis_reader.metadata = basin.metadata
+        self.arrival_time = arrival_time
+        self.landuse = basin.landuse
+        self.cells = basin.cell_indices()
+        self._calculate_cell_size()
+    
+    def _calculate_cell_size(self):
+        """セルサイズの計算"""
         self.dx, self.dy, _, self.cell_area = self.cell_calculator.calculate_cell_size(
             self.gis_reader.metadata
         )
+        if self.cell_area_method == 'row':
+            _, _, self.row_cell_areas = self.cell_calculator.calculate_row_cell_sizes(
+                self.gis_reader.metadata,
+                self.raster_metadata
+            )
         
         print(f"Calculated cell sizes:")
         print(f"dx [m]: {self.dx:.2f}")
@@ -81,65 +195,410 @@ class RationalMethodCalculator:
         float
             流出係数
         """
-        return self.runoff_coefficients.get(landuse_type, 0.5)  # デフォルト値0.5
+        return self.runoff_coefficients.get(landuse_type, self.default_runoff_coefficient)
     
-    def calculate_flow(self, rainfall_data: Dict[float, float], dtq: float) -> Dict[float, float]:
+    def get_runoff_coefficient_grid(self) -> np.ndarray:
         """
-        合成合理式を使用して流量を計算
-        Q = 1/3.6 * f * r * A
+        土地利用配列全体から流出係数の配列を作成
+        土地利用種別を添字とする流出係数の参照配列から一括で取り出す
+        
+        Returns:
+        --------
+        np.ndarray
+            土地利用配列と同じ形状の流出係数配列
+        """
+        if self.landuse is None:
+            raise ValueError("Data must be loaded first")
+        
+        landuse_types = self.landuse.astype(np.int64)
+        max_type = max(self.runoff_coefficients, default=-1)
+        lookup = np.full(max_type + 2, self.default_runoff_coefficient)
+        for landuse_type, f in self.runoff_coefficients.items():
+            lookup[landuse_type] = f
+        # 参照配列の範囲外（欠測値等）の土地利用は最後の要素（既定の流出係数）
+        out_of_range = (landuse_types < 0) | (landuse_types > max_type)
+        return lookup[np.where(out_of_range, max_type + 1, landuse_types)]
+    
+    def get_cell_weights(self, valid_mask: np.ndarray) -> np.ndarray:
+        """
+        合成合理式 Q = 1/3.6 * f * r * A の r 以外の部分を有効セルごとに計算
         
+        Parameters:
+        -----------
+        valid_mask : np.ndarray
+            計算対象のセル
+        
+        Returns:
+        --------
+        np.ndarray
+            valid_maskのセルの 1/3.6 * f * A [m3/s per mm/h]
+        """
+        coefficients = self.get_runoff_coefficient_grid()[valid_mask]
+        if self.row_cell_areas is None:
+            # m²からkm²に変換
+            return (1/3.6) * coefficients * (self.cell_area / 1000000)
+        
+        _, cell_y = self._cell_coordinates(valid_mask)
+        return (1/3.6) * coefficients * (self.row_cell_areas[cell_y] / 1000000)
+    
+    def _cell_coordinates(self, valid_mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """valid_maskのセルの[x, y]配列での (x, y) 番号（valid_maskでの参照順）"""
+        if self.cells is None:
+            return np.nonzero(valid_mask)
+        cell_x, cell_y = self.cells
+        return cell_x[valid_mask], cell_y[valid_mask]
+    
+    def build_unit_hydrograph(self, dtq: float, phase: float = 0.0) -> np.ndarray:
+        """
+        到達時間ヒストグラム（単位図）を作成
+        各セルの 1/3.6 * f * A を到達時間の出力区間ごとに集計する
+        
+        Parameters:
+        -----------
+        dtq : float
+            出力する時間間隔(s)
+        phase : float
+            降雨時刻の出力区間内でのずれ(s)（0 <= phase < dtq）
+            
+        Returns:
+        --------
+        np.ndarray
+            区間 m に到達する寄与の合計 [m3/s per mm/h]
+            （降雨時刻 t = q*dtq + phase の雨量は区間 q + m に到達する）
+        """
+        if self.arrival_time is None or self.landuse is None:
+            raise ValueError("Data must be loaded first")
+        
+        nodata = self.gis_reader.metadata.nodata
+        valid_mask = (self.arrival_time != nodata) & (self.landuse != nodata)
+        
+        # 合成合理式 Q = 1/3.6 * f * r * A の r 以外の部分
+        weights = self.get_cell_weights(valid_mask)
+        bins = np.floor((phase + self.arrival_time[valid_mask]) / dtq).astype(np.int64)
+        
+        if bins.size == 0:
+            return np.zeros(0)
+        return np.bincount(bins, weights=weights)
+    
+    @staticmethod
+    def rainfall_phases(times: np.ndarray, dtq: float) -> np.ndarray:
+        """
+        降雨時刻の出力区間内でのずれ(s)の一覧を取得
+        
+        Parameters:
+        -----------
+        times : np.ndarray
+            降雨時刻(s)
+        dtq : float
+            出力する時間間隔(s)
+        
+        Returns:
+        --------
+        np.ndarray
+            重複のない phase (降雨時刻 t = q*dtq + phase)
+        """
+        times = np.asarray(times, dtype=float)
+        return np.unique(times - np.floor(times / dtq) * dtq)
+    
+    def build_response(self, dtq: float, phases) -> BasinResponse:
+        """
+        到達時間・土地利用データから流域応答を作成
+        
+        Parameters:
+        -----------
+        dtq : float
+            出力する時間間隔(s)
+        phases : array_like
+            作成する降雨時刻の出力区間内でのずれ(s)
+        
+        Returns:
+        --------
+        BasinResponse
+            phaseごとの到達時間ヒストグラム
+        """
+        if self.arrival_time is None or self.landuse is None:
+            raise ValueError("Data must be loaded first")
+        
+        nodata = self.gis_reader.metadata.nodata
+        max_arrival_time = np.max(self.arrival_time[self.arrival_time != nodata])
+        return BasinResponse(
+            dtq=float(dtq),
+            max_arrival_time=float(max_arrival_time),
+            unit_hydrographs={
+                float(phase): self.build_unit_hydrograph(dtq, phase)
+                for phase in phases
+            }
+        )
+    
+    def set_response(self, response: BasinResponse):
+        """
+        保存済みの流域応答を設定（到達時間・土地利用データの読み込みは不要）
+        
+        Parameters:
+        -----------
+        response : BasinResponse
+            流域応答
+        """
+        self.response = response
+    
+    def _get_response(self, dtq: float, phases: np.ndarray) -> BasinResponse:
+        """設定済みの流域応答が使える場合はそれを、使えない場合は作成して返す"""
+        if (self.response is not None and self.response.dtq == float(dtq)
+                and self.response.has_phases(phases)):
+            return self.response
+        return self.build_response(dtq, phases)
+    
+    def calculate_flow_array(self, rainfall_data: Dict[float, float], dtq: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        合成合理式を使用して流量を計算（配列版）
+        到達時間ヒストグラムと雨量時系列の畳み込みで全セルの寄与を一括計算する
+
         Parameters:
         -----------
         rainfall_data : Dict[float, float]
             時刻と雨量のディクショナリ {時刻(s): 雨量(mm/h)}
         dtq : float
             出力する時間間隔(s)
-            
+
         Returns:
         --------
-        Dict[float, float]
-            時刻と流量のディクショナリ {時刻(s): 流量(m3/s)}
+        Tuple[np.ndarray, np.ndarray]
+            (出力時刻(s), 流量(m3/s))
+        """
+        times = np.array(sorted(rainfall_data.keys()), dtype=float)
+        rainfall = np.array([rainfall_data[t] for t in times], dtype=float)
+
+        output_times, flows = self._convolve_rainfall(times, rainfall[np.newaxis, :], dtq)
+        return output_times, flows[0]
+
+    def calculate_ensemble_flow(self, times: np.ndarray, rainfall: np.ndarray, dtq: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        アンサンブル降雨の全メンバーの流量を一括で計算
+        到達時間ヒストグラムは1回だけ作成し、全メンバーの雨量と同時に畳み込む
+
+        Parameters:
+        -----------
+        times : np.ndarray
+            降雨時刻(s) (時刻数,)
+        rainfall : np.ndarray
+            雨量(mm/h) (メンバー数, 時刻数)
+        dtq : float
+            出力する時間間隔(s)
+
+        Returns:
+        --------
+        Tuple[np.ndarray, np.ndarray]
+            (出力時刻(s), 流量(m3/s) (メンバー数, 出力時刻数))
+        """
+        times = np.asarray(times, dtype=float)
+        rainfall = np.atleast_2d(np.asarray(rainfall, dtype=float))
+        if rainfall.shape[1] != times.size:
+            raise ValueError(f"Invalid rainfall shape: expected (members, {times.size}), got {rainfall.shape}")
+
+        order = np.argsort(times, kind='stable')
+        return self._convolve_rainfall(times[order], rainfall[:, order], dtq)
+
+    def stream_flow(self, rainfall: Iterable[Tuple[float, float]], dtq: float) -> Iterator[Tuple[float, float]]:
+        """
+        雨量を1時刻ずつ受け取り、確定した出力時刻の流量を順次返す
+        結果は calculate_flow_array と同じで、使用メモリは最大到達時間分のみ
+        
+        Parameters:
+        -----------
+        rainfall : Iterable[Tuple[float, float]]
+            時刻順の (時刻(s), 雨量(mm/h))
+        dtq : float
+            出力する時間間隔(s)
+        
+        Yields:
+        -------
+        Tuple[float, float]
+            (出力時刻(s), 流量(m3/s))
+        """
+        # 到達時間データがある場合は、流域応答にないphaseのヒストグラムを必要時に作成する
+        builder = None
+        if self.arrival_time is not None and self.landuse is not None:
+            builder = lambda phase: self.build_unit_hydrograph(dtq, phase)
+        accumulator = StreamingFlowAccumulator(self._get_response(dtq, []), builder)
+        
+        for time, value in rainfall:
+            for output_time, flow in zip(*accumulator.push(time, value)):
+                yield float(output_time), float(flow)
+        for output_time, flow in zip(*accumulator.finish()):
+            yield float(output_time), float(flow)
+    
+    def calculate_gridded_flow(self, frames: Iterable[Tuple[float, np.ndarray, GISMetadata]],
+                               dtq: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        格子雨量（レーダー雨量等）を使用して流量を計算
+        雨量の格子は流域の格子と異なってよく、最近傍法で流域の各セルに割り当てる
+        （割り当ては雨量の格子ごとに1回のみ）。各時刻の雨量はセルごとの
+        到達時間の出力区間で集計して加算するため、全時刻の雨量を保持しない
+        
+        Parameters:
+        -----------
+        frames : Iterable[Tuple[float, np.ndarray, GISMetadata]]
+            (時刻(s), 雨量(mm/h) データ配列[x, y], 格子のメタデータ) の並び
+        dtq : float
+            出力する時間間隔(s)
+        
+        Returns:
+        --------
+        Tuple[np.ndarray, np.ndarray]
+            (出力時刻(s), 流量(m3/s))
         """
         if self.arrival_time is None or self.landuse is None:
             raise ValueError("Data must be loaded first")
         
         nodata = self.gis_reader.metadata.nodata
+        valid_mask = (self.arrival_time != nodata) & (self.landuse != nodata)
+        max_arrival_time = np.max(self.arrival_time[self.arrival_time != nodata])
+        
+        # 合成合理式 Q = 1/3.6 * f * r * A の r 以外の部分
+        weights = self.get_cell_weights(valid_mask)
+        arrival_time = self.arrival_time[valid_mask]
+        
+        # 流域の各セルの中心座標
+        cell_x, cell_y = self._cell_coordinates(valid_mask)
+        cell_lon, cell_lat = GridGeometry.from_metadata(self.gis_reader.metadata).coords(cell_x + 0.5, cell_y + 0.5)
+        
+        # 雨量の格子ごとのセルの割り当てと、phaseごとの到達区間
+        sampling = {}
+        bins_by_phase = {}
+        
+        flows = np.zeros(0)
+        max_time = None
+        for time, frame, frame_metadata in frames:
+            grid_key = dataclasses.astuple(frame_metadata)
+            if grid_key not in sampling:
+                sampling[grid_key] = grid_cell_indices(
+                    GridGeometry.from_metadata(frame_metadata), cell_lon, cell_lat
+                )
+                if not sampling[grid_key][2].all():
+                    print("Warning: rainfall grid does not cover the basin; uncovered cells are treated as 0 mm/h")
+            x_index, y_index, inside = sampling[grid_key]
+            
+            rainfall = np.where(inside, frame[x_index, y_index], 0.0)
+            rainfall[rainfall == frame_metadata.nodata] = 0.0
+            
+            # 降雨時刻 t = q*dtq + phase の寄与は区間 q + (到達区間) に加算
+            q = int(np.floor(time / dtq))
+            phase = time - q * dtq
+            if phase not in bins_by_phase:
+                bins_by_phase[phase] = np.floor((phase + arrival_time) / dtq).astype(np.int64)
+            contribution = np.bincount(bins_by_phase[phase], weights=weights * rainfall)
+            
+            if q < 0:
+                contribution = contribution[-q:]
+                q = 0
+            end = q + contribution.size
+            if end > flows.size:
+                flows = np.concatenate([flows, np.zeros(max(end - flows.size, flows.size))])
+            flows[q:end] += contribution
+            max_time = time if max_time is None else max(max_time, time)
+        
+        if max_time is None:
+            raise ValueError("No rainfall grids")
+        
+        # 出力時刻の設定
+        output_times = np.arange(0, max_time + max_arrival_time + dtq, dtq)
+        result = np.zeros(len(output_times))
+        n = min(result.size, flows.size)
+        result[:n] = flows[:n]
+        return output_times, result
+    
+    def _convolve_rainfall(self, times: np.ndarray, rainfall: np.ndarray, dtq: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        到達時間ヒストグラムと雨量時系列（複数系列）を畳み込む
+
+        Parameters:
+        -----------
+        times : np.ndarray
+            昇順の降雨時刻(s) (時刻数,)
+        rainfall : np.ndarray
+            雨量(mm/h) (系列数, 時刻数)
+        dtq : float
+            出力する時間間隔(s)
+
+        Returns:
+        --------
+        Tuple[np.ndarray, np.ndarray]
+            (出力時刻(s), 流量(m3/s) (系列数, 出力時刻数))
+        """
+        # 降雨時刻を t = q*dtq + phase に分解し、phaseごとに畳み込む
+        # （通常は降雨時刻がdtqの倍数のため phase = 0 の1回のみ）
+        steps = np.floor(times / dtq).astype(np.int64)
+        phases = times - steps * dtq
+        response = self._get_response(dtq, np.unique(phases))
         
         # 計算時間の設定
-        times = np.array(sorted(rainfall_data.keys()))
         max_time = max(times)
-        max_arrival_time = np.max(self.arrival_time[self.arrival_time != nodata])
-        total_time = max_time + max_arrival_time
-        
+        total_time = max_time + response.max_arrival_time
+
         # 出力時刻の設定
         output_times = np.arange(0, total_time + dtq, dtq)
-        flow_results = {t: 0.0 for t in output_times}
+        flows = np.zeros((rainfall.shape[0], len(output_times)))
         
-        # 有効なセルのマスク
-        valid_mask = (self.arrival_time != nodata) & (self.landuse != nodata)
+        for phase in np.unique(phases):
+            in_phase = phases == phase
+            unit_hydrograph = response.unit_hydrographs[float(phase)]
+            if unit_hydrograph.size == 0:
+                continue
+
+            # phase内の雨量を区間番号順の密な系列に展開
+            q = steps[in_phase]
+            q_min = q.min()
+            rain_series = np.zeros((rainfall.shape[0], q.max() - q_min + 1))
+            np.add.at(rain_series, (slice(None), q - q_min), rainfall[:, in_phase])
+
+            # 畳み込み結果の区間 k = q_min + index のうち出力範囲内のみ加算
+            contribution = self._convolve_rows(rain_series, unit_hydrograph)
+            k_start = max(q_min, 0)
+            k_end = min(q_min + contribution.shape[1], flows.shape[1])
+            if k_start < k_end:
+                flows[:, k_start:k_end] += contribution[:, k_start - q_min:k_end - q_min]
+
+        return output_times, flows
+
+    @staticmethod
+    def _convolve_rows(series: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+        """
+        2次元配列の各行とカーネルの畳み込み（np.convolveの行ごとの一括版）
+        ループは行の長さとカーネル長の短い方のみで、各回の計算は全行を一括で行う
+        """
+        if series.shape[0] == 1:
+            return np.convolve(series[0], kernel)[np.newaxis, :]
+
+        n_series, n_steps = series.shape
+        result = np.zeros((n_series, n_steps + kernel.size - 1))
+        if kernel.size <= n_steps:
+            for m, weight in enumerate(kernel):
+                if weight != 0.0:
+                    result[:, m:m + n_steps] += weight * series
+        else:
+            for q in range(n_steps):
+                result[:, q:q + kernel.size] += series[:, q:q + 1] * kernel
+        return result
+
+    def calculate_flow(self, rainfall_data: Dict[float, float], dtq: float) -> Dict[float, float]:
+        """
+        合成合理式を使用して流量を計算
+        Q = 1/3.6 * f * r * A
         
-        # 各セルの寄与を計算
-        for i in range(self.arrival_time.shape[0]):
-            for j in range(self.arrival_time.shape[1]):
-                if valid_mask[i, j]:
-                    # セルの特性を取得
-                    arrival_t = self.arrival_time[i, j]
-                    f = self.get_runoff_coefficient(int(self.landuse[i, j]))
-                    
-                    # 各時刻での流量を計算
-                    for t, r in rainfall_data.items():
-                        # 到達時刻を計算
-                        reach_time = t + arrival_t
-                        
-                        # 対応する出力時刻を見つける
-                        output_t = dtq * np.floor(reach_time / dtq)
-                        if output_t in flow_results:
-                            # 合成合理式による流量計算
-                            # Q = 1/3.6 * f * r * A
-                            dq = (1/3.6) * f * r * (self.cell_area / 1000000)  # m²からkm²に変換
-                            flow_results[output_t] += dq
-        
-        return flow_results
+        Parameters:
+        -----------
+        rainfall_data : Dict[float, float]
+            時刻と雨量のディクショナリ {時刻(s): 雨量(mm/h)}
+        dtq : float
+            出力する時間間隔(s)
+            
+        Returns:
+        --------
+        Dict[float, float]
+            時刻と流量のディクショナリ {時刻(s): 流量(m3/s)}
+        """
+        output_times, flows = self.calculate_flow_array(rainfall_data, dtq)
+        return dict(zip(output_times, flows))
 
     def export_results(self, flow_results: Dict[float, float], output_file: str):
         """
@@ -152,11 +611,69 @@ class RationalMethodCalculator:
         output_file : str
             出力ファイルパス
         """
-        with open(output_file, 'w') as f:
-            f.write('Time(s),Flow(m3/s)\n')
-            for t in sorted(flow_results.keys()):
-                f.write(f'{t:.1f},{flow_results[t]:.6f}\n')
+        output_times = sorted(flow_results.keys())
+        write_flow_csv(output_times, [flow_results[t] for t in output_times], output_file)
+    
+    def export_flow_array(self, output_times: np.ndarray, flows: np.ndarray, output_file: str):
+        """
+        計算結果を出力（拡張子が.npzの場合はNumPy形式、それ以外はCSV）
+        
+        Parameters:
+        -----------
+        output_times : np.ndarray
+            出力時刻(s)
+        flows : np.ndarray
+            流量(m3/s)
+        output_file : str
+            出力ファイルパス
+        """
+        if output_file.endswith('.npz'):
+            write_flow_npz(output_times, flows, output_file)
+        else:
+            write_flow_csv(output_times, flows, output_file)
 
+    def export_results_stream(self, flow_results: Iterable[Tuple[float, float]], output_file: str) -> int:
+        """
+        計算結果を確定した時刻から順次出力（拡張子が.npzの場合はNumPy形式、それ以外はCSV）
+        流量は保持しないため、使用メモリは時系列長によらない
+        
+        Parameters:
+        -----------
+        flow_results : Iterable[Tuple[float, float]]
+            時刻順の (時刻(s), 流量(m3/s))
+        output_file : str
+            出力ファイルパス
+        
+        Returns:
+        --------
+        int
+            出力した時刻数
+        """
+        return write_flow_stream(flow_results, output_file)
+    
+    def export_ensemble_results(self, output_times: np.ndarray, flows: np.ndarray, members: List[str], output_file: str):
+        """
+        アンサンブル計算結果を圧縮したNumPy形式(.npz)で出力
+        
+        Parameters:
+        -----------
+        output_times : np.ndarray
+            出力時刻(s) (出力時刻数,)
+        flows : np.ndarray
+            流量(m3/s) (メンバー数, 出力時刻数)
+        members : List[str]
+            メンバー名
+        output_file : str
+            出力ファイルパス
+        """
+        with open(output_file, 'wb') as f:
+            np.savez_compressed(
+                f,
+                time=np.asarray(output_times, dtype=float),
+                flow=np.asarray(flows, dtype=float),
+                members=np.asarray(members, dtype=str)
+            )
+    
     def get_total_area(self) -> float:
         """
         有効なセルの総面積を計算
@@ -169,5 +686,7 @@ class RationalMethodCalculator:
         if self.landuse is None:
             raise ValueError("Data must be loaded first")
             
-        valid_cells = np.sum(self.landuse != self.gis_reader.metadata.nodata)
-        return valid_cells * self.cell_area
+        valid_mask = self.landuse != self.gis_reader.metadata.nodata
+        if self.row_cell_areas is not None:
+            return float(np.sum(self.row_cell_areas[self._cell_coordinates(valid_mask)[1]]))
+        return np.sum(valid_mask) * self.cell_area
@@ -0,0 +1,155 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+import math
+import numpy as np
+from typing import Tuple
+from ..models.metadata import GISMetadata
+from ..models.grid_geometry import GridGeometry
+from ..models.snapped_points import SnappedPoints
+from ..utils.geo_utils import calc_planar_distance, EARTH_RADIUS
+
+class RiverCellIndex:
+    """
+    上流ピクセル数が閾値を超えるセル（河川セル）の索引
+    全ての解析地点を一括で河川セルに割り当てる。地点を含むセルが河川セルの場合はそのセル
+    （find_nearest_point_dataと同じ判定）、そうでない場合は探索半径内で最も近い河川セルに割り当てる
+    河川セルは粗い格子（BUCKET_CELLS×BUCKET_CELLSセル）ごとにまとめて保持し、
+    探索は探索範囲に重なる粗い格子内の河川セルのみを対象とする
+    """
+    BUCKET_CELLS = 32
+
+    def __init__(self, upg_data: np.ndarray, metadata: GISMetadata, threshold: float):
+        """
+        Parameters:
+        -----------
+        upg_data : np.ndarray
+            上流ピクセル数（GISDataReader.read_gis_fileの戻り値）
+        metadata : GISMetadata
+            上流ピクセル数のメタデータ
+        threshold : float
+            河川セル判定閾値
+        """
+        self.upg_data = upg_data
+        self.grid = GridGeometry.from_metadata(metadata)
+        self.threshold = threshold
+        self.river = upg_data > threshold
+        
+        # 河川セルの通し番号（x * ny + y）を粗い格子の番号順（粗い格子内では通し番号の昇順）に並べる
+        ny = self.grid.ny
+        self.n_buckets = (
+            -(-self.grid.nx // self.BUCKET_CELLS),
+            -(-ny // self.BUCKET_CELLS)
+        )
+        cells = np.flatnonzero(self.river)
+        cx, cy = np.divmod(cells, ny)
+        bucket = (cx // self.BUCKET_CELLS) * self.n_buckets[1] + cy // self.BUCKET_CELLS
+        order = np.argsort(bucket, kind='stable')
+        self.cells = cells[order]
+        # 粗い格子ごとの河川セルの範囲 cells[bucket_start[b]:bucket_start[b + 1]]
+        self.bucket_start = np.searchsorted(bucket[order], np.arange(self.n_buckets[0] * self.n_buckets[1] + 1))
+
+    def snap(self, lon, lat, radius: float = 0.0) -> SnappedPoints:
+        """
+        解析地点を河川セルに割り当てる
+
+        Parameters:
+        -----------
+        lon, lat : array_like
+            解析地点の経度、緯度（度）
+        radius : float
+            地点を含むセルが河川セルでない場合の探索半径(m)。0の場合は探索しない
+
+        Returns:
+        --------
+        SnappedPoints
+            地点ごとの割り当て結果
+        """
+        grid = self.grid
+        lon = np.atleast_1d(np.asarray(lon, dtype=float))
+        lat = np.atleast_1d(np.asarray(lat, dtype=float))
+
+        # 地点を含むセル（find_nearest_point_dataと同じインデックスの計算）
+        x_index = np.ceil((lon - grid.xllcorner) / grid.cellsize).astype(np.int64) - 1
+        y_index = np.ceil((lat - grid.yllcorner) / grid.cellsize).astype(np.int64) - 1
+        inside = (x_index >= 0) & (x_index < grid.nx) & (y_index >= 0) & (y_index < grid.ny)
+        x_clip = np.clip(x_index, 0, grid.nx - 1)
+        y_clip = np.clip(y_index, 0, grid.ny - 1)
+
+        value = np.where(inside, self.upg_data[x_clip, y_clip], np.nan)
+        found = inside & self.river[x_clip, y_clip]
+        best_x = np.where(found, x_index, -1)
+        best_y = np.where(found, y_index, -1)
+        best_distance = np.where(found, 0.0, np.inf)
+
+        pending = np.flatnonzero(~found)
+        if radius > 0 and pending.size > 0:
+            # 探索範囲のセル数（経度方向は地点の緯度で判定）
+            cell_length = math.radians(grid.cellsize) * EARTH_RADIUS
+            ky = int(math.ceil(radius / cell_length)) + 1
+            kx = np.ceil(
+                radius / (cell_length * np.maximum(np.cos(np.radians(lat[pending])), 1e-6))
+            ).astype(np.int64) + 1
+            owner, candidates = self._candidates(
+                x_index[pending] - kx, x_index[pending] + kx,
+                y_index[pending] - ky, y_index[pending] + ky
+            )
+            if candidates.size > 0:
+                cx, cy = np.divmod(candidates, grid.ny)
+                center_lon, center_lat = grid.coords(cx + 0.5, cy + 0.5)
+                k = pending[owner]
+                distance = calc_planar_distance(lat[k], lon[k], center_lat, center_lon)
+                # 地点ごとに最も近いセル（距離が等しい場合は通し番号の小さいセル）
+                order = np.lexsort((candidates, distance, owner))
+                first = order[np.r_[True, owner[order[1:]] != owner[order[:-1]]]]
+                nearest = first[distance[first] <= radius]
+                best_x[k[nearest]] = cx[nearest]
+                best_y[k[nearest]] = cy[nearest]
+                best_distance[k[nearest]] = distance[nearest]
+
+        return SnappedPoints(
+            x_index=best_x,
+            y_index=best_y,
+            value=value,
+            distance=best_distance,
+            found=best_x >= 0,
+            snapped=(best_x >= 0) & ~found
+        )
+    
+    def _candidates(self, x0: np.ndarray, x1: np.ndarray,
+                    y0: np.ndarray, y1: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        範囲（両端を含む）ごとに、範囲に重なる粗い格子内の河川セルを全範囲分まとめて取り出す
+        
+        Parameters:
+        -----------
+        x0, x1, y0, y1 : np.ndarray
+            範囲ごとの探索範囲のセル番号（格子の範囲外を含んでもよい）
+        
+        Returns:
+        --------
+        Tuple[np.ndarray, np.ndarray]
+            (範囲の番号, 河川セルの通し番号)
+        """
+        nx, ny = self.grid.nx, self.grid.ny
+        x0, x1 = np.maximum(x0, 0), np.minimum(x1, nx - 1)
+        y0, y1 = np.maximum(y0, 0), np.minimum(y1, ny - 1)
+        valid = (x0 <= x1) & (y0 <= y1)
+        bx0 = np.where(valid, x0 // self.BUCKET_CELLS, 0)
+        n_bx = np.where(valid, x1 // self.BUCKET_CELLS - bx0 + 1, 0)
+        # 同じx方向の番号の粗い格子は連続して並ぶため、範囲・x方向の番号ごとに1区間
+        part_owner = np.repeat(np.arange(x0.size), n_bx)
+        bx = bx0[part_owner] + _ragged_arange(n_bx)
+        start = self.bucket_start[bx * self.n_buckets[1] + y0[part_owner] // self.BUCKET_CELLS]
+        stop = self.bucket_start[bx * self.n_buckets[1] + y1[part_owner] // self.BUCKET_CELLS + 1]
+        lengths = stop - start
+        owner = np.repeat(part_owner, lengths)
+        return owner, self.cells[np.repeat(start, lengths) + _ragged_arange(lengths)]
+
+def _ragged_arange(lengths: np.ndarray) -> np.ndarray:
+    """長さlengths[i]の区間ごとの0始まりの連番を連結した配列"""
+    total = int(lengths.sum())
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.arange(total, dtype=np.int64) - offsets
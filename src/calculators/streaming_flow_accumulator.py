@@ -0,0 +1,153 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+import math
+import numpy as np
+from typing import Callable, Dict, Optional, Tuple
+from ..models.basin_response import BasinResponse
+
+class StreamingFlowAccumulator:
+    """
+    雨量を1時刻ずつ受け取り、確定した出力区間の流量を順次出力するクラス
+    未確定の流量は最大到達時間分の長さのリングバッファに保持するため、
+    使用メモリは雨量の時系列長によらない
+    """
+
+    def __init__(self, response: BasinResponse,
+                 unit_hydrograph_builder: Optional[Callable[[float], np.ndarray]] = None):
+        """
+        Parameters:
+        -----------
+        response : BasinResponse
+            流域応答（到達時間ヒストグラム）
+        unit_hydrograph_builder : Optional[Callable[[float], np.ndarray]]
+            流域応答にないphaseの到達時間ヒストグラムを作成する関数
+        """
+        self.response = response
+        self.dtq = response.dtq
+        self.unit_hydrograph_builder = unit_hydrograph_builder
+        # phase < dtq のため、到達区間は floor((dtq + 最大到達時間) / dtq) 未満
+        self.buffer_size = int(math.floor((self.dtq + response.max_arrival_time) / self.dtq)) + 1
+        self.buffer = np.zeros(self.buffer_size)
+        # 出力済みの区間数（次に出力する区間番号）
+        self.emitted = 0
+        self.last_time = None
+
+    def _unit_hydrograph(self, phase: float) -> np.ndarray:
+        """phaseの到達時間ヒストグラムを取得（ない場合は作成して保持）"""
+        phase = float(phase)
+        if phase not in self.response.unit_hydrographs:
+            if self.unit_hydrograph_builder is None:
+                raise ValueError(f"Basin response has no unit hydrograph for phase {phase}")
+            self.response.unit_hydrographs[phase] = self.unit_hydrograph_builder(phase)
+        return self.response.unit_hydrographs[phase]
+
+    def _emit_until(self, end: int) -> Tuple[np.ndarray, np.ndarray]:
+        """区間 end の手前までを確定として出力し、バッファから取り除く"""
+        n_emit = max(end - self.emitted, 0)
+        flows = np.zeros(n_emit)
+        n_buffered = min(n_emit, self.buffer_size)
+        index = (self.emitted + np.arange(n_buffered)) % self.buffer_size
+        flows[:n_buffered] = self.buffer[index]
+        self.buffer[index] = 0.0
+
+        output_times = (self.emitted + np.arange(n_emit)) * self.dtq
+        self.emitted += n_emit
+        return output_times, flows
+
+    def push(self, time: float, rainfall: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        1時刻分の雨量を加算し、確定した区間の流量を返す
+
+        Parameters:
+        -----------
+        time : float
+            降雨時刻(s)（前回以上であること）
+        rainfall : float
+            雨量(mm/h)
+
+        Returns:
+        --------
+        Tuple[np.ndarray, np.ndarray]
+            (確定した出力時刻(s), 流量(m3/s))
+        """
+        if self.last_time is not None and time < self.last_time:
+            raise ValueError(f"Rainfall times must be in ascending order: {time} after {self.last_time}")
+        self.last_time = time
+
+        # 降雨時刻 t = q*dtq + phase の雨量は区間 q 以降にのみ到達するため、q より前は確定
+        q = int(math.floor(time / self.dtq))
+        phase = time - q * self.dtq
+        output = self._emit_until(q)
+
+        unit_hydrograph = self._unit_hydrograph(phase)
+        if unit_hydrograph.size > self.buffer_size:
+            raise ValueError("Unit hydrograph is longer than the maximum arrival time")
+        # 時刻0より前の区間への寄与は出力しない
+        skip = max(self.emitted - q, 0)
+        index = (q + np.arange(skip, unit_hydrograph.size)) % self.buffer_size
+        self.buffer[index] += rainfall * unit_hydrograph[skip:]
+        return output
+
+    def pending(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        未確定の区間の流量（以降の降雨を0とした予測値）を取得する（状態は変更しない）
+
+        Returns:
+        --------
+        Tuple[np.ndarray, np.ndarray]
+            (出力時刻(s), 流量(m3/s))
+        """
+        index = (self.emitted + np.arange(self.buffer_size)) % self.buffer_size
+        output_times = (self.emitted + np.arange(self.buffer_size)) * self.dtq
+        return output_times, self.buffer[index].copy()
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """
+        途中状態を取得する（restoreで再開できる）
+
+        Returns:
+        --------
+        Dict[str, np.ndarray]
+            リングバッファ、出力済みの区間数、最終降雨時刻
+        """
+        return {
+            'dtq': np.float64(self.dtq),
+            'buffer': self.buffer.copy(),
+            'emitted': np.int64(self.emitted),
+            'last_time': np.float64(np.nan if self.last_time is None else self.last_time)
+        }
+
+    def restore(self, state: Dict[str, np.ndarray]):
+        """
+        get_stateで取得した途中状態から再開する
+
+        Parameters:
+        -----------
+        state : Dict[str, np.ndarray]
+            途中状態
+        """
+        buffer = np.asarray(state['buffer'], dtype=float)
+        if float(state['dtq']) != self.dtq or buffer.size != self.buffer_size:
+            raise ValueError("State does not match the basin response")
+        self.buffer = buffer.copy()
+        self.emitted = int(state['emitted'])
+        last_time = float(state['last_time'])
+        self.last_time = None if np.isnan(last_time) else last_time
+
+    def finish(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        残りの区間の流量を出力する
+        出力時刻は最終降雨時刻 + 最大到達時間まで（一括計算と同じ）
+
+        Returns:
+        --------
+        Tuple[np.ndarray, np.ndarray]
+            (出力時刻(s), 流量(m3/s))
+        """
+        if self.last_time is None:
+            raise ValueError("No rainfall data")
+        n_output = len(np.arange(0, self.last_time + self.response.max_arrival_time + self.dtq, self.dtq))
+        return self._emit_until(n_output)
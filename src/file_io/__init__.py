@@ -1,5 +1,15 @@
 from .gis_reader import GISDataReader
 from .config_manager import ConfigManager
-from .file_utils import read_rainfall_data
+from .file_utils import (read_rainfall_data, iter_rainfall_data, read_rainfall_ensemble, iter_rainfall_grids,
+                         read_rainfall_grid_index, read_rainfall_grids)
+from .workspace import PointWorkspace
+from .response_store import BasinResponseStore
+from .nowcast_store import NowcastStateStore
+from .run_manifest import RunManifest
+from .binary_output import (write_flow_csv, write_flow_npz, read_flow_npz, write_raster_npz, read_raster_npz,
+                            convert_to_text)
 
-__all__ = ['GISDataReader', 'ConfigManager', 'read_rainfall_data']
+__all__ = ['GISDataReader', 'ConfigManager', 'read_rainfall_data', 'iter_rainfall_data', 'read_rainfall_ensemble',
+           'iter_rainfall_grids', 'PointWorkspace', 'BasinResponseStore', 'NowcastStateStore', 'write_flow_csv',
+           'write_flow_npz', 'read_flow_npz', 'write_raster_npz', 'read_raster_npz', 'convert_to_text',
+           'read_rainfall_grid_index', 'read_rainfall_grids', 'RunManifest']
@@ -0,0 +1,351 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+import os
+import shutil
+import zipfile
+import dataclasses
+import itertools
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+from .gis_reader import GISDataReader
+from ..models.metadata import GISMetadata
+
+# 出力形式（csv: CSV/ASC、npz: NumPy形式、parquet: マージ結果のみParquet形式・他はNumPy形式）
+OUTPUT_FORMATS = ('csv', 'npz', 'parquet')
+
+# 逐次出力・読み込みで1回に扱う値の数
+STREAM_CHUNK_SIZE = 65536
+
+def write_flow_csv(output_times: np.ndarray, flows: np.ndarray, output_file: str):
+    """
+    流量をCSVファイルとして出力
+
+    Parameters:
+    -----------
+    output_times : np.ndarray
+        出力時刻(s)
+    flows : np.ndarray
+        流量(m3/s)
+    output_file : str
+        出力ファイルパス
+    """
+    with open(output_file, 'w') as f:
+        f.write('Time(s),Flow(m3/s)\n')
+        f.writelines(f'{t:.1f},{flow:.6f}\n' for t, flow in zip(output_times, flows))
+
+def write_flow_npz(output_times: np.ndarray, flows: np.ndarray, output_file: str):
+    """流量をNumPy形式(.npz)で出力（丸めなし）"""
+    with open(output_file, 'wb') as f:
+        np.savez(f, time=np.asarray(output_times, dtype=float), flow=np.asarray(flows, dtype=float))
+
+def write_flow_stream(flow_results: Iterable[Tuple[float, float]], output_file: str) -> int:
+    """
+    流量を確定した時刻から順次出力する（拡張子が.npzの場合はNumPy形式、それ以外はCSV）
+    使用メモリは時系列長によらない（NumPy形式は一時ファイルに書き出してから格納する）
+    
+    Parameters:
+    -----------
+    flow_results : Iterable[Tuple[float, float]]
+        時刻順の (時刻(s), 流量(m3/s))
+    output_file : str
+        出力ファイルパス
+    
+    Returns:
+    --------
+    int
+        出力した時刻数
+    """
+    if not output_file.endswith('.npz'):
+        n_values = 0
+        with open(output_file, 'w') as f:
+            f.write('Time(s),Flow(m3/s)\n')
+            for chunk in _chunks(flow_results, STREAM_CHUNK_SIZE):
+                f.writelines(f'{t:.1f},{flow:.6f}\n' for t, flow in chunk)
+                n_values += len(chunk)
+        return n_values
+    
+    spools = {name: f'{output_file}.{name}.{os.getpid()}.tmp' for name in ('time', 'flow')}
+    try:
+        n_values = 0
+        with open(spools['time'], 'wb') as times, open(spools['flow'], 'wb') as flows:
+            for chunk in _chunks(flow_results, STREAM_CHUNK_SIZE):
+                values = np.asarray(chunk, dtype=float)
+                values[:, 0].tofile(times)
+                values[:, 1].tofile(flows)
+                n_values += len(chunk)
+        _write_npz(output_file, {name: (spool, (n_values,)) for name, spool in spools.items()})
+    finally:
+        for spool in spools.values():
+            if os.path.exists(spool):
+                os.remove(spool)
+    return n_values
+
+def iter_flow_chunks(input_file: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[np.ndarray]:
+    """
+    地点ごとの流量ファイル（write_flow_csv・write_flow_npz・write_flow_streamの出力）の流量を
+    先頭から chunk_size 個ずつ読み込む（最後以外は全て chunk_size 個）
+    
+    Parameters:
+    -----------
+    input_file : str
+        流量ファイルのパス
+    chunk_size : int
+        1回に読み込む値の数
+    
+    Yields:
+    -------
+    np.ndarray
+        流量(m3/s)
+    """
+    if input_file.endswith('.npz'):
+        with zipfile.ZipFile(input_file) as archive, archive.open('flow.npy') as member:
+            dtype = _read_npy_header(member)[1]
+            while True:
+                data = member.read(chunk_size * dtype.itemsize)
+                if not data:
+                    return
+                yield np.frombuffer(data, dtype=dtype).astype(float)
+    with open(input_file, 'r') as f:
+        next(f)
+        for lines in _chunks(f, chunk_size):
+            yield np.array([float(line.split(',')[1]) for line in lines])
+
+def count_flow_values(input_file: str) -> int:
+    """地点ごとの流量ファイルの時刻数（流量は読み込まない）"""
+    if input_file.endswith('.npz'):
+        with zipfile.ZipFile(input_file) as archive, archive.open('flow.npy') as member:
+            return int(_read_npy_header(member)[0][0])
+    with open(input_file, 'r') as f:
+        return sum(1 for _ in f) - 1
+
+def _chunks(values: Iterable, size: int) -> Iterator[list]:
+    """size個ずつのリスト"""
+    iterator = iter(values)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _read_npy_header(member) -> Tuple[Tuple[int, ...], np.dtype]:
+    """NumPy形式(.npy)のヘッダーを読み込み、(形状, データ型) を返す"""
+    version = np.lib.format.read_magic(member)
+    if version == (1, 0):
+        shape, _, dtype = np.lib.format.read_array_header_1_0(member)
+    else:
+        shape, _, dtype = np.lib.format.read_array_header_2_0(member)
+    return shape, dtype
+
+def _write_npz(output_file: str, arrays: Dict[str, Union[np.ndarray, Tuple[str, Tuple[int, ...]]]]):
+    """
+    np.savezと同じ形式（非圧縮）で出力する
+    配列の代わりに (float64の値を書き出した一時ファイル, 形状) を渡すと、ファイルから順次格納する
+    """
+    with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, array in arrays.items():
+            with archive.open(f'{name}.npy', 'w', force_zip64=True) as member:
+                if isinstance(array, np.ndarray):
+                    np.lib.format.write_array(member, array, allow_pickle=False)
+                    continue
+                spool, shape = array
+                np.lib.format.write_array_header_1_0(
+                    member, {'descr': np.lib.format.dtype_to_descr(np.dtype(float)),
+                             'fortran_order': False, 'shape': shape}
+                )
+                with open(spool, 'rb') as source:
+                    shutil.copyfileobj(source, member)
+
+def read_flow_npz(input_file: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    write_flow_npzで出力した流量を読み込む
+
+    Returns:
+    --------
+    Tuple[np.ndarray, np.ndarray]
+        (出力時刻(s), 流量(m3/s))
+    """
+    with np.load(input_file) as data:
+        return data['time'], data['flow']
+
+def write_raster_npz(data: np.ndarray, metadata: GISMetadata, output_file: str):
+    """
+    ラスタをメタデータとともにNumPy形式(.npz)で出力（丸めなし）
+
+    Parameters:
+    -----------
+    data : np.ndarray
+        データ配列[x, y]（GISDataReader.read_gis_fileと同じ向き）
+    metadata : GISMetadata
+        データのメタデータ
+    output_file : str
+        出力ファイルパス
+    """
+    with open(output_file, 'wb') as f:
+        np.savez(f, data=np.asarray(data), **dataclasses.asdict(metadata))
+
+def read_raster_npz(input_file: str) -> Tuple[np.ndarray, GISMetadata]:
+    """
+    write_raster_npzで出力したラスタを読み込む
+
+    Returns:
+    --------
+    Tuple[np.ndarray, GISMetadata]
+        (データ配列[x, y], メタデータ)
+    """
+    with np.load(input_file) as data:
+        metadata = GISMetadata(
+            nx=int(data['nx']),
+            ny=int(data['ny']),
+            xllcorner=float(data['xllcorner']),
+            yllcorner=float(data['yllcorner']),
+            cellsize=float(data['cellsize']),
+            nodata=data['nodata'].item()
+        )
+        return data['data'], metadata
+
+def write_table(output_times: np.ndarray, columns: List[str], flow_matrix: np.ndarray,
+                output_file: str, output_format: str) -> str:
+    """
+    全地点の流量の表を出力
+
+    Parameters:
+    -----------
+    output_times : np.ndarray
+        出力時刻(s) (時刻数,)
+    columns : List[str]
+        列名（地点ごと）
+    flow_matrix : np.ndarray
+        流量(m3/s) (時刻数, 地点数)
+    output_file : str
+        出力ファイルパス（拡張子は出力形式に合わせて変更する）
+    output_format : str
+        'npz' または 'parquet'（pyarrowがない場合は'npz'）
+
+    Returns:
+    --------
+    str
+        出力したファイルパス
+    """
+    return write_table_stream([(output_times, flow_matrix)], columns, output_file, output_format)
+
+def write_table_stream(chunks: Iterable[Tuple[np.ndarray, np.ndarray]], columns: List[str],
+                       output_file: str, output_format: str) -> str:
+    """
+    全地点の流量の表を時刻の区間ごとに順次出力（使用メモリは1区間分のみ）
+    
+    Parameters:
+    -----------
+    chunks : Iterable[Tuple[np.ndarray, np.ndarray]]
+        時刻順の (出力時刻(s) (区間の時刻数,), 流量(m3/s) (区間の時刻数, 地点数))
+    columns : List[str]
+        列名（地点ごと）
+    output_file : str
+        出力ファイルパス（CSV以外は拡張子を出力形式に合わせて変更する）
+    output_format : str
+        'csv'（値はそのまま出力）、'npz' または 'parquet'（pyarrowがない場合は'npz'）
+    
+    Returns:
+    --------
+    str
+        出力したファイルパス
+    """
+    if output_format == 'csv':
+        with open(output_file, 'w', newline='') as f:
+            for k, (output_times, flow_matrix) in enumerate(chunks):
+                table = pd.DataFrame(flow_matrix, columns=columns)
+                table.insert(0, 'Time(s)', output_times)
+                table.to_csv(f, header=k == 0, index=False)
+        return output_file
+    
+    if output_format == 'parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("Warning: pyarrow is not installed; writing the merged table as .npz")
+            output_format = 'npz'
+    
+    if output_format == 'parquet':
+        output_file = str(Path(output_file).with_suffix('.parquet'))
+        writer = None
+        try:
+            for output_times, flow_matrix in chunks:
+                table = pa.table({
+                    'Time(s)': np.asarray(output_times, dtype=float),
+                    **{name: np.asarray(flow_matrix[:, j], dtype=float) for j, name in enumerate(columns)}
+                })
+                if writer is None:
+                    writer = pq.ParquetWriter(output_file, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        return output_file
+    
+    output_file = str(Path(output_file).with_suffix('.npz'))
+    spools = {name: f'{output_file}.{name}.{os.getpid()}.tmp' for name in ('time', 'flow')}
+    try:
+        n_times = 0
+        with open(spools['time'], 'wb') as times, open(spools['flow'], 'wb') as flows:
+            for output_times, flow_matrix in chunks:
+                np.asarray(output_times, dtype=float).tofile(times)
+                np.ascontiguousarray(flow_matrix, dtype=float).tofile(flows)
+                n_times += len(output_times)
+        _write_npz(output_file, {
+            'time': (spools['time'], (n_times,)),
+            'flow': (spools['flow'], (n_times, len(columns))),
+            'columns': np.asarray(columns, dtype=str)
+        })
+    finally:
+        for spool in spools.values():
+            if os.path.exists(spool):
+                os.remove(spool)
+    return output_file
+
+def convert_to_text(input_file: str) -> str:
+    """
+    NumPy形式(.npz)の出力をCSV/ASC形式に変換する（同じディレクトリに拡張子を変えて出力）
+    流量はCSV、ラスタはASC、全地点・アンサンブルの表はCSV（マージ結果と同じ書式）に変換する
+
+    Parameters:
+    -----------
+    input_file : str
+        変換するファイルパス
+
+    Returns:
+    --------
+    str
+        出力したファイルパス
+    """
+    with np.load(input_file) as data:
+        keys = set(data.files)
+
+    if 'data' in keys:
+        data, metadata = read_raster_npz(input_file)
+        output_file = str(Path(input_file).with_suffix('.asc'))
+        reader = GISDataReader(cache_max_bytes=0)
+        reader.metadata = metadata
+        reader.export_to_asc(data, output_file)
+    elif 'columns' in keys or 'members' in keys:
+        with np.load(input_file) as data:
+            output_times = data['time']
+            if 'columns' in keys:
+                flow_matrix, columns = data['flow'], [str(name) for name in data['columns']]
+            else:
+                # アンサンブル計算結果 (メンバー数, 時刻数)
+                flow_matrix, columns = data['flow'].T, [str(name) for name in data['members']]
+        output_file = str(Path(input_file).with_suffix('.csv'))
+        table = pd.DataFrame(np.round(flow_matrix, 6), columns=columns)
+        table.insert(0, 'Time(s)', output_times)
+        table.to_csv(output_file, index=False)
+    elif 'flow' in keys:
+        output_file = str(Path(input_file).with_suffix('.csv'))
+        write_flow_csv(*read_flow_npz(input_file), output_file)
+    else:
+        raise ValueError(f"Unknown output file: {input_file}")
+    return output_file
@@ -3,7 +3,62 @@
 # This software is released under the MIT License.
 # see https://opensource.org/licenses/MIT
 
-from typing import Dict
+import os
+import numpy as np
+from typing import Dict, Iterator, List, Tuple
+from .gis_reader import GISDataReader
+from ..models.metadata import GISMetadata
+
+def parse_time_seconds(time_str: str) -> float:
+    """
+    時刻文字列を秒に変換する
+    
+    Parameters:
+    -----------
+    time_str : str
+        時:分:秒形式または秒単位の時刻
+    
+    Returns:
+    --------
+    float
+        時刻(s)
+    """
+    # 時刻を秒単位に変換（時刻が時:分:秒形式の場合）
+    if ':' in time_str:
+        h, m, s = map(float, time_str.split(':'))
+        return h * 3600 + m * 60 + s
+    # 時刻が秒単位で記録されている場合
+    return float(time_str)
+
+def iter_rainfall_data(rainfall_file: str) -> Iterator[Tuple[float, float]]:
+    """
+    CSVファイルから雨量データを1行ずつ読み込む
+    ファイル全体を保持しないため、長期間の時系列や追記され続けるファイルにも使用できる
+    
+    Parameters:
+    -----------
+    rainfall_file : str
+        雨量データのCSVファイルパス
+    
+    Yields:
+    -------
+    Tuple[float, float]
+        (時刻(s), 雨量(mm/h))
+    """
+    try:
+        with open(rainfall_file, 'r') as f:
+            # ヘッダー行をスキップ
+            f.readline()
+            
+            for line in f:
+                if not line.strip():
+                    continue
+                # カンマで分割してデータを取得
+                time_str, rainfall_str = line.strip().split(',')
+                yield parse_time_seconds(time_str), float(rainfall_str)
+    
+    except Exception as e:
+        raise RuntimeError(f"Error reading rainfall data: {str(e)}")
 
 def read_rainfall_data(rainfall_file: str) -> Dict[float, float]:
     """
@@ -19,33 +74,112 @@ def read_rainfall_data(rainfall_file: str) -> Dict[float, float]:
     Dict[float, float]
         時刻と雨量のディクショナリ {時刻(s): 雨量(mm/h)}
     """
-    rainfall_data = {}
-    
+    return dict(iter_rainfall_data(rainfall_file))
+
+def read_rainfall_ensemble(rainfall_file: str) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """
+    CSVファイルからアンサンブル雨量データを読み込む
+    1列目が時刻、2列目以降が各メンバーの雨量(mm/h)
+
+    Parameters:
+    -----------
+    rainfall_file : str
+        アンサンブル雨量データのCSVファイルパス
+
+    Returns:
+    --------
+    Tuple[np.ndarray, List[str], np.ndarray]
+        (時刻(s) (時刻数,), メンバー名, 雨量(mm/h) (メンバー数, 時刻数))
+    """
     try:
         with open(rainfall_file, 'r') as f:
+            # ヘッダー行からメンバー名を取得
+            members = [name.strip() for name in f.readline().strip().split(',')[1:]]
+
+            times = []
+            rows = []
+            for line in f:
+                if not line.strip():
+                    continue
+                time_str, *values = line.strip().split(',')
+                if len(values) != len(members):
+                    raise ValueError(f"Invalid number of columns at time {time_str}")
+                times.append(parse_time_seconds(time_str))
+                rows.append(values)
+
+        rainfall = np.array(rows, dtype=float).T.reshape(len(members), len(times))
+        return np.array(times, dtype=float), members, rainfall
+
+    except Exception as e:
+        raise RuntimeError(f"Error reading rainfall ensemble data: {str(e)}")
+
+def read_rainfall_grid_index(index_file: str) -> List[Tuple[float, str]]:
+    """
+    格子雨量の一覧ファイルを読み込む
+    一覧ファイルはCSVで、1列目が時刻、2列目が雨量(mm/h)のASCファイルのパス
+    （相対パスは一覧ファイルのディレクトリ基準）
+
+    Parameters:
+    -----------
+    index_file : str
+        格子雨量の一覧ファイルパス
+
+    Returns:
+    --------
+    List[Tuple[float, str]]
+        (時刻(s), ASCファイルのパス) のリスト
+    """
+    try:
+        base_dir = os.path.dirname(os.path.abspath(index_file))
+        frames = []
+        with open(index_file, 'r') as f:
             # ヘッダー行をスキップ
-            header = f.readline().strip()
-            
-            # 各行を読み込み
+            f.readline()
             for line in f:
-                # カンマで分割してデータを取得
-                time_str, rainfall_str = line.strip().split(',')
-                
-                # 時刻を秒単位に変換（時刻が時:分:秒形式の場合）
-                try:
-                    h, m, s = map(float, time_str.split(':'))
-                    time_seconds = h * 3600 + m * 60 + s
-                except ValueError:
-                    # 時刻が秒単位で記録されている場合
-                    time_seconds = float(time_str)
-                
-                # 雨量を float に変換
-                rainfall = float(rainfall_str)
-                
-                # データを辞書に追加
-                rainfall_data[time_seconds] = rainfall
-                
-        return rainfall_data
-    
+                if not line.strip():
+                    continue
+                time_str, grid_file = [value.strip() for value in line.strip().split(',')]
+                frames.append((parse_time_seconds(time_str), os.path.join(base_dir, grid_file)))
     except Exception as e:
-        raise RuntimeError(f"Error reading rainfall data: {str(e)}")
\ No newline at end of file
+        raise RuntimeError(f"Error reading rainfall grid index: {str(e)}")
+    return frames
+
+def iter_rainfall_grids(index_file: str) -> Iterator[Tuple[float, np.ndarray, GISMetadata]]:
+    """
+    格子雨量（レーダー雨量等）を1時刻ずつ読み込む（一覧ファイルはread_rainfall_grid_indexを参照）
+    読み込んだ格子は保持せず、入力ファイルの横にバイナリキャッシュ(.npy)も作成しない
+
+    Parameters:
+    -----------
+    index_file : str
+        格子雨量の一覧ファイルパス
+
+    Yields:
+    -------
+    Tuple[float, np.ndarray, GISMetadata]
+        (時刻(s), 雨量(mm/h) データ配列[x, y], 格子のメタデータ)
+    """
+    reader = GISDataReader(cache_max_bytes=0, sidecar_cache=False)
+    for time_seconds, grid_file in read_rainfall_grid_index(index_file):
+        try:
+            data, _ = reader.read_gis_file(grid_file)
+        except Exception as e:
+            raise RuntimeError(f"Error reading rainfall grid {grid_file}: {str(e)}")
+        yield time_seconds, data, reader.metadata
+
+def read_rainfall_grids(index_file: str) -> List[Tuple[float, np.ndarray, GISMetadata]]:
+    """
+    格子雨量（レーダー雨量等）の全時刻を読み込む
+    全地点で共有するため、実行ごとに1回だけ読み込む
+    
+    Parameters:
+    -----------
+    index_file : str
+        格子雨量の一覧ファイルパス
+    
+    Returns:
+    --------
+    List[Tuple[float, np.ndarray, GISMetadata]]
+        (時刻(s), 雨量(mm/h) データ配列[x, y], 格子のメタデータ) のリスト
+    """
+    return list(iter_rainfall_grids(index_file))
@@ -3,72 +3,454 @@
 # This software is released under the MIT License.
 # see https://opensource.org/licenses/MIT
 
+import io
+import os
+import mmap
+import json
+import hashlib
+import dataclasses
 import numpy as np
+from collections import OrderedDict
 from typing import Tuple, Optional
 from ..models.metadata import GISMetadata
+from ..models.grid_geometry import GridGeometry
 
 class GISDataReader:
-    def __init__(self):
+    # ラスタキャッシュの既定の上限サイズ（バイト）
+    DEFAULT_CACHE_MAX_BYTES = 4 * 1024**3
+    # バイナリキャッシュ(.npy)を作成するASCファイルの最小サイズ（バイト）
+    SIDECAR_MIN_BYTES = 1024**2
+    # ASCファイルを解析する際の読み込みバッファのサイズ（バイト）
+    PARSE_BUFFER_BYTES = 1024**2
+    SIDECAR_VERSION = 1
+    
+    def __init__(self, cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES, sidecar_cache: bool = True):
+        """
+        Parameters:
+        -----------
+        cache_max_bytes : int
+            読み込んだラスタを保持するキャッシュの上限サイズ（バイト）。0でキャッシュ無効
+        sidecar_cache : bool
+            ASCファイルの隣にバイナリキャッシュ(.npy)を作成・利用するか
+        """
         self.metadata: Optional[GISMetadata] = None
+        self.cache_max_bytes = cache_max_bytes
+        self.sidecar_cache = sidecar_cache
+        # (絶対パス, 更新時刻, ファイルサイズ) -> (メタデータ, データ)
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_bytes = 0
+        # (絶対パス, 更新時刻, ファイルサイズ) -> (メタデータ, バイナリキャッシュのメモリマップ)
+        self._mapped = {}
+        # ファイルから読み込んだバイト数（ASCファイルはファイルサイズ、バイナリキャッシュは配列のサイズ）
+        self.bytes_read = 0
         
-    def read_gis_file(self, filepath: str, expected_metadata: Optional[GISMetadata] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    def read_gis_file(self, filepath: str, expected_metadata: Optional[GISMetadata] = None) -> Tuple[np.ndarray, GridGeometry]:
         """
         ASC形式のGISファイルを高速に読み込む
         ASCファイルは南西端が原点で、北に向かってy方向、東に向かってx方向に展開
+        
+        座標は格子全体の配列を作らず、GridGeometryで必要に応じて計算する
+        
+        同じファイル（パスと更新時刻が同一）は一度だけ読み込み、以降はキャッシュを返す
+        キャッシュした配列は地点間で共有するため読み取り専用
         """
         try:
-            # メタデータ行を読み込む
-            with open(filepath, 'r') as f:
-                metadata = {}
-                for _ in range(6):
-                    key, value = f.readline().strip().split()
-                    metadata[key.lower()] = float(value)
-
-            # メタデータを設定
-            self.metadata = GISMetadata(
-                nx=int(metadata['ncols']),
-                ny=int(metadata['nrows']),
-                xllcorner=metadata['xllcorner'],
-                yllcorner=metadata['yllcorner'],
-                cellsize=metadata['cellsize'],
-                nodata=metadata['nodata_value']
-            )
+            stat = os.stat(filepath)
+            cache_key = (os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+            cached = self._get_cached(cache_key)
+            if cached is not None:
+                metadata, data = cached
+                self.metadata = dataclasses.replace(metadata)
+                if expected_metadata:
+                    self._validate_metadata(expected_metadata)
+                return data, GridGeometry.from_metadata(metadata)
+            
+            # メタデータとデータを読み込み（データは上から下の順）
+            self.metadata, data = self._load_raster(filepath, stat)
 
             # 検証が必要な場合のみ実行
             if expected_metadata:
                 self._validate_metadata(expected_metadata)
-
-            # データを読み込み（上から下の順）
-            data = np.loadtxt(filepath, skiprows=6)
             
             # y座標は下から上に向かって増加するため、データを上下反転
             data = np.flipud(data)
-
-            # x座標配列（西から東へ）
-            x = np.linspace(
-                self.metadata.xllcorner,
-                self.metadata.xllcorner + self.metadata.cellsize * (self.metadata.nx - 1),
-                self.metadata.nx
-            )
             
-            # y座標配列（南から北へ）
-            y = np.linspace(
-                self.metadata.yllcorner,
-                self.metadata.yllcorner + self.metadata.cellsize * (self.metadata.ny - 1),
-                self.metadata.ny
-            )
+            # 座標[x, y]の順序に合わせるためにデータを転置
+            data = data.T
             
-            # メッシュグリッドの生成（indexing='ij'を使用して正しい順序を保証）
-            x_coords, y_coords = np.meshgrid(x, y, indexing='ij')
+            self._put_cached(cache_key, dataclasses.replace(self.metadata), data)
             
-            # データと座標の形状を合わせるためにデータを転置
-            data = data.T
+            return data, GridGeometry.from_metadata(self.metadata)
+
+        except Exception as e:
+            raise RuntimeError(f"Error reading GIS file: {str(e)}")
+    
+    def read_window(self, filepath: str, window: Tuple[int, int, int, int],
+                    expected_metadata: Optional[GISMetadata] = None) -> Tuple[np.ndarray, GISMetadata]:
+        """
+        ラスタの一部の範囲（行・列番号の矩形）のみを読み込む
+        バイナリキャッシュ(.npy)がある場合はメモリマップから範囲内の行・列のみを読むため、
+        読み込み量はラスタ全体ではなく範囲の大きさに比例する
+        
+        Parameters:
+        -----------
+        filepath : str
+            ASCファイルのパス
+        window : Tuple[int, int, int, int]
+            読み込む範囲 (imin, imax, jmin, jmax)（行は北から、0始まり、両端を含む。SparseBasin.boundsと同じ）
+        expected_metadata : GISMetadata, optional
+            ラスタ全体のメタデータの検証に使用
+        
+        Returns:
+        --------
+        Tuple[np.ndarray, GISMetadata]
+            (範囲のデータ配列[x, y], 範囲のメタデータ)
+        """
+        try:
+            metadata, raster = self._open_raster(filepath)
+            self.metadata = dataclasses.replace(metadata)
+            if expected_metadata:
+                self._validate_metadata(expected_metadata)
+            
+            imin, imax, jmin, jmax = (int(value) for value in window)
+            if not (0 <= imin <= imax < metadata.ny and 0 <= jmin <= jmax < metadata.nx):
+                raise ValueError(f"Window out of range: {window}")
             
-            return data, x_coords, y_coords
+            # 範囲内の行・列のみをコピーし、read_gis_fileと同じ向きにする
+            data = np.array(raster[imin:imax + 1, jmin:jmax + 1])
+            if isinstance(raster, np.memmap):
+                self.bytes_read += data.nbytes
+            self.metadata = dataclasses.replace(
+                metadata,
+                nx=jmax - jmin + 1,
+                ny=imax - imin + 1,
+                xllcorner=metadata.xllcorner + metadata.cellsize * jmin,
+                yllcorner=metadata.yllcorner + metadata.cellsize * (metadata.ny - 1 - imax)
+            )
+            return np.flipud(data).T, dataclasses.replace(self.metadata)
+        
+        except Exception as e:
+            raise RuntimeError(f"Error reading GIS file window: {str(e)}")
+    
+    @staticmethod
+    def bbox_to_window(metadata: GISMetadata, west: float, south: float,
+                       east: float, north: float) -> Tuple[int, int, int, int]:
+        """
+        経度・緯度の範囲をread_windowの範囲（行・列番号）に変換する（ラスタの範囲外は切り詰める）
+        
+        Parameters:
+        -----------
+        metadata : GISMetadata
+            ラスタ全体のメタデータ
+        west, south, east, north : float
+            範囲の西端・南端・東端・北端の経度・緯度（度）
+        
+        Returns:
+        --------
+        Tuple[int, int, int, int]
+            (imin, imax, jmin, jmax)（行は北から、0始まり、両端を含む）
+        """
+        jmin = int(np.floor((west - metadata.xllcorner) / metadata.cellsize))
+        jmax = int(np.floor((east - metadata.xllcorner) / metadata.cellsize))
+        # 行番号は北から数える
+        imin = metadata.ny - 1 - int(np.floor((north - metadata.yllcorner) / metadata.cellsize))
+        imax = metadata.ny - 1 - int(np.floor((south - metadata.yllcorner) / metadata.cellsize))
+        
+        imin, imax = max(imin, 0), min(imax, metadata.ny - 1)
+        jmin, jmax = max(jmin, 0), min(jmax, metadata.nx - 1)
+        if imin > imax or jmin > jmax:
+            raise ValueError(f"Bounding box does not overlap the raster: ({west}, {south}, {east}, {north})")
+        return imin, imax, jmin, jmax
+    
+    def supports_windowed_read(self, filepath: str, expected_metadata: Optional[GISMetadata] = None) -> bool:
+        """
+        read_windowがメモリマップから読み込めるか（ラスタ全体を読み込まずに済むか）を返す
+        バイナリキャッシュがない場合は作成する
+        
+        Parameters:
+        -----------
+        filepath : str
+            ASCファイルのパス
+        expected_metadata : GISMetadata, optional
+            メタデータの検証に使用
 
+        Returns:
+        --------
+        bool
+            バイナリキャッシュのメモリマップを使用できる場合True
+        """
+        try:
+            metadata, _ = self._open_raster(filepath)
+            self.metadata = dataclasses.replace(metadata)
+            if expected_metadata:
+                self._validate_metadata(expected_metadata)
         except Exception as e:
             raise RuntimeError(f"Error reading GIS file: {str(e)}")
+        stat = os.stat(filepath)
+        return (os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size) in self._mapped
+    
+    def _open_raster(self, filepath: str) -> Tuple[GISMetadata, np.ndarray]:
+        """
+        ラスタ全体を参照する配列を取得する
+        メモリ上のキャッシュ、バイナリキャッシュのメモリマップ、ASCファイルの読み込みの順に試す
+        
+        Returns:
+        --------
+        Tuple[GISMetadata, np.ndarray]
+            (メタデータ, ファイルと同じ行順の(nrows, ncols)配列)
+        """
+        stat = os.stat(filepath)
+        cache_key = (os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+        mapped = self._mapped.get(cache_key)
+        if mapped is not None:
+            return mapped
+        
+        cached = self._get_cached(cache_key)
+        if cached is not None:
+            metadata, data = cached
+            return metadata, np.flipud(data.T)
+        
+        if self.sidecar_cache and stat.st_size >= self.SIDECAR_MIN_BYTES:
+            mapped = self._load_sidecar(filepath, stat)
+            if mapped is None:
+                # バイナリキャッシュを作成してから開き直す
+                self._load_raster(filepath, stat)
+                mapped = self._load_sidecar(filepath, stat)
+            if mapped is not None:
+                # 同じパスの古い版（更新前のファイル）は破棄
+                for key in [key for key in self._mapped if key[0] == cache_key[0]]:
+                    del self._mapped[key]
+                self._mapped[cache_key] = mapped
+                return mapped
+        
+        # バイナリキャッシュを使えない場合はラスタ全体を読み込む
+        data, _ = self.read_gis_file(filepath)
+        return dataclasses.replace(self.metadata), np.flipud(data.T)
+
+    def _load_raster(self, filepath: str, stat: os.stat_result) -> Tuple[GISMetadata, np.ndarray]:
+        """
+        ASCファイルを読み込む。有効なバイナリキャッシュがあればメモリマップで開く
+        
+        Returns:
+        --------
+        Tuple[GISMetadata, np.ndarray]
+            (メタデータ, ファイルと同じ行順の(nrows, ncols)配列)
+        """
+        use_sidecar = self.sidecar_cache and stat.st_size >= self.SIDECAR_MIN_BYTES
+        if use_sidecar:
+            loaded = self._load_sidecar(filepath, stat)
+            if loaded is not None:
+                self.bytes_read += loaded[1].nbytes
+                return loaded
+        
+        metadata, data, digest = self._parse_ascii_grid(filepath, with_digest=use_sidecar)
+        self.bytes_read += stat.st_size
+        if use_sidecar:
+            self._save_sidecar(filepath, stat, metadata, data, digest)
+        return metadata, data
+    
+    def _parse_ascii_grid(self, filepath: str, with_digest: bool = True) -> Tuple[GISMetadata, np.ndarray, Optional[str]]:
+        """
+        ASCファイルを解析する
+        データ部はファイル全体をnp.loadtxtで読む場合と同じくC実装の変換で1回だけ読み込み、
+        ハッシュ値は同じ読み込みのバイト列から計算する（変換の速度はnp.loadtxtと同等）。
+        1行あたりの値の数が揃っていない場合（行が折り返されている場合）は空白区切りで変換する
+        
+        Parameters:
+        -----------
+        filepath : str
+            ASCファイルのパス
+        with_digest : bool
+            ファイル内容のハッシュ値を計算するか（バイナリキャッシュの作成時のみ必要）
+        
+        Returns:
+        --------
+        Tuple[GISMetadata, np.ndarray, Optional[str]]
+            (メタデータ, (nrows, ncols)配列, ファイル内容のハッシュ値（with_digest=Falseの場合None）)
+        """
+        hasher = hashlib.blake2b(digest_size=20) if with_digest else None
+        with open(filepath, 'rb') as raw:
+            f = io.BufferedReader(_HashingReader(raw, hasher), self.PARSE_BUFFER_BYTES)
+            metadata = self._parse_header(f)
+            try:
+                data = np.loadtxt(f, ndmin=2)
+            except ValueError:
+                data = None
+        
+        if data is None:
+            # 行ごとの値の数が異なる場合は全体を空白区切りで変換する（数値でない値はValueError）
+            with open(filepath, 'rb') as raw:
+                content = raw.read()
+            hasher = hashlib.blake2b(content, digest_size=20) if with_digest else None
+            body = io.BytesIO(content)
+            self._parse_header(body)
+            data = np.array(body.read().split(), dtype=float)
+        
+        if data.size != metadata.nx * metadata.ny:
+            raise ValueError(f"Invalid number of values: expected {metadata.nx * metadata.ny}, got {data.size}")
+        
+        return metadata, data.reshape(metadata.ny, metadata.nx), hasher.hexdigest() if hasher else None
+    
+    @staticmethod
+    def _parse_header(f) -> GISMetadata:
+        """ASCファイルのメタデータ行（6行）を読み込む"""
+        header = {}
+        for _ in range(6):
+            key, value = f.readline().decode().strip().split()
+            header[key.lower()] = float(value)
+        
+        return GISMetadata(
+            nx=int(header['ncols']),
+            ny=int(header['nrows']),
+            xllcorner=header['xllcorner'],
+            yllcorner=header['yllcorner'],
+            cellsize=header['cellsize'],
+            nodata=header['nodata_value']
+        )
+    
+    def file_digest(self, filepath: str) -> str:
+        """
+        ファイル内容のハッシュ値を取得する
+        バイナリキャッシュの付随情報と更新時刻・サイズが一致する場合は記録済みの値を使う
+        
+        Parameters:
+        -----------
+        filepath : str
+            ファイルパス
+        
+        Returns:
+        --------
+        str
+            ハッシュ値
+        """
+        try:
+            stat = os.stat(filepath)
+            with open(self._sidecar_paths(filepath)[1], 'r') as f:
+                info = json.load(f)
+            if info['size'] == stat.st_size and info['mtime_ns'] == stat.st_mtime_ns:
+                return info['digest']
+        except (OSError, ValueError, KeyError):
+            pass
+        return self._file_digest(filepath)
+    
+    @staticmethod
+    def _file_digest(filepath: str) -> str:
+        """ファイル内容のハッシュ値を計算する"""
+        hasher = hashlib.blake2b(digest_size=20)
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(16 * 1024**2), b''):
+                hasher.update(block)
+        return hasher.hexdigest()
+    
+    @staticmethod
+    def _sidecar_paths(filepath: str) -> Tuple[str, str]:
+        """バイナリキャッシュのパス (データ, 付随情報) を返す"""
+        return f"{filepath}.npy", f"{filepath}.npy.json"
+    
+    def _load_sidecar(self, filepath: str, stat: os.stat_result) -> Optional[Tuple[GISMetadata, np.ndarray]]:
+        """
+        バイナリキャッシュを読み込む
+        更新時刻・サイズが一致しない場合はハッシュ値で内容の一致を確認し、一致しなければNone
+        """
+        data_path, info_path = self._sidecar_paths(filepath)
+        try:
+            with open(info_path, 'r') as f:
+                info = json.load(f)
+            if info.get('version') != self.SIDECAR_VERSION or info['size'] != stat.st_size:
+                return None
+            
+            if info['mtime_ns'] != stat.st_mtime_ns:
+                if self._file_digest(filepath) != info['digest']:
+                    return None
+                info['mtime_ns'] = stat.st_mtime_ns
+                self._write_json(info_path, info)
+            
+            metadata = GISMetadata(**info['metadata'])
+            data = np.load(data_path, mmap_mode='r')
+            if data.shape != (metadata.ny, metadata.nx):
+                return None
+            return metadata, data
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+    
+    def _save_sidecar(self, filepath: str, stat: os.stat_result, metadata: GISMetadata,
+                      data: np.ndarray, digest: str):
+        """バイナリキャッシュを書き出す（書き込めない場合は何もしない）"""
+        data_path, info_path = self._sidecar_paths(filepath)
+        info = {
+            'version': self.SIDECAR_VERSION,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'digest': digest,
+            'metadata': dataclasses.asdict(metadata)
+        }
+        try:
+            tmp_path = f"{data_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, data)
+            os.replace(tmp_path, data_path)
+            self._write_json(info_path, info)
+        except OSError:
+            pass
+    
+    @staticmethod
+    def _write_json(path: str, content: dict):
+        """JSONファイルを一時ファイル経由で書き出す"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(content, f)
+        os.replace(tmp_path, path)
+    
+    def _get_cached(self, cache_key: tuple) -> Optional[tuple]:
+        """キャッシュからラスタを取得し、最近使用したものとして記録する"""
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            self._cache.move_to_end(cache_key)
+        return cached
+    
+    def _put_cached(self, cache_key: tuple, metadata: GISMetadata, data: np.ndarray):
+        """
+        ラスタをキャッシュに登録し、上限サイズを超えた分を古い順に破棄する
+        """
+        nbytes = self._resident_bytes(data)
+        if nbytes > self.cache_max_bytes:
+            return
+        
+        # 同じパスの古い版（更新前のファイル）は破棄
+        for key in [key for key in self._cache if key[0] == cache_key[0]]:
+            self._evict(key)
+        
+        data.flags.writeable = False
+        self._cache[cache_key] = (metadata, data)
+        self._cache_bytes += nbytes
+        
+        while self._cache_bytes > self.cache_max_bytes:
+            self._evict(next(iter(self._cache)))
+    
+    def _evict(self, cache_key: tuple):
+        """キャッシュから1件破棄する"""
+        _, data = self._cache.pop(cache_key)
+        self._cache_bytes -= self._resident_bytes(data)
+    
+    @staticmethod
+    def _resident_bytes(data: np.ndarray) -> int:
+        """
+        キャッシュの上限サイズに数えるバイト数
+        ファイルにマップした配列（サイドカーのmemmap）とそのビューはメモリを占有しないため0とする
+        """
+        base = data
+        while base is not None:
+            if isinstance(base, (np.memmap, mmap.mmap)):
+                return 0
+            base = getattr(base, 'base', None)
+        return data.nbytes
 
+    def clear_cache(self):
+        """ラスタキャッシュを全て破棄する"""
+        self._cache.clear()
+        self._cache_bytes = 0
+        self._mapped.clear()
+    
     def _validate_metadata(self, expected: GISMetadata):
         """必要最小限のメタデータ検証"""
         if self.metadata.nx != expected.nx or self.metadata.ny != expected.ny:
@@ -105,4 +487,20 @@ class GISDataReader:
             f.write(f"NODATA_VALUE {self.metadata.nodata}\n")
             
             # データの書き込み
-            np.savetxt(f, output_data, fmt='%.1f')
\ No newline at end of file
+            np.savetxt(f, output_data, fmt='%.1f')
+
+class _HashingReader(io.RawIOBase):
+    """読み込んだバイト列からハッシュ値を計算するファイルのラッパー（hasherがNoneの場合は計算しない）"""
+
+    def __init__(self, raw, hasher):
+        self.raw = raw
+        self.hasher = hasher
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = self.raw.readinto(buffer)
+        if self.hasher is not None and n:
+            self.hasher.update(memoryview(buffer)[:n])
+        return n
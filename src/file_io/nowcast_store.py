@@ -0,0 +1,61 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+import os
+import numpy as np
+from pathlib import Path
+from typing import Dict, Optional
+
+class NowcastStateStore:
+    """
+    解析地点ごとの逐次計算の途中状態（未確定の流量のリングバッファ等）を保存するクラス
+    次回の実行では新しく追加された降雨のみを加算して計算を再開できる
+    """
+
+    def __init__(self, directory: str):
+        """
+        Parameters:
+        -----------
+        directory : str
+            途中状態を保存するディレクトリ
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path(self, point_id) -> Path:
+        """解析地点の途中状態のファイルパス"""
+        return self.directory / f"nowcast_{int(float(point_id))}.npz"
+
+    def load(self, point_id, response_key: str) -> Optional[Dict[str, np.ndarray]]:
+        """
+        途中状態を読み込む
+
+        Parameters:
+        -----------
+        point_id : Union[str, int, float]
+            解析地点のID
+        response_key : str
+            流域応答の保存キー（保存時と異なる場合は使用しない）
+
+        Returns:
+        --------
+        Optional[Dict[str, np.ndarray]]
+            保存されていない・流域応答が変わった場合はNone
+        """
+        try:
+            with np.load(self.path(point_id)) as data:
+                if str(data['response_key']) != response_key:
+                    return None
+                return {key: data[key] for key in data.files if key != 'response_key'}
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def save(self, point_id, response_key: str, state: Dict[str, np.ndarray]):
+        """途中状態を保存する（一時ファイル経由で置き換える）"""
+        path = self.path(point_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, response_key=np.array(response_key), **state)
+        os.replace(tmp_path, path)
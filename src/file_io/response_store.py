@@ -0,0 +1,121 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+import os
+import json
+import dataclasses
+import hashlib
+import numpy as np
+from pathlib import Path
+from typing import Optional
+from ..models.basin_response import BasinResponse
+from ..models.metadata import GISMetadata
+
+class BasinResponseStore:
+    """
+    解析地点ごとの流域応答（到達時間ヒストグラム）を保存・再利用するクラス
+    入力ラスタのハッシュ値や計算パラメータから作成したキーで管理し、
+    同じ条件での再計算時は流域抽出・到達時間計算を省略できる
+    """
+    # キーに含める項目・保存形式を変更した場合に更新する（以前の版で保存した流域応答は使用しない）
+    KEY_VERSION = 2
+
+    def __init__(self, directory: str):
+        """
+        Parameters:
+        -----------
+        directory : str
+            流域応答を保存するディレクトリ
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(**fields) -> str:
+        """
+        入力条件からキーを作成する
+
+        Parameters:
+        -----------
+        **fields
+            キーに含める入力条件（JSONに変換可能な値）
+
+        Returns:
+        --------
+        str
+            入力条件のハッシュ値
+        """
+        content = json.dumps(fields, sort_keys=True, default=str)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def path(self, key: str) -> Path:
+        """キーに対応するファイルパス"""
+        return self.directory / f"{key}.npz"
+
+    def exists(self, key: str) -> bool:
+        """キーに対応する流域応答が保存されているか"""
+        return self.path(key).exists()
+
+    def load(self, key: str) -> Optional[BasinResponse]:
+        """
+        流域応答を読み込む
+
+        Returns:
+        --------
+        Optional[BasinResponse]
+            保存されていない・読み込めない場合はNone
+        """
+        try:
+            with np.load(self.path(key)) as data:
+                phases = data['phases']
+                arrival_time = {}
+                if 'arrival_time' in data.files:
+                    arrival_time = {
+                        'arrival_time': data['arrival_time'],
+                        'cell_index': data['cell_index'],
+                        'metadata': GISMetadata(
+                            nx=int(data['nx']),
+                            ny=int(data['ny']),
+                            xllcorner=float(data['xllcorner']),
+                            yllcorner=float(data['yllcorner']),
+                            cellsize=float(data['cellsize']),
+                            nodata=data['nodata'].item()
+                        )
+                    }
+                return BasinResponse(
+                    dtq=float(data['dtq']),
+                    max_arrival_time=float(data['max_arrival_time']),
+                    unit_hydrographs={
+                        float(phase): data[f'unit_hydrograph_{i}']
+                        for i, phase in enumerate(phases)
+                    },
+                    **arrival_time
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def save(self, key: str, response: BasinResponse):
+        """流域応答を保存する（一時ファイル経由で置き換える）"""
+        phases = list(response.unit_hydrographs.keys())
+        arrays = {
+            f'unit_hydrograph_{i}': response.unit_hydrographs[phase]
+            for i, phase in enumerate(phases)
+        }
+        if response.has_arrival_time:
+            arrays.update(
+                arrival_time=response.arrival_time,
+                cell_index=response.cell_index,
+                **dataclasses.asdict(response.metadata)
+            )
+        tmp_path = f"{self.path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                dtq=response.dtq,
+                max_arrival_time=response.max_arrival_time,
+                phases=np.array(phases, dtype=float),
+                **arrays
+            )
+        os.replace(tmp_path, self.path(key))
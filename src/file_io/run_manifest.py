@@ -0,0 +1,129 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+import os
+import json
+import numpy as np
+from pathlib import Path
+from typing import Dict, Optional
+
+class RunManifest:
+    """
+    解析地点ごとの処理結果（入力条件のキー・計算条件・出力ファイル・流量）を記録するクラス
+    地点の処理が完了するたびに記録するため、中断・再実行時は入力条件が同じで
+    出力ファイルが変更されていない地点の処理を省略できる
+    """
+
+    def __init__(self, directory: str):
+        """
+        Parameters:
+        -----------
+        directory : str
+            記録を保存するディレクトリ
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path(self, point_id) -> Path:
+        """解析地点の記録のファイルパス"""
+        return self.directory / f"point_{int(float(point_id))}.json"
+
+    def flows_path(self, point_id) -> Path:
+        """解析地点の流量（時刻 0, dtq, 2*dtq, ...）のファイルパス"""
+        return self.directory / f"point_{int(float(point_id))}_flows.npy"
+
+    @staticmethod
+    def _file_state(filepath: str) -> Optional[Dict[str, int]]:
+        """出力ファイルのサイズと更新時刻（存在しない場合はNone）"""
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def _load_record(self, point_id) -> Optional[dict]:
+        try:
+            with open(self.path(point_id), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_current(self, point_id, key: str) -> bool:
+        """
+        前回の処理結果をそのまま使用できるか
+
+        Parameters:
+        -----------
+        point_id : Union[str, int, float]
+            解析地点のID
+        key : str
+            今回の入力条件のキー
+
+        Returns:
+        --------
+        bool
+            入力条件のキーが一致し、記録した出力ファイルが全て存在して変更されていない場合True
+        """
+        record = self._load_record(point_id)
+        if record is None or record.get('key') != key:
+            return False
+        if record.get('flows', True) and not self.flows_path(point_id).exists():
+            return False
+        artifacts = record.get('artifacts', {})
+        return bool(artifacts) and all(
+            state is not None and self._file_state(filepath) == state
+            for filepath, state in artifacts.values()
+        )
+
+    def load_flows(self, point_id) -> Optional[np.ndarray]:
+        """記録した流量(m3/s)（読み込めない場合はNone）"""
+        try:
+            return np.load(self.flows_path(point_id))
+        except (OSError, ValueError):
+            return None
+
+    def record(self, point_id, key: str, params: dict, output_files: Dict[str, str],
+               flows: Optional[np.ndarray] = None):
+        """
+        解析地点の処理結果を記録する（一時ファイル経由で置き換える）
+
+        Parameters:
+        -----------
+        point_id : Union[str, int, float]
+            解析地点のID
+        key : str
+            入力条件のキー
+        params : dict
+            計算条件（確認用に記録する）
+        output_files : Dict[str, str]
+            出力の種類とファイルパス（全て記録し、存在しないファイルは次回の判定で再処理の対象とする）
+        flows : np.ndarray, optional
+            流量(m3/s)（逐次出力の場合は記録せず、マージ時は出力ファイルから読み込む）
+        """
+        flows_path = self.flows_path(point_id)
+        if flows is not None:
+            tmp_path = f"{flows_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.asarray(flows, dtype=float))
+            os.replace(tmp_path, flows_path)
+        elif flows_path.exists():
+            flows_path.unlink()
+
+        artifacts = {
+            kind: [filepath, self._file_state(filepath)]
+            for kind, filepath in output_files.items()
+        }
+        record = {
+            'point_id': str(point_id),
+            'key': key,
+            'params': params,
+            'flows': flows is not None,
+            'artifacts': artifacts,
+        }
+        path = self.path(point_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f, indent=2, default=str)
+        os.replace(tmp_path, path)
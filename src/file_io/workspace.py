@@ -0,0 +1,99 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+class PointWorkspace:
+    """
+    解析地点ごとの作業ディレクトリを管理するクラス
+    出力は地点専用の作業ディレクトリに書き込み、全ての処理が完了した時点で
+    最終的な出力先へ一括で移動（公開）する。地点を並列に処理しても、
+    途中で中断しても、出力先に書きかけのファイルが残らない
+    """
+
+    DEFAULT_SCRATCH_ROOT = 'log/work'
+
+    def __init__(self, point_id, output_files: Dict[str, str], scratch_root: str = DEFAULT_SCRATCH_ROOT):
+        """
+        Parameters:
+        -----------
+        point_id : Union[str, int, float]
+            解析地点のID
+        output_files : Dict[str, str]
+            出力の種類と最終的な出力先のパス
+        scratch_root : str
+            作業ディレクトリを作成するディレクトリ
+        """
+        self.output_files = dict(output_files)
+        Path(scratch_root).mkdir(parents=True, exist_ok=True)
+        point_id_str = str(int(float(point_id)))
+        self.scratch_dir = Path(tempfile.mkdtemp(prefix=f"point_{point_id_str}_", dir=scratch_root))
+
+    def path(self, key: str) -> str:
+        """
+        出力の種類に対応する作業ディレクトリ内のパスを取得
+
+        Parameters:
+        -----------
+        key : str
+            出力の種類（output_filesのキー）
+
+        Returns:
+        --------
+        str
+            作業ディレクトリ内のファイルパス
+        """
+        return str(self.scratch_dir / Path(self.output_files[key]).name)
+
+    def publish(self, keys: Optional[Iterable[str]] = None):
+        """
+        作業ディレクトリに書き込んだファイルを最終的な出力先へ移動する
+        
+        Parameters:
+        -----------
+        keys : Optional[Iterable[str]]
+            公開する出力の種類。Noneの場合は全て
+        
+        Raises:
+        -------
+        RuntimeError
+            作業ディレクトリに出力されていないファイルがある場合
+        """
+        keys = list(self.output_files) if keys is None else list(keys)
+        missing = [key for key in keys if not Path(self.path(key)).exists()]
+        if missing:
+            raise RuntimeError(f"Output file not created in {self.scratch_dir}: {', '.join(missing)}")
+        
+        for key in keys:
+            self._atomic_move(self.path(key), self.output_files[key])
+
+    @staticmethod
+    def _atomic_move(src: str, dst: str):
+        """
+        ファイルを置き換え先から見て不可分に移動する
+        別のファイルシステムの場合は出力先と同じディレクトリにコピーしてから置き換える
+        """
+        Path(dst).parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(src, dst)
+        except OSError:
+            tmp_path = f"{dst}.{os.getpid()}.tmp"
+            shutil.copyfile(src, tmp_path)
+            os.replace(tmp_path, dst)
+            os.remove(src)
+
+    def cleanup(self):
+        """作業ディレクトリを削除する"""
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+    def __enter__(self) -> "PointWorkspace":
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
@@ -5,23 +5,70 @@
 
 from .file_io.config_manager import ConfigManager
 from .file_io.gis_reader import GISDataReader
-from .file_io.file_utils import read_rainfall_data
+from .file_io.file_utils import (read_rainfall_data, iter_rainfall_data, read_rainfall_ensemble,
+                                 read_rainfall_grid_index, read_rainfall_grids)
+from .file_io.workspace import PointWorkspace
+from .file_io.response_store import BasinResponseStore
+from .file_io.nowcast_store import NowcastStateStore
+from .file_io.run_manifest import RunManifest
+from .file_io.binary_output import (OUTPUT_FORMATS, write_table, write_table_stream, convert_to_text,
+                                    iter_flow_chunks, count_flow_values)
 from .calculators.flood_arrival_calculator import FloodArrivalCalculator
 from .calculators.rational_method_calculator import RationalMethodCalculator
-from .utils.geo_utils import find_nearest_point_data
-import subprocess
+from .calculators.basin_extractor import BasinExtractor
+from .calculators.flow_network import FlowNetworkIndex
+from .calculators.river_snapper import RiverCellIndex
+from .calculators.streaming_flow_accumulator import StreamingFlowAccumulator
+from .models.metadata import GISMetadata
+from .models.basin_response import BasinResponse
+from .models.analysis_points import AnalysisPoint, AnalysisPointTable
+from .utils.shared_arrays import SharedArrayStore, SharedArraySpec, attach_shared_array
+from .utils.profiling import StageProfiler
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+import argparse
+import dataclasses
 import pandas as pd
 import os
 import numpy as np
 
-class AnalysisPoint:
-    """解析地点を表すクラス"""
-    def __init__(self, lon, lat, link_id):
-        self.lon = lon
-        self.lat = lat
-        self.link_id = link_id
-        self.output_files = {}
+@dataclass
+class PipelineContext:
+    """全地点で共通に使用するデータ"""
+    metadata: GISMetadata
+    upg_data: np.ndarray
+    dir_data: np.ndarray
+    dem_data: np.ndarray
+    landuse_data: np.ndarray
+    rainfall_data: Dict[float, float]
+    params: dict
+    # アンサンブル降雨 (時刻(s), メンバー名, 雨量(mm/h) (メンバー数, 時刻数))
+    rainfall_ensemble: Optional[Tuple[np.ndarray, List[str], np.ndarray]] = None
+    # 流域応答の保存先と、入力ラスタ・パラメータから作成したキー（Noneの場合は保存しない）
+    response_dir: Optional[str] = None
+    response_key: Optional[str] = None
+    # 格子雨量の一覧ファイル（指定時は流量を格子雨量で計算する）
+    rainfall_grid_file: Optional[str] = None
+    # 実行ごとに1回だけ読み込んだ格子雨量 (時刻(s), 雨量(mm/h) データ配列[x, y], 格子のメタデータ)
+    rainfall_grids: Optional[List[Tuple[float, np.ndarray, GISMetadata]]] = None
+    # 逐次読み込みする雨量ファイル（指定時はrainfall_dataを使わずに1行ずつ処理する）
+    rainfall_stream_file: Optional[str] = None
+    # 全ての降雨時刻の出力区間内でのずれ(s)（required_phasesで作成）
+    rainfall_phases: Optional[np.ndarray] = None
+    # 逐次計算の途中状態の保存先（nowcastモード）
+    nowcast_dir: Optional[str] = None
+    # 流向データ全体の流下ネットワークの索引（Noneの場合は地点ごとに上流域を探索する）
+    flow_network: Optional[FlowNetworkIndex] = None
+    # 標高・土地利用データのファイルパス（dem_data, landuse_dataがNoneの場合、流域の範囲のみを読み込む）
+    dem_file: Optional[str] = None
+    landuse_file: Optional[str] = None
+    # 地点ごとの処理結果の記録先と、入力ファイル・パラメータから作成したキー（Noneの場合は記録しない）
+    manifest_dir: Optional[str] = None
+    run_key: Optional[str] = None
+    # 処理段階ごとの計測（既定は計測しない）
+    profiler: StageProfiler = field(default_factory=StageProfiler)
 
 def read_analysis_points(file_path):
     """
@@ -34,8 +81,8 @@ def read_analysis_points(file_path):
     
     Returns:
     --------
-    list[AnalysisPoint]
-        解析地点のリスト
+    AnalysisPointTable
+        解析地点の表
     """
     try:
         points_df = pd.read_csv(file_path)
@@ -43,87 +90,72 @@ def read_analysis_points(file_path):
         if not all(col in points_df.columns for col in required_columns):
             raise ValueError(f"必要なカラム {required_columns} が見つかりません")
         
-        return [
-            AnalysisPoint(row['target_lon'], row['target_lat'], row['target_linkid'])
-            for _, row in points_df.iterrows()
-        ]
+        link_id = points_df['target_linkid'].to_numpy()
+        # 数値のIDは従来（行ごとの読み込み）と同じく浮動小数点数とする
+        if np.issubdtype(link_id.dtype, np.number):
+            link_id = link_id.astype(float)
+        return AnalysisPointTable(
+            lon=points_df['target_lon'].to_numpy(dtype=float),
+            lat=points_df['target_lat'].to_numpy(dtype=float),
+            link_id=link_id
+        )
     except Exception as e:
         print(f"解析地点ファイルの読み込みエラー: {e}")
         raise
 
-def create_output_path_for_point(point_id):
+def create_profile_path(flow_results_file: str) -> str:
+    """計測結果の出力パス（flow_results_fileと同じディレクトリの <ファイル名>_profile.json）"""
+    path = Path(flow_results_file)
+    return str(path.with_name(f'{path.stem}_profile.json'))
+
+def create_output_path_for_point(point_id, ensemble: bool = False, nowcast: bool = False, binary: bool = False):
     """
-    extract_basin.exeの出力ファイルパスを生成する
+    解析地点ごとの出力ファイルパスを生成する
     
     Parameters:
     -----------
     point_id : Union[str, int, float]
         解析地点のID
-    
+    ensemble : bool
+        アンサンブル計算結果の出力パスを含めるか
+    nowcast : bool
+        nowcastモードの予測流量の出力パスを含めるか
+    binary : bool
+        流量・到達時間をNumPy形式(.npz)で出力するか
+
     Returns:
     --------
-    tuple[dict, dict]
-        (元のファイルパス, リネーム後のファイルパス)
+    dict
+        出力の種類と解析地点ごとのファイルパス
     """
     point_id_str = str(int(float(point_id)))
     base_paths = {
-        'distance': 'log/dir.txt_distance.txt',
-        'elevation': 'log/dem.txt_extracted.txt',
-        'landuse': 'log/landuse.txt_extracted.txt',
-        'basin': 'log/dir.txt_basin.txt',
         'timedelay': 'log/flood_arrival_time.asc',
         'flow': 'out/asuwatyuryu_flow2.csv'
     }
-    
-    # extract_basin.exeが生成したファイルを後で適切な名前にリネーム
-    renamed_paths = {}
+    if ensemble:
+        base_paths['ensemble'] = 'out/ensemble_flow.npz'
+    if nowcast:
+        base_paths['nowcast'] = 'out/nowcast_flow.csv'
+    if binary:
+        base_paths['timedelay'] = 'log/flood_arrival_time.npz'
+        base_paths['flow'] = 'out/asuwatyuryu_flow2.npz'
+
+    # 解析地点IDを付与したファイル名
+    output_paths = {}
     for key, base_path in base_paths.items():
         path = Path(base_path)
-        new_path = path.parent / f"{path.stem}_{point_id_str}{path.suffix}"
-        renamed_paths[key] = str(new_path)
+        output_paths[key] = str(path.parent / f"{path.stem}_{point_id_str}{path.suffix}")
     
-    return base_paths, renamed_paths
+    return output_paths
 
-def rename_output_files(base_paths, renamed_paths):
-    """
-    extract_basin.exeが生成したファイルを解析地点ごとの名前にリネームする
-    
-    Parameters:
-    -----------
-    base_paths : dict
-        元のファイルパス
-    renamed_paths : dict
-        リネーム後のファイルパス
-    """
-    for key in base_paths.keys():
-        if Path(base_paths[key]).exists():
-            # 既存のリネーム先ファイルがあれば削除
-            if Path(renamed_paths[key]).exists():
-                Path(renamed_paths[key]).unlink()
-            # リネーム実行
-            Path(base_paths[key]).rename(renamed_paths[key])
-
-def check_output_file_exists(filepath: str, description: str = "") -> None:
-    """
-    出力ファイルの存在を確認する
-    
-    Parameters:
-    -----------
-    filepath : str
-        確認するファイルパス
-    description : str
-        ファイルの説明（エラーメッセージ用）
-    
-    Raises:
-    -------
-    RuntimeError
-        ファイルが存在しない場合
-    """
-    if not Path(filepath).exists():
-        error_msg = f"Output file not created: {filepath}"
-        if description:
-            error_msg += f" ({description})"
-        raise RuntimeError(error_msg)
+def point_output_files(point: AnalysisPoint, context: PipelineContext) -> Dict[str, str]:
+    """解析地点の出力ファイルパス（出力の種類は全地点で共通の設定から決める）"""
+    return create_output_path_for_point(
+        point.link_id,
+        ensemble=context.rainfall_ensemble is not None,
+        binary=context.params.get('output_format', 'csv') != 'csv'
+    )
 
 def prepare_output_directories():
     """出力ディレクトリを作成する"""
@@ -133,46 +165,702 @@ def prepare_output_directories():
         if not dir_path.exists():
             dir_path.mkdir(parents=True, exist_ok=True)
 
-def merge_flow_results(points, output_path, dtq):
+def merge_flow_results(hydrographs, output_path, dtq, output_format: str = 'csv'):
     """
     全地点の流量計算結果をマージする
+    各地点の流量は時刻 0, dtq, 2*dtq, ... の共通の時間軸上の配列として受け取り、
+    (時刻数 × 地点数) の配列にまとめて一度で書き出す
     
     Parameters:
     -----------
-    points : list[AnalysisPoint]
-        解析地点のリスト
+    hydrographs : list[tuple[Union[str, int, float], np.ndarray]]
+        (解析地点のID, 流量(m3/s)の配列) のリスト
     output_path : str
         出力ファイルパス
     dtq : float
         時間間隔（秒）
+    output_format : str
+        'csv'、'npz'、'parquet'（CSV以外は丸めずに出力し、拡張子を出力形式に合わせる）
     """
-    dfs = []
-    for point in points:
-        df = pd.read_csv(point.output_files['flow'])
-        # IDから小数点を削除して整数に変換
-        point_id = str(int(float(point.link_id)))
-        # Flow(m3/s) カラムの名前を整数のIDに基づいて変更
-        df = df.rename(columns={'Flow(m3/s)': f'flow_{point_id}'})
-        dfs.append(df)
+    if not hydrographs:
+        print("No flow results to merge")
+        return
     
-    # 最も長いタイムステップを持つデータフレームを見つける
-    max_time = max(df['Time(s)'].max() for df in dfs)
-    # 全タイムステップを生成（dtqの間隔で）
-    full_time_range = pd.DataFrame({'Time(s)': np.arange(0, max_time + dtq, dtq)})
+    # 最も長い時系列に合わせ、短い地点の後半は0.0とする
+    n_times = max(len(flows) for _, flows in hydrographs)
+    flow_matrix = np.zeros((n_times, len(hydrographs)))
+    columns = []
+    for j, (link_id, flows) in enumerate(hydrographs):
+        # CSVの場合は地点ごとのCSVと同じ小数点以下6桁に丸める
+        flow_matrix[:len(flows), j] = np.round(flows, 6) if output_format == 'csv' else flows
+        # IDから小数点を削除して整数に変換
+        columns.append(f'flow_{int(float(link_id))}')
     
-    # 最初のデータフレームをベースに他のデータフレームをマージ
-    result = full_time_range
-    for df in dfs:
-        # 外部結合（outer）を使用し、NaNを0.0で埋める
-        result = pd.merge(result, df, on='Time(s)', how='outer').fillna(0.0)
+    if output_format != 'csv':
+        write_table(np.arange(n_times) * float(dtq), columns, flow_matrix, output_path, output_format)
+        return
     
-    # Time(s)でソート
-    result = result.sort_values('Time(s)')
+    result = pd.DataFrame(flow_matrix, columns=columns)
+    result.insert(0, 'Time(s)', np.arange(n_times) * float(dtq))
     
     result.to_csv(output_path, index=False)
 
-def main():
+# 流量ファイルのマージで1回に出力する値の数（時刻数×地点数）
+MERGE_CHUNK_VALUES = 1 << 22
+
+def merge_flow_files(flow_files, output_path, dtq, output_format: str = 'csv'):
+    """
+    地点ごとの流量ファイルを読み込んでマージする（逐次出力の場合）
+    流量は一時ファイルにマップした (時刻数 × 地点数) の配列に1地点ずつ読み込み、
+    時刻の区間ごとに書き出すため、使用メモリは時系列長によらない
+    
+    Parameters:
+    -----------
+    flow_files : list[tuple[Union[str, int, float], str]]
+        (解析地点のID, 流量ファイルのパス) のリスト
+    output_path : str
+        出力ファイルパス
+    dtq : float
+        時間間隔（秒）
+    output_format : str
+        merge_flow_resultsと同じ
+    """
+    if not flow_files:
+        print("No flow results to merge")
+        return
+    
+    # 最も長い時系列に合わせ、短い地点の後半は0.0とする（merge_flow_resultsと同じ）
+    n_times = max(count_flow_values(path) for _, path in flow_files)
+    columns = [f'flow_{int(float(link_id))}' for link_id, _ in flow_files]
+    matrix_file = f"{output_path}.{os.getpid()}.tmp.npy"
+    try:
+        flow_matrix = np.lib.format.open_memmap(matrix_file, mode='w+', dtype=float,
+                                                shape=(n_times, len(flow_files)))
+        for j, (_, path) in enumerate(flow_files):
+            offset = 0
+            for flows in iter_flow_chunks(path):
+                flow_matrix[offset:offset + len(flows), j] = flows
+                offset += len(flows)
+        
+        rows = max(MERGE_CHUNK_VALUES // len(flow_files), 1)
+        write_table_stream(
+            (
+                (
+                    np.arange(start, min(start + rows, n_times)) * float(dtq),
+                    # CSVの場合は地点ごとのCSVと同じ小数点以下6桁に丸める
+                    np.round(flow_matrix[start:start + rows], 6) if output_format == 'csv'
+                    else flow_matrix[start:start + rows]
+                )
+                for start in range(0, n_times, rows)
+            ),
+            columns,
+            output_path,
+            output_format
+        )
+        del flow_matrix
+    finally:
+        if os.path.exists(matrix_file):
+            os.remove(matrix_file)
+
+def make_response_key(reader: GISDataReader, paths: dict, params: dict) -> str:
+    """
+    流域応答の保存キー（全地点共通部分）を作成する
+    入力ラスタの内容と、到達時間・流出係数の計算条件が同じ場合のみ一致する
+    
+    Parameters:
+    -----------
+    reader : GISDataReader
+        ハッシュ値の取得に使用するリーダー
+    paths : dict
+        設定ファイルのfile_paths
+    params : dict
+        設定ファイルのparameters
+    
+    Returns:
+    --------
+    str
+        キー
+    """
+    return BasinResponseStore.make_key(
+        key_version=BasinResponseStore.KEY_VERSION,
+        rasters={
+            key: reader.file_digest(paths[key])
+            for key in ('upg_file', 'dir_file', 'dem_file', 'landuse_file')
+        },
+        threshold=params['threshold'],
+        dtq=float(params['dtq']),
+        velocity_table=FloodArrivalCalculator.normalize_velocity_table(params.get('velocity_table')),
+        runoff_coefficients=sorted(
+            RationalMethodCalculator.normalize_runoff_coefficients(params.get('runoff_coefficients')).items()
+        ),
+        default_runoff_coefficient=float(
+            params.get('default_runoff_coefficient', RationalMethodCalculator.DEFAULT_RUNOFF_COEFFICIENT)
+        ),
+        cell_area_method=params.get('cell_area_method', 'mean'),
+        snap_radius_m=float(params.get('snap_radius_m', 0)),
+        travel_time_method=params.get('travel_time_method', 'average')
+    )
+
+def make_run_key(reader: GISDataReader, paths: dict, params: dict) -> str:
+    """
+    処理結果の記録のキー（全地点共通部分）を作成する
+    流域応答の条件に加え、雨量ファイルの内容と出力の条件が同じ場合のみ一致する
+    
+    Parameters:
+    -----------
+    reader : GISDataReader
+        ハッシュ値の取得に使用するリーダー
+    paths : dict
+        設定ファイルのfile_paths
+    params : dict
+        設定ファイルのparameters
+    
+    Returns:
+    --------
+    str
+        キー
+    """
+    rainfall_files = {
+        key: reader.file_digest(paths[key])
+        for key in ('rainfall_file', 'rainfall_ensemble_file', 'rainfall_grid_file')
+        if paths.get(key)
+    }
+    if paths.get('rainfall_grid_file'):
+        rainfall_files['rainfall_grids'] = [
+            (time, reader.file_digest(grid_file))
+            for time, grid_file in read_rainfall_grid_index(paths['rainfall_grid_file'])
+        ]
+    return BasinResponseStore.make_key(
+        response=make_response_key(reader, paths, params),
+        rainfall_files=rainfall_files,
+        rainfall_streaming=bool(params.get('rainfall_streaming', False)),
+        output_format=params.get('output_format', 'csv')
+    )
+
+def point_run_key(point: AnalysisPoint, context: PipelineContext) -> str:
+    """解析地点の処理結果の記録のキー"""
+    return BasinResponseStore.make_key(base=context.run_key, lon=point.lon, lat=point.lat, link_id=point.link_id)
+
+def required_phases(context: PipelineContext) -> np.ndarray:
+    """全ての降雨時刻の出力区間内でのずれ(s)"""
+    if context.rainfall_phases is not None:
+        return context.rainfall_phases
+    
+    dtq = context.params['dtq']
+    times = np.array(list(context.rainfall_data.keys()), dtype=float)
+    if context.rainfall_ensemble is not None:
+        times = np.concatenate([times, context.rainfall_ensemble[0]])
+    phases = RationalMethodCalculator.rainfall_phases(times, dtq)
+    if context.rainfall_stream_file is not None:
+        # 時系列は保持せず、phaseのみを集める
+        stream_phases = {
+            float(phase)
+            for time, _ in iter_rainfall_data(context.rainfall_stream_file)
+            for phase in RationalMethodCalculator.rainfall_phases([time], dtq)
+        }
+        phases = np.union1d(phases, sorted(stream_phases))
+    return phases
+
+def point_response_key(point: AnalysisPoint, context: PipelineContext) -> Optional[str]:
+    """解析地点の流域応答の保存キー（保存しない場合はNone）"""
+    if context.response_dir is None or context.response_key is None:
+        return None
+    return BasinResponseStore.make_key(base=context.response_key, lon=point.lon, lat=point.lat)
+
+def load_point_response(point: AnalysisPoint, context: PipelineContext) -> Optional[BasinResponse]:
+    """
+    保存済みの流域応答を読み込む
+    
+    Returns:
+    --------
+    Optional[BasinResponse]
+        今回の降雨で使用できる流域応答。保存されていない・使用できない場合はNone
+    """
+    key = point_response_key(point, context)
+    # 格子雨量はセルごとの到達時間が必要なため、流域応答は使用できない
+    if key is None or context.rainfall_grid_file is not None:
+        return None
+    response = BasinResponseStore(context.response_dir).load(key)
+    # 洪水到達時間を出力できない流域応答は作成し直す
+    if (response is None or not response.has_arrival_time or response.dtq != float(context.params['dtq'])
+            or not response.has_phases(required_phases(context))):
+        return None
+    return response
+
+def calculate_and_export_flows(rational_calculator: RationalMethodCalculator, context: PipelineContext,
+                               workspace: PointWorkspace) -> Union[np.ndarray, str]:
+    """
+    流量を計算し、作業ディレクトリに出力する
+    
+    Returns:
+    --------
+    Union[np.ndarray, str]
+        時刻 0, dtq, 2*dtq, ... の流量(m3/s)。逐次出力の場合は流量を保持せず、
+        流量ファイルの最終的な出力先のパス（マージ時に読み込む）
+    """
+    params = context.params
+    if context.rainfall_stream_file is not None:
+        # 確定した時刻から順次出力
+        rational_calculator.export_results_stream(
+            rational_calculator.stream_flow(
+                iter_rainfall_data(context.rainfall_stream_file),
+                params['dtq']
+            ),
+            workspace.path('flow')
+        )
+        flows = workspace.output_files['flow']
+    else:
+        if context.rainfall_grid_file is not None:
+            output_times, flows = rational_calculator.calculate_gridded_flow(
+                context.rainfall_grids,
+                params['dtq']
+            )
+        else:
+            output_times, flows = rational_calculator.calculate_flow_array(
+                context.rainfall_data,
+                params['dtq']
+            )
+        
+        # 結果の出力
+        rational_calculator.export_flow_array(
+            output_times,
+            flows,
+            workspace.path('flow')
+        )
+    
+    # アンサンブル降雨の全メンバーを一括で計算
+    if context.rainfall_ensemble is not None:
+        times, members, rainfall = context.rainfall_ensemble
+        ensemble_times, ensemble_flows = rational_calculator.calculate_ensemble_flow(
+            times,
+            rainfall,
+            params['dtq']
+        )
+        rational_calculator.export_ensemble_results(
+            ensemble_times,
+            ensemble_flows,
+            members,
+            workspace.path('ensemble')
+        )
+    return flows
+
+def process_point(point: AnalysisPoint, context: PipelineContext,
+                  response: Optional[BasinResponse] = None) -> Optional[Union[np.ndarray, str]]:
+    """
+    1地点分の流域抽出から流量計算・出力までを実行する
+    
+    Parameters:
+    -----------
+    point : AnalysisPoint
+        解析地点
+    context : PipelineContext
+        全地点で共通のデータ
+    response : BasinResponse, optional
+        読み込み済みの保存済みの流域応答（load_point_responseの戻り値）。
+        Noneの場合は流域抽出・到達時間計算を行う
+    
+    Returns:
+    --------
+    Optional[Union[np.ndarray, str]]
+        時刻 0, dtq, 2*dtq, ... の流量(m3/s)（逐次出力の場合は流量ファイルのパス）。
+        河川セルでない等で処理しなかった場合None
+    """
+    print(f"Processing point {point.link_id} ({point.lon}, {point.lat})")
+    profiler = context.profiler
+    reader = GISDataReader(cache_max_bytes=0)
+    with profiler.point(point.link_id):
+        flows = _process_point(point, context, response, reader, profiler)
+        profiler.count('bytes_read', reader.bytes_read)
+        # 処理が完了した地点を記録する（再実行時は処理を省略する）
+        if flows is not None and context.manifest_dir is not None:
+            with profiler.stage('record_manifest'):
+                RunManifest(context.manifest_dir).record(
+                    point.link_id,
+                    point_run_key(point, context),
+                    context.params,
+                    point_output_files(point, context),
+                    flows if isinstance(flows, np.ndarray) else None
+                )
+    return flows
+
+def _process_point(point: AnalysisPoint, context: PipelineContext, response: Optional[BasinResponse],
+                   reader: GISDataReader, profiler: StageProfiler) -> Optional[Union[np.ndarray, str]]:
+    """process_pointの処理本体（段階ごとに計測する）"""
+    params = context.params
+    rational_calculator = RationalMethodCalculator(
+        reader,
+        params.get('cell_area_method', 'mean'),
+        runoff_coefficients=params.get('runoff_coefficients'),
+        default_runoff_coefficient=params.get('default_runoff_coefficient'),
+        raster_metadata=context.metadata
+    )
+    
+    # 保存済みの流域応答がある場合は流域抽出・到達時間計算を省略する
+    if response is not None:
+        print(f"Using stored basin response for point {point.link_id}")
+        rational_calculator.set_response(response)
+        with PointWorkspace(point.link_id, point_output_files(point, context)) as workspace:
+            # 洪水到達時間は保存済みの値を出力する
+            FloodArrivalCalculator(reader).save_arrival_time(
+                response.arrival_time_grid(),
+                response.metadata,
+                workspace.path('timedelay')
+            )
+            with profiler.stage('calculate_flow'):
+                flows = calculate_and_export_flows(rational_calculator, context, workspace)
+            with profiler.stage('publish'):
+                workspace.publish()
+        return flows
+    
+    # 河川セル（snap_analysis_pointsで割り当て済み）
+    if point.river_cell is None:
+        raise RuntimeError(f"Point {point.link_id} is not assigned to a river cell")
+    row, col = point.river_cell
+    
+    # 流域抽出
+    extractor = BasinExtractor(
+        context.dir_data,
+        context.metadata,
+        context.dem_data,
+        context.landuse_data,
+        network=context.flow_network,
+        dem_file=context.dem_file,
+        landuse_file=context.landuse_file,
+        reader=reader
+    )
+    try:
+        with profiler.stage('extraction'):
+            basin = extractor.extract_sparse(row, col)
+    except ValueError as e:
+        print(f"Error in basin extraction for point {point.link_id}: {e}")
+        return None
+    profiler.count('basin_cells', basin.n_cells)
+    
+    # 出力は地点専用の作業ディレクトリに書き込み、完了後に出力先へ公開する
+    with PointWorkspace(point.link_id, point_output_files(point, context)) as workspace:
+        # 洪水到達時間の計算
+        with profiler.stage('calculate_arrival_time'):
+            flood_calculator = FloodArrivalCalculator(
+                reader,
+                params.get('velocity_table'),
+                params.get('travel_time_method', 'average')
+            )
+            arrival_time = flood_calculator.process_sparse_basin_and_save(
+                basin,
+                workspace.path('timedelay')
+            )
+        
+        # 合成合理式による流量計算
+        with profiler.stage('build_response'):
+            rational_calculator.set_sparse_data(arrival_time, basin)
+            # 保存済みの流域応答を使う場合も洪水到達時間を出力できるように保持する
+            response = dataclasses.replace(
+                rational_calculator.build_response(params['dtq'], required_phases(context)),
+                arrival_time=arrival_time,
+                cell_index=basin.index,
+                metadata=basin.metadata
+            )
+            rational_calculator.set_response(response)
+        with profiler.stage('calculate_flow'):
+            flows = calculate_and_export_flows(rational_calculator, context, workspace)
+        
+        with profiler.stage('publish'):
+            workspace.publish()
+    
+    # 次回以降の計算のために流域応答を保存
+    key = point_response_key(point, context)
+    if key is not None:
+        with profiler.stage('save_response'):
+            BasinResponseStore(context.response_dir).save(key, response)
+    return flows
+
+def snap_analysis_points(points: AnalysisPointTable, context: PipelineContext) -> AnalysisPointTable:
+    """
+    全地点を一括で河川セルに割り当てる（地点を含むセルが河川セルでない場合は
+    探索半径 snap_radius_m 以内で最も近い河川セル）
+    
+    Parameters:
+    -----------
+    points : AnalysisPointTable
+        解析地点の表
+    context : PipelineContext
+        全地点で共通のデータ（上流ピクセル数を読み込み済みであること）
+    
+    Returns:
+    --------
+    AnalysisPointTable
+        河川セルに割り当てた地点の表（river_row, river_colを設定済み）
+    """
+    params = context.params
+    radius = float(params.get('snap_radius_m', 0))
+    index = RiverCellIndex(context.upg_data, context.metadata, params['threshold'])
+    snapped = index.snap(points.lon, points.lat, radius)
+    
+    for k in np.flatnonzero(~snapped.found):
+        print(f"error : not river for point {points.link_id[k]}")
+        print(f"指定座標: ({points.lon[k]}, {points.lat[k]})")
+        print(f"データ値: {snapped.value[k]:.2f}")
+        print(f"探索半径(m): {radius}")
+    for k in np.flatnonzero(snapped.snapped):
+        cell_lon, cell_lat = index.grid.coords(snapped.x_index[k] + 0.5, snapped.y_index[k] + 0.5)
+        print(f"Snapped point {points.link_id[k]} to river cell ({cell_lon:.4f}, {cell_lat:.4f}), "
+              f"{snapped.distance[k]:.1f} m")
+    
+    points.river_row, points.river_col = snapped.raster_cells(context.metadata.ny)
+    return points.select(snapped.found)
+
+def iter_context_rainfall(context: PipelineContext) -> Iterator[Tuple[float, float]]:
+    """時刻順の (時刻(s), 雨量(mm/h))"""
+    if context.rainfall_stream_file is not None:
+        return iter_rainfall_data(context.rainfall_stream_file)
+    return iter(sorted(context.rainfall_data.items()))
+
+def export_nowcast_results(final: Tuple[np.ndarray, np.ndarray], forecast: Tuple[np.ndarray, np.ndarray],
+                           output_file: str):
+    """
+    nowcastの計算結果をCSVファイルとして出力
+    
+    Parameters:
+    -----------
+    final : Tuple[np.ndarray, np.ndarray]
+        今回新たに確定した (時刻(s), 流量(m3/s))
+    forecast : Tuple[np.ndarray, np.ndarray]
+        未確定の (時刻(s), 流量(m3/s))（以降の降雨を0とした予測値）
+    output_file : str
+        出力ファイルパス
+    """
+    with open(output_file, 'w') as f:
+        f.write('Time(s),Flow(m3/s),Final\n')
+        for is_final, (times, flows) in ((1, final), (0, forecast)):
+            for t, flow in zip(times, flows):
+                f.write(f'{t:.1f},{flow:.6f},{is_final}\n')
+
+def nowcast_point(point: AnalysisPoint, context: PipelineContext,
+                  response: Optional[BasinResponse] = None) -> Optional[np.ndarray]:
+    """
+    保存した途中状態に前回以降の降雨のみを加算し、予測流量を出力する
+    初回（途中状態がない・流域応答が変わった場合）は全ての降雨を加算する
+    
+    Parameters:
+    -----------
+    point : AnalysisPoint
+        解析地点
+    context : PipelineContext
+        全地点で共通のデータ
+    response : BasinResponse, optional
+        読み込み済みの保存済みの流域応答（load_point_responseの戻り値）
+    
+    Returns:
+    --------
+    Optional[np.ndarray]
+        未確定の区間の流量(m3/s)。河川セルでない等で処理しなかった場合None
+    """
+    key = point_response_key(point, context)
+    if key is None or context.nowcast_dir is None:
+        raise ValueError("Nowcast mode requires response_cache_dir and nowcast_state_dir")
+    if context.rainfall_grid_file is not None:
+        raise ValueError("Nowcast mode does not support rainfall_grid_file")
+    
+    # 流域応答がない場合は通常の計算で作成・保存する
+    if response is None:
+        if process_point(point, context) is None:
+            return None
+        response = load_point_response(point, context)
+    
+    accumulator = StreamingFlowAccumulator(response)
+    state_store = NowcastStateStore(context.nowcast_dir)
+    state = state_store.load(point.link_id, key)
+    if state is not None:
+        accumulator.restore(state)
+    
+    # 前回以降の降雨のみを加算
+    final_times = []
+    final_flows = []
+    n_steps = 0
+    for time, rainfall in iter_context_rainfall(context):
+        if accumulator.last_time is not None and time <= accumulator.last_time:
+            continue
+        times, flows = accumulator.push(time, rainfall)
+        final_times.append(times)
+        final_flows.append(flows)
+        n_steps += 1
+    print(f"Nowcast point {point.link_id}: {n_steps} new rainfall steps")
+    
+    output_file = create_output_path_for_point(point.link_id, nowcast=True)['nowcast']
+    forecast = accumulator.pending()
+    with PointWorkspace(point.link_id, {'nowcast': output_file}) as workspace:
+        export_nowcast_results(
+            (np.concatenate(final_times or [np.zeros(0)]), np.concatenate(final_flows or [np.zeros(0)])),
+            forecast,
+            workspace.path('nowcast')
+        )
+        workspace.publish()
+    state_store.save(point.link_id, key, accumulator.get_state())
+    return forecast[1]
+
+# 並列実行時の子プロセスごとの共通データ
+_worker_context: Optional[PipelineContext] = None
+_worker_shared_memory = []
+
+def _init_worker(context: PipelineContext, raster_specs: Dict[str, SharedArraySpec],
+                 network_specs: Optional[Dict[str, SharedArraySpec]] = None,
+                 network_shape: Optional[Tuple[int, int]] = None,
+                 grid_specs: Optional[List[SharedArraySpec]] = None):
+    """子プロセスの初期化: 共有メモリ上のラスタ・流下ネットワークの索引・格子雨量を参照する"""
+    global _worker_context
+    rasters = {}
+    for key, spec in raster_specs.items():
+        rasters[key], shm = attach_shared_array(spec)
+        _worker_shared_memory.append(shm)
+    if network_specs:
+        network_arrays = {}
+        for key, spec in network_specs.items():
+            network_arrays[key], shm = attach_shared_array(spec)
+            _worker_shared_memory.append(shm)
+        rasters['flow_network'] = FlowNetworkIndex(context.metadata, network_shape, network_arrays)
+    if grid_specs:
+        frames = []
+        for (time, _, frame_metadata), spec in zip(context.rainfall_grids, grid_specs):
+            frame, shm = attach_shared_array(spec)
+            _worker_shared_memory.append(shm)
+            frames.append((time, frame, frame_metadata))
+        rasters['rainfall_grids'] = frames
+    _worker_context = dataclasses.replace(context, **rasters)
+    _worker_context.profiler.start()
+
+def _process_point_in_worker(point: AnalysisPoint, response: Optional[BasinResponse]
+                             ) -> Tuple[Optional[Union[np.ndarray, str]], Dict[str, dict]]:
+    """子プロセスで1地点分の処理を実行する（地点ごとの計測結果も返す）"""
+    flows = process_point(point, _worker_context, response)
+    return flows, _worker_context.profiler.take_points()
+
+def run_points_parallel(points: AnalysisPointTable, context: PipelineContext, workers: int,
+                        responses: Optional[Dict] = None) -> list:
+    """
+    解析地点をプロセスプールで並列に処理する
+    ラスタ・格子雨量は共有メモリに配置し、子プロセスへはコピーせずに渡す
+    
+    Parameters:
+    -----------
+    points : AnalysisPointTable
+        解析地点の表
+    context : PipelineContext
+        全地点で共通のデータ
+    workers : int
+        プロセス数
+    responses : dict, optional
+        地点IDごとの読み込み済みの流域応答（地点とともに子プロセスに渡す）
+    
+    Returns:
+    --------
+    list[Optional[Union[np.ndarray, str]]]
+        地点ごとのprocess_pointの戻り値
+    """
+    # 全地点で流域応答を再利用する場合はラスタを読み込んでいない
+    raster_keys = [
+        key for key in ('upg_data', 'dir_data', 'dem_data', 'landuse_data')
+        if getattr(context, key) is not None
+    ]
+    network = context.flow_network
+    with SharedArrayStore() as store:
+        raster_specs = {key: store.share(getattr(context, key)) for key in raster_keys}
+        network_specs = None
+        if network is not None:
+            network_specs = {key: store.share(network.arrays[key]) for key in FlowNetworkIndex.ARRAY_NAMES}
+        grid_specs = None
+        shared_grids = None
+        if context.rainfall_grids is not None:
+            grid_specs = [store.share(frame) for _, frame, _ in context.rainfall_grids]
+            shared_grids = [(time, None, frame_metadata) for time, _, frame_metadata in context.rainfall_grids]
+        # ラスタ以外の共通データのみを子プロセスに渡す
+        shared_context = dataclasses.replace(
+            context,
+            flow_network=None,
+            rainfall_grids=shared_grids,
+            profiler=context.profiler.worker_copy(),
+            **{key: None for key in raster_keys}
+        )
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(shared_context, raster_specs, network_specs, network.shape if network else None, grid_specs)
+        ) as executor:
+            results = []
+            point_responses = (responses.pop(point.link_id, None) if responses else None for point in points)
+            for flows, point_records in executor.map(_process_point_in_worker, points, point_responses):
+                context.profiler.merge_points(point_records)
+                results.append(flows)
+            return results
+
+def read_common_rasters(reader: GISDataReader, paths: dict, params: dict,
+                        context: PipelineContext) -> PipelineContext:
+    """
+    全地点で共通のラスタを読み込む
+    
+    Parameters:
+    -----------
+    reader : GISDataReader
+        ラスタを読み込むリーダー
+    paths : dict
+        設定ファイルのfile_paths
+    params : dict
+        設定ファイルのparameters
+    context : PipelineContext
+        全地点で共通のデータ
+    
+    Returns:
+    --------
+    PipelineContext
+        ラスタを設定した共通データ
+    """
+    upg_data, _ = reader.read_gis_file(paths['upg_file'])
+    metadata = reader.metadata
+    context = dataclasses.replace(
+        context,
+        metadata=metadata,
+        upg_data=upg_data,
+        dir_data=reader.read_gis_file(paths['dir_file'], expected_metadata=metadata)[0]
+    )
+    # 標高・土地利用は各地点の流域の範囲のみを使うため、バイナリキャッシュから範囲ごとに読み込む
+    for key in ('dem', 'landuse'):
+        filepath = paths[f'{key}_file']
+        if params.get('windowed_raster_read', True) and reader.supports_windowed_read(filepath, metadata):
+            setattr(context, f'{key}_file', filepath)
+        else:
+            setattr(context, f'{key}_data', reader.read_gis_file(filepath, expected_metadata=metadata)[0])
+    return context
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """コマンドライン引数を解析する"""
+    parser = argparse.ArgumentParser(description="合成合理式による流出量計算")
+    parser.add_argument(
+        '--workers', type=int, default=None,
+        help="並列処理のプロセス数（省略時は設定ファイルのworkers、既定は1）"
+    )
+    parser.add_argument(
+        '--nowcast', action='store_true',
+        help="前回の途中状態に新しい降雨のみを加算し、地点ごとの予測流量を出力する"
+    )
+    parser.add_argument(
+        '--profile', action='store_true',
+        help="処理段階ごとの実行時間等を計測し、flow_results_fileと同じディレクトリにJSONで出力する"
+    )
+    parser.add_argument(
+        '--convert', nargs='+', metavar='NPZ_FILE',
+        help="NumPy形式(.npz)の出力をCSV/ASC形式に変換して終了する"
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """メイン処理"""
+    args = parse_args(argv)
+    
+    # 出力ファイルの変換のみ
+    if args.convert:
+        for input_file in args.convert:
+            print(f"Converted {input_file} -> {convert_to_text(input_file)}")
+        return
+    
     # プロジェクトルートパスの取得
     project_root = Path(__file__).parent.parent
     
@@ -184,108 +872,178 @@ def main():
     paths = config.file_paths
     params = config.parameters
     
+    # 処理段階ごとの計測
+    profiler = StageProfiler(
+        enabled=args.profile or params.get('profiling', False),
+        cprofile=params.get('profile_cprofile', False),
+        memory=params.get('profile_tracemalloc', False)
+    )
+    profiler.start()
+    try:
+        run_pipeline(args, config, profiler)
+    finally:
+        profiler.stop()
+        profile_file = profiler.write_report(create_profile_path(paths['flow_results_file']))
+        if profile_file is not None:
+            print(f"Profile report: {profile_file}")
+
+def run_pipeline(args: argparse.Namespace, config: ConfigManager, profiler: StageProfiler):
+    """
+    設定ファイルの条件で全地点を処理する
+    
+    Parameters:
+    -----------
+    args : argparse.Namespace
+        コマンドライン引数
+    config : ConfigManager
+        設定
+    profiler : StageProfiler
+        処理段階ごとの計測
+    """
+    paths = config.file_paths
+    params = config.parameters
+    workers = args.workers if args.workers is not None else params.get('workers', 1)
+    output_format = params.get('output_format', 'csv')
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Invalid output format: {output_format}")
+    
     # 出力ディレクトリの準備
     prepare_output_directories()
     
     # 解析地点の読み込み
     analysis_points = read_analysis_points(config.analysis_points['input_file'])
+    ensemble_file = paths.get('rainfall_ensemble_file')
+
+    # upgファイルの確認
+    if paths.get('upg_file') is None:
+        print("alert no upgfile")
+        return
+    
+    # GISDataReaderのインスタンス化（ラスタは地点間で共有するためキャッシュする）
+    reader = GISDataReader(
+        cache_max_bytes=int(params.get('raster_cache_mb', 4096) * 1024**2),
+        sidecar_cache=params.get('raster_sidecar_cache', True)
+    )
+    
+    # 雨量データの読み込み
+    rainfall_grid_file = paths.get('rainfall_grid_file')
+    if not paths.get('rainfall_file') and not rainfall_grid_file:
+        raise ValueError("rainfall_file or rainfall_grid_file must be specified")
+    # 逐次処理の場合は雨量データを一括で読み込まない
+    rainfall_stream_file = None
+    rainfall_data = {}
+    with profiler.stage('read_rainfall'):
+        if paths.get('rainfall_file') and not rainfall_grid_file:
+            if params.get('rainfall_streaming', False) or args.nowcast:
+                rainfall_stream_file = paths['rainfall_file']
+            else:
+                rainfall_data = read_rainfall_data(paths['rainfall_file'])
+        rainfall_ensemble = read_rainfall_ensemble(ensemble_file) if ensemble_file else None
+        # 格子雨量は全地点で共有する
+        rainfall_grids = read_rainfall_grids(rainfall_grid_file) if rainfall_grid_file else None
+    
+    context = PipelineContext(
+        metadata=None,
+        upg_data=None,
+        dir_data=None,
+        dem_data=None,
+        landuse_data=None,
+        rainfall_data=rainfall_data,
+        params=params,
+        rainfall_ensemble=rainfall_ensemble,
+        rainfall_grid_file=rainfall_grid_file,
+        rainfall_grids=rainfall_grids,
+        rainfall_stream_file=rainfall_stream_file,
+        nowcast_dir=paths.get('nowcast_state_dir'),
+        profiler=profiler
+    )
+    with profiler.stage('rainfall_phases'):
+        context.rainfall_phases = required_phases(context)
+    
+    # 流域応答の保存先（入力ラスタが変わるとキーが変わり再計算される）
+    if paths.get('response_cache_dir'):
+        context.response_dir = paths['response_cache_dir']
+        with profiler.stage('response_key'):
+            context.response_key = make_response_key(reader, paths, params)
+    
+    # 前回の実行から入力条件・出力ファイルが変わっていない地点は処理しない
+    all_points = analysis_points
+    current = np.zeros(len(all_points), dtype=bool)
+    # 処理を省略する地点の記録した流量（逐次出力の場合は地点ごとの流量ファイルを使う）
+    current_flows = {}
+    if paths.get('run_manifest_dir') and not args.nowcast:
+        with profiler.stage('run_manifest'):
+            context.manifest_dir = paths['run_manifest_dir']
+            context.run_key = make_run_key(reader, paths, params)
+            manifest = RunManifest(context.manifest_dir)
+            for i, point in enumerate(all_points):
+                if not manifest.is_current(point.link_id, point_run_key(point, context)):
+                    continue
+                if context.rainfall_stream_file is None:
+                    # 記録した流量を読み込めない地点は再処理する
+                    flows = manifest.load_flows(point.link_id)
+                    if flows is None:
+                        print(f"Warning: recorded flows for point {point.link_id} could not be read; reprocessing")
+                        continue
+                    current_flows[point.link_id] = flows
+                current[i] = True
+        profiler.count('skipped_points', int(np.sum(current)))
+        if current.any():
+            print(f"Skipping {int(np.sum(current))} of {len(all_points)} points with up-to-date outputs")
+        analysis_points = all_points.select(~current)
+    
+    # 保存済みの流域応答（地点の処理で使用するため、処理するまで保持する）
+    with profiler.stage('load_responses'):
+        responses = {point.link_id: load_point_response(point, context) for point in analysis_points}
     
-    # GISDataReaderのインスタンス化
-    reader = GISDataReader()
+    # 全地点で共通のラスタの読み込み（全地点で保存済みの流域応答を使う場合は不要）
+    if not all(response is not None for response in responses.values()):
+        with profiler.stage('read_rasters'):
+            context = read_common_rasters(reader, paths, params, context)
+        profiler.count('bytes_read', reader.bytes_read)
+        # 河川セルでない地点は処理しない
+        with profiler.stage('snap_points'):
+            analysis_points = snap_analysis_points(analysis_points, context)
+        # 複数地点の上流域を1回の走査で求めるための索引
+        if params.get('flow_network_index', True) and len(analysis_points) > 1:
+            with profiler.stage('flow_network'):
+                context.flow_network = FlowNetworkIndex.build(context.dir_data, context.metadata)
+    
+    # nowcastモードでは地点ごとの予測流量のみを出力する
+    if args.nowcast:
+        with profiler.stage('points'):
+            for point in analysis_points:
+                nowcast_point(point, context, responses.pop(point.link_id, None))
+        return
     
     # 各解析地点に対して処理を実行
-    for point in analysis_points:
-        print(f"Processing point {point.link_id} ({point.lon}, {point.lat})")
-        
-        # 出力ファイルパスの生成
-        base_paths, renamed_paths = create_output_path_for_point(point.link_id)
-        point.output_files = renamed_paths
-        
-        # upgファイルの確認と読み込み
-        if paths.get('upg_file') is None:
-            print("alert no upgfile")
+    with profiler.stage('points'):
+        if workers > 1:
+            results = run_points_parallel(analysis_points, context, workers, responses)
         else:
-            upg_data, upg_x_coords, upg_y_coords = reader.read_gis_file(paths['upg_file'])
-        
-        # 流向データの読み込み
-        dir_data, dir_x_coords, dir_y_coords = reader.read_gis_file(paths['dir_file'])
-        
-        # 最近傍点の検索と閾値判定
-        nearest_x, nearest_y, value, is_above, num_x, num_y = find_nearest_point_data(
-            upg_x_coords,
-            upg_y_coords,
-            upg_data,
-            point.lon,
-            point.lat,
-            reader.metadata.xllcorner,
-            reader.metadata.yllcorner,
-            reader.metadata.cellsize,
-            params['threshold'],
-            reader.metadata
-        )
-        
-        if not is_above:
-            print(f"error : not river for point {point.link_id}")
-            print(f"指定座標: ({point.lon}, {point.lat})")
-            print(f"最近傍の格子点: ({nearest_x:.4f}, {nearest_y:.4f})")
-            print(f"データ値: {value:.2f}")
-            print(f"閾値超過: {is_above}")
-            continue
-        
-        # 流域抽出
-        result = subprocess.run([
-            paths['extract_basin_exe'],
-            paths['dir_file'],
-            str(num_x),
-            str(num_y),
-            paths['dem_file'],
-            paths['landuse_file']
-        ], text=True)
-        
-        if result.returncode != 0:
-            print(f"Error in extract_basin.exe: {result.stderr}")
-            continue
-            
-        # 出力ファイルのリネーム
-        rename_output_files(base_paths, renamed_paths)
-        
-        # extract_basin.exeが生成するファイルの存在確認
-        extract_basin_outputs = ['distance', 'elevation', 'landuse', 'basin']
-        for file_type in extract_basin_outputs:
-            filepath = point.output_files[file_type]
-            check_output_file_exists(filepath, f"after extract_basin.exe for point {point.link_id}")
-        
-        # 洪水到達時間の計算
-        flood_calculator = FloodArrivalCalculator(reader)
-        flood_calculator.process_and_save(
-            point.output_files['distance'],
-            point.output_files['elevation'],
-            point.output_files['timedelay']
-        )
-        
-        # 合成合理式による流量計算
-        rational_calculator = RationalMethodCalculator(reader)
-        rational_calculator.load_data(
-            point.output_files['timedelay'],
-            point.output_files['landuse']
-        )
-        
-        # 雨量データの読み込みと流量計算
-        rainfall_data = read_rainfall_data(paths['rainfall_file'])
-        flow_results = rational_calculator.calculate_flow(
-            rainfall_data,
-            params['dtq']
-        )
-        
-        # 結果の出力
-        rational_calculator.export_results(
-            flow_results,
-            point.output_files['flow']
-        )
+            results = [
+                process_point(point, context, responses.pop(point.link_id, None))
+                for point in analysis_points
+            ]
     
-    # 全地点の結果をマージして出力
-    merge_flow_results(analysis_points, paths['flow_results_file'], params['dtq'])
+    # 全地点の結果をマージして出力（河川セルでない等で処理しなかった地点は除く）
+    point_flows = dict(zip(analysis_points.link_id, results))
+    point_flows.update(current_flows)
+    if context.rainfall_stream_file is not None:
+        for point in all_points.select(current):
+            point_flows[point.link_id] = point_output_files(point, context)['flow']
+    hydrographs = [
+        (link_id, point_flows.get(link_id))
+        for link_id in all_points.link_id
+        if point_flows.get(link_id) is not None
+    ]
+    with profiler.stage('merge_flow_results'):
+        if context.rainfall_stream_file is not None:
+            # 逐次出力の場合は地点ごとの流量ファイルから読み込む
+            merge_flow_files(hydrographs, paths['flow_results_file'], params['dtq'], output_format)
+        else:
+            merge_flow_results(hydrographs, paths['flow_results_file'], params['dtq'], output_format)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,3 +1,9 @@
 from .metadata import GISMetadata
+from .grid_geometry import GridGeometry
+from .basin_response import BasinResponse
+from .sparse_basin import SparseBasin
+from .snapped_points import SnappedPoints
+from .analysis_points import AnalysisPoint, AnalysisPointTable
 
-__all__ = ['GISMetadata']
\ No newline at end of file
+__all__ = ['GISMetadata', 'GridGeometry', 'BasinResponse', 'SparseBasin', 'SnappedPoints',
+           'AnalysisPoint', 'AnalysisPointTable']
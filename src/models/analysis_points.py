@@ -0,0 +1,61 @@
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+import numpy as np
+
+class AnalysisPoint:
+    """解析地点を表すクラス（AnalysisPointTableの1行分）"""
+    __slots__ = ('lon', 'lat', 'link_id', 'river_cell')
+
+    def __init__(self, lon, lat, link_id, river_cell: Optional[Tuple[int, int]] = None):
+        self.lon = lon
+        self.lat = lat
+        self.link_id = link_id
+        # 割り当てた河川セルのASCファイルでの (行番号, 列番号)（0始まり、未割り当ての場合はNone）
+        self.river_cell = river_cell
+
+@dataclass
+class AnalysisPointTable:
+    """
+    解析地点の表（地点ごとの配列）
+    地点ごとのオブジェクトは保持せず、1地点ずつ処理する場合のみAnalysisPointを作成する
+    """
+    lon: np.ndarray
+    lat: np.ndarray
+    link_id: np.ndarray
+    # 割り当てた河川セルのASCファイルでの行番号・列番号（0始まり、未割り当ての地点は-1）
+    river_row: Optional[np.ndarray] = None
+    river_col: Optional[np.ndarray] = None
+
+    def __post_init__(self):
+        if self.river_row is None:
+            self.river_row = np.full(len(self.lon), -1, dtype=np.int64)
+        if self.river_col is None:
+            self.river_col = np.full(len(self.lon), -1, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return int(len(self.lon))
+
+    def __getitem__(self, k: int) -> AnalysisPoint:
+        row = int(self.river_row[k])
+        river_cell = (row, int(self.river_col[k])) if row >= 0 else None
+        return AnalysisPoint(self.lon[k], self.lat[k], self.link_id[k], river_cell)
+
+    def __iter__(self) -> Iterator[AnalysisPoint]:
+        return (self[k] for k in range(len(self)))
+
+    def select(self, indices) -> "AnalysisPointTable":
+        """
+        一部の地点の表
+
+        Parameters:
+        -----------
+        indices : array_like
+            地点の番号、または地点ごとのbool配列
+        """
+        return AnalysisPointTable(
+            lon=self.lon[indices],
+            lat=self.lat[indices],
+            link_id=self.link_id[indices],
+            river_row=self.river_row[indices],
+            river_col=self.river_col[indices]
+        )
@@ -0,0 +1,37 @@
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+import numpy as np
+from .metadata import GISMetadata
+
+@dataclass
+class BasinResponse:
+    """
+    流域の応答（到達時間ヒストグラム）
+    降雨時刻 t = q*dtq + phase の雨量 r(mm/h) は、区間 q + m に
+    r * unit_hydrographs[phase][m] (m3/s) の流量として到達する
+    """
+    dtq: float
+    max_arrival_time: float
+    # 降雨時刻の出力区間内でのずれ(s) -> 到達時間ヒストグラム [m3/s per mm/h]
+    unit_hydrographs: Dict[float, np.ndarray] = field(default_factory=dict)
+    # 洪水到達時間の出力用（流域セルごとの到達時間、SparseBasin.indexと同じセルの位置、外接矩形のメタデータ）
+    arrival_time: Optional[np.ndarray] = None
+    cell_index: Optional[np.ndarray] = None
+    metadata: Optional[GISMetadata] = None
+
+    def has_phases(self, phases) -> bool:
+        """指定したずれ(s)のヒストグラムを全て持つか"""
+        return all(float(phase) in self.unit_hydrographs for phase in phases)
+
+    @property
+    def has_arrival_time(self) -> bool:
+        """洪水到達時間を出力できるか"""
+        return self.arrival_time is not None and self.cell_index is not None and self.metadata is not None
+
+    def arrival_time_grid(self) -> np.ndarray:
+        """洪水到達時間の外接矩形の[x, y]配列（流域外は metadata.nodata）"""
+        if not self.has_arrival_time:
+            raise ValueError("Basin response has no arrival time")
+        grid = np.full((self.metadata.nx, self.metadata.ny), self.metadata.nodata, dtype=float)
+        grid.reshape(-1)[self.cell_index] = self.arrival_time
+        return grid
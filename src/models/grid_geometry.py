@@ -0,0 +1,70 @@
+from dataclasses import dataclass
+from typing import Tuple
+import numpy as np
+from .metadata import GISMetadata
+
+@dataclass(frozen=True)
+class GridGeometry:
+    """
+    格子点の座標を必要に応じて計算するクラス
+    GISDataReader.read_gis_fileのデータ配列[x, y]に対応し、
+    x方向は西から東、y方向は南から北に並ぶ
+    """
+    nx: int
+    ny: int
+    xllcorner: float
+    yllcorner: float
+    cellsize: float
+
+    @classmethod
+    def from_metadata(cls, metadata: GISMetadata) -> "GridGeometry":
+        """GISMetadataから格子の形状を作成"""
+        return cls(
+            nx=metadata.nx,
+            ny=metadata.ny,
+            xllcorner=metadata.xllcorner,
+            yllcorner=metadata.yllcorner,
+            cellsize=metadata.cellsize
+        )
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """データ配列の形状 (nx, ny)"""
+        return self.nx, self.ny
+
+    @property
+    def x(self) -> np.ndarray:
+        """x座標の1次元配列（西から東へ）"""
+        return np.linspace(self.xllcorner, self.xllcorner + self.cellsize * (self.nx - 1), self.nx)
+
+    @property
+    def y(self) -> np.ndarray:
+        """y座標の1次元配列（南から北へ）"""
+        return np.linspace(self.yllcorner, self.yllcorner + self.cellsize * (self.ny - 1), self.ny)
+
+    @property
+    def x_coords(self) -> np.ndarray:
+        """データ配列とブロードキャスト可能なx座標 (nx, 1)"""
+        return self.x[:, np.newaxis]
+
+    @property
+    def y_coords(self) -> np.ndarray:
+        """データ配列とブロードキャスト可能なy座標 (1, ny)"""
+        return self.y[np.newaxis, :]
+
+    def coords(self, x_index, y_index) -> Tuple[float, float]:
+        """
+        指定したインデックスの格子点の座標を計算
+
+        Parameters:
+        -----------
+        x_index, y_index : int or np.ndarray
+            データ配列[x, y]のインデックス（0始まり）
+
+        Returns:
+        --------
+        Tuple[float, float]
+            (x座標, y座標)
+        """
+        return (self.xllcorner + self.cellsize * np.asarray(x_index),
+                self.yllcorner + self.cellsize * np.asarray(y_index))
@@ -0,0 +1,37 @@
+from dataclasses import dataclass
+from typing import Tuple
+import numpy as np
+
+@dataclass
+class SnappedPoints:
+    """
+    解析地点を河川セルに割り当てた結果（地点ごとの配列）
+    セルの番号はGISDataReader.read_gis_fileのデータ配列[x, y]のインデックス（0始まり）
+    """
+    # 割り当てた河川セル（found=Falseの地点は-1）
+    x_index: np.ndarray
+    y_index: np.ndarray
+    # 地点を含むセルの上流ピクセル数（格子の範囲外はnan）
+    value: np.ndarray
+    # 地点から割り当てたセルの中心までの距離(m)（地点を含むセルの場合は0、found=Falseの地点はinf）
+    distance: np.ndarray
+    # 河川セルに割り当てられたか
+    found: np.ndarray
+    # 地点を含むセル以外の河川セルに割り当てたか
+    snapped: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.found.size)
+
+    def raster_cells(self, ny: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        地点ごとのセルのASCファイルでの行番号・列番号（北から・西から、0始まり、found=Falseの地点は-1）
+        
+        Parameters:
+        -----------
+        ny : int
+            格子の行数
+        """
+        rows = np.where(self.found, ny - 1 - self.y_index, -1)
+        cols = np.where(self.found, self.x_index, -1)
+        return rows, cols
@@ -0,0 +1,55 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import numpy as np
+from .metadata import GISMetadata
+
+@dataclass
+class SparseBasin:
+    """
+    抽出した流域のデータ（流域セルのみを保持する形式）
+    各配列は流域セルごとの値で、セルの位置は外接矩形の[x, y]配列（GISDataReader.read_gis_fileと同じ向き、yは南から北）の
+    通し番号 index = x * ny + y（昇順）で表す。標高・土地利用が欠測のセルは metadata.nodata
+    """
+    metadata: GISMetadata
+    index: np.ndarray
+    distance: np.ndarray
+    elevation: np.ndarray
+    landuse: np.ndarray
+    # 元ラスタ上の範囲（行は北から、0始まり）(imin, imax, jmin, jmax)
+    bounds: Tuple[int, int, int, int]
+    # 流域セルごとの下流セルの位置（各配列の添字、流域末端は-1）
+    downstream: Optional[np.ndarray] = None
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """外接矩形の[x, y]配列の形状"""
+        return (self.metadata.nx, self.metadata.ny)
+
+    @property
+    def n_cells(self) -> int:
+        """流域セル数"""
+        return int(self.index.size)
+
+    def cell_indices(self) -> Tuple[np.ndarray, np.ndarray]:
+        """流域セルの外接矩形内での (x, y) 番号"""
+        return np.unravel_index(self.index, self.shape)
+
+    def to_grid(self, values: np.ndarray, fill: Optional[float] = None) -> np.ndarray:
+        """
+        流域セルごとの値を外接矩形の[x, y]配列に展開する
+
+        Parameters:
+        -----------
+        values : np.ndarray
+            流域セルごとの値
+        fill : float, optional
+            流域外のセルの値（省略時は metadata.nodata）
+
+        Returns:
+        --------
+        np.ndarray
+            外接矩形の[x, y]配列
+        """
+        grid = np.full(self.shape, self.metadata.nodata if fill is None else fill, dtype=float)
+        grid.reshape(-1)[self.index] = values
+        return grid
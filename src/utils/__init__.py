@@ -1,3 +1,4 @@
-from .geo_utils import find_nearest_point_data
+from .geo_utils import find_nearest_point_data, calc_planar_distance, grid_cell_indices
+from .profiling import StageProfiler
 
-__all__ = ['find_nearest_point_data']
\ No newline at end of file
+__all__ = ['find_nearest_point_data', 'calc_planar_distance', 'grid_cell_indices', 'StageProfiler']
@@ -6,46 +6,88 @@
 from typing import Tuple
 import math
 import numpy as np
-from ..models.metadata import GISMetadata
+from ..models.grid_geometry import GridGeometry
 
 def find_nearest_point_data(
-    x_coords: np.ndarray,
-    y_coords: np.ndarray,
+    grid: GridGeometry,
     data: np.ndarray,
     target_lon: float,
     target_lat: float,
-    xllcorner: float,
-    yllcorner: float,
-    cellsize: float,
-    threshold: float,
-    metadata: GISMetadata  # 追加
+    threshold: float
 ) -> Tuple[float, float, float, bool, int, int]:
     """
     指定された緯度・経度に最も近い格子点のデータを検索し、閾値判定を行う
     格子のインデックスを使用して検索を行う
     """
     # 目標地点と南西端との差分を計算
-    dx = target_lon - xllcorner
-    dy = target_lat - yllcorner
+    dx = target_lon - grid.xllcorner
+    dy = target_lat - grid.yllcorner
     
     # セルサイズで割って、インデックスを計算(1スタートpython用)
-    x_index1 = math.ceil(dx / cellsize)
-    y_index1 = math.ceil(dy / cellsize)
+    x_index1 = math.ceil(dx / grid.cellsize)
+    y_index1 = math.ceil(dy / grid.cellsize)
     
     # セルサイズで割って、インデックスを計算(0スタートpython用)
     x_index0 = x_index1 - 1
     y_index0 = y_index1 - 1
     
     # 該当するグリッドポイントの座標とデータを取得
-    nearest_x = x_coords[x_index0, y_index0]
-    nearest_y = y_coords[x_index0, y_index0]
+    nearest_x, nearest_y = grid.coords(x_index0, y_index0)
     value = data[x_index0, y_index0]
     
     # 閾値判定
     is_above_threshold = value > threshold
     
     # メッシュ番号変換
-    i0 = metadata.ny - y_index1 + 1  # readerの参照を削除
+    i0 = grid.ny - y_index1 + 1
     j0 = x_index1
     
-    return nearest_x, nearest_y, value, is_above_threshold, i0, j0
\ No newline at end of file
+    return nearest_x, nearest_y, value, is_above_threshold, i0, j0
+
+EARTH_RADIUS = 6371000.0  # 地球半径 (m)
+
+def calc_planar_distance(lat1, lon1, lat2, lon2):
+    """
+    2点間の距離をHaversine式で計算（配列入力にも対応）
+    extract_basin(Fortran)の calc_planar_distance と同一の式
+    
+    Parameters:
+    -----------
+    lat1, lon1 : float or np.ndarray
+        始点の緯度、経度（度）
+    lat2, lon2 : float or np.ndarray
+        終点の緯度、経度（度）
+        
+    Returns:
+    --------
+    float or np.ndarray
+        2点間の距離（メートル）
+    """
+    dlat = np.radians(lat2 - lat1)
+    dlon = np.radians(lon2 - lon1)
+    
+    a = np.sin(dlat / 2.0)**2 + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(dlon / 2.0)**2
+    c = 2.0 * np.arctan2(np.sqrt(a), np.sqrt(1.0 - a))
+    return EARTH_RADIUS * c
+
+def grid_cell_indices(grid: GridGeometry, lon, lat) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    座標を含むセルのインデックスを検索する（最近傍法による再サンプリング用）
+
+    Parameters:
+    -----------
+    grid : GridGeometry
+        検索する格子（セルは南西端の座標からcellsize四方の範囲）
+    lon, lat : np.ndarray
+        検索する座標（経度、緯度）
+
+    Returns:
+    --------
+    Tuple[np.ndarray, np.ndarray, np.ndarray]
+        (データ配列[x, y]のxインデックス, yインデックス, 格子の範囲内か)
+        範囲外の座標のインデックスは0
+    """
+    x_index = np.floor((np.asarray(lon) - grid.xllcorner) / grid.cellsize).astype(np.int64)
+    y_index = np.floor((np.asarray(lat) - grid.yllcorner) / grid.cellsize).astype(np.int64)
+    inside = (x_index >= 0) & (x_index < grid.nx) & (y_index >= 0) & (y_index < grid.ny)
+    return np.where(inside, x_index, 0), np.where(inside, y_index, 0), inside
@@ -0,0 +1,198 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+import json
+import time
+import cProfile
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, Optional
+
+class StageProfiler:
+    """
+    処理段階ごとの実行時間・呼び出し回数・ピークメモリと、処理量のカウンタを集計するクラス
+    解析地点の処理中（pointの範囲内）の計測は地点ごとに記録する。
+    無効（enabled=False）の場合は何も計測しない
+    """
+
+    def __init__(self, enabled: bool = False, cprofile: bool = False, memory: bool = False):
+        """
+        Parameters:
+        -----------
+        enabled : bool
+            計測するか
+        cprofile : bool
+            start〜stopの間をcProfileで計測するか
+        memory : bool
+            tracemallocで段階ごとのピークメモリを計測するか（計測中は処理がやや遅くなる）
+        """
+        self.enabled = enabled
+        self.cprofile = cprofile
+        self.memory = memory
+        self.stages: Dict[str, dict] = {}
+        self.counters: Dict[str, float] = {}
+        # 地点ID -> {'stages': ..., 'counters': ...}
+        self.points: Dict[str, dict] = {}
+        self._point: Optional[str] = None
+        # 計測中の段階ごとの [開始時のメモリ使用量, 内側の段階のピーク]
+        self._memory_stack = []
+        self._profile: Optional[cProfile.Profile] = None
+        self._started: Optional[float] = None
+        self._elapsed = 0.0
+        self._tracing = False
+
+    def worker_copy(self) -> "StageProfiler":
+        """子プロセス用の同じ設定の空の計測器（cProfileは親プロセスのみ）"""
+        return StageProfiler(self.enabled, cprofile=False, memory=self.memory)
+
+    def start(self):
+        """全体の計測を開始し、有効な場合はcProfile・tracemallocを開始する"""
+        if not self.enabled:
+            return
+        self._started = time.perf_counter()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        if self.cprofile:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop(self):
+        """全体の計測を終了する（startで開始したtracemallocも終了する）"""
+        if not self.enabled or self._started is None:
+            return
+        if self._profile is not None:
+            self._profile.disable()
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+        self._elapsed += time.perf_counter() - self._started
+        self._started = None
+
+    def stage(self, name: str):
+        """with文の範囲を段階nameとして計測する"""
+        if not self.enabled:
+            return nullcontext()
+        return self._measure(name)
+
+    def point(self, point_id):
+        """with文の範囲の計測を地点point_idの記録とし、全体を段階'total'として計測する"""
+        if not self.enabled:
+            return nullcontext()
+        return self._measure_point(str(point_id))
+
+    def count(self, name: str, value: float = 1):
+        """カウンタnameにvalueを加算する"""
+        if not self.enabled:
+            return
+        counters = self.points[self._point]['counters'] if self._point is not None else self.counters
+        counters[name] = counters.get(name, 0) + value
+
+    @contextmanager
+    def _measure_point(self, point_id: str):
+        self.points.setdefault(point_id, {'stages': {}, 'counters': {}})
+        previous, self._point = self._point, point_id
+        try:
+            with self._measure('total'):
+                yield
+        finally:
+            self._point = previous
+
+    @contextmanager
+    def _measure(self, name: str):
+        tracing = self.memory and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            # 外側の段階のピークを退避してから計測し直す
+            if self._memory_stack:
+                self._memory_stack[-1][1] = max(self._memory_stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            self._memory_stack.append([current, 0])
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stages = self.points[self._point]['stages'] if self._point is not None else self.stages
+            stage = stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            stage['seconds'] += elapsed
+            stage['calls'] += 1
+            if tracing:
+                start_memory, inner_peak = self._memory_stack.pop()
+                peak = max(tracemalloc.get_traced_memory()[1], inner_peak)
+                stage['peak_bytes'] = max(stage.get('peak_bytes', 0), peak - start_memory)
+                if self._memory_stack:
+                    self._memory_stack[-1][1] = max(self._memory_stack[-1][1], peak)
+
+    def take_points(self) -> Dict[str, dict]:
+        """地点ごとの記録を取り出して消去する（子プロセスから親プロセスへ渡す）"""
+        points, self.points = self.points, {}
+        return points
+
+    def merge_points(self, points: Dict[str, dict]):
+        """子プロセスで記録した地点ごとの記録を追加する"""
+        for point_id, record in points.items():
+            merged = self.points.setdefault(point_id, {'stages': {}, 'counters': {}})
+            _add_records(merged['stages'], merged['counters'], record)
+
+    def report(self) -> dict:
+        """
+        計測結果
+
+        Returns:
+        --------
+        dict
+            全体の実行時間、段階・カウンタ（地点の処理以外）、全地点の段階・カウンタの合計、地点ごとの記録
+        """
+        point_stages: Dict[str, dict] = {}
+        point_counters: Dict[str, float] = {}
+        for record in self.points.values():
+            _add_records(point_stages, point_counters, record)
+
+        return {
+            'total_seconds': self._elapsed,
+            'stages': self.stages,
+            'counters': self.counters,
+            'point_stages': point_stages,
+            'point_counters': point_counters,
+            'points': self.points,
+        }
+
+    def write_report(self, output_file: str) -> Optional[str]:
+        """
+        計測結果をJSONファイルに出力する（cProfileの結果は拡張子.profのファイルに出力）
+
+        Parameters:
+        -----------
+        output_file : str
+            出力ファイルパス
+
+        Returns:
+        --------
+        Optional[str]
+            出力したファイルパス（無効の場合はNone）
+        """
+        if not self.enabled:
+            return None
+        report = self.report()
+        if self._profile is not None:
+            profile_file = str(Path(output_file).with_suffix('.prof'))
+            self._profile.dump_stats(profile_file)
+            report['cprofile_file'] = profile_file
+        with open(output_file, 'w') as f:
+            json.dump(report, f, indent=2)
+        return output_file
+
+def _add_records(stages: Dict[str, dict], counters: Dict[str, float], record: dict):
+    """地点の記録の段階・カウンタを加算する（ピークメモリは最大値）"""
+    for name, stage in record['stages'].items():
+        target = stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+        target['seconds'] += stage['seconds']
+        target['calls'] += stage['calls']
+        if 'peak_bytes' in stage:
+            target['peak_bytes'] = max(target.get('peak_bytes', 0), stage['peak_bytes'])
+    for name, value in record['counters'].items():
+        counters[name] = counters.get(name, 0) + value
@@ -0,0 +1,78 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Tuple
+import numpy as np
+
+@dataclass(frozen=True)
+class SharedArraySpec:
+    """共有メモリ上の配列を子プロセスから参照するための情報"""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+class SharedArrayStore:
+    """
+    配列を共有メモリに配置し、使用後に解放するクラス
+    子プロセスへは配列本体ではなくSharedArraySpecのみを渡す
+    """
+
+    def __init__(self):
+        self._blocks: List[SharedMemory] = []
+
+    def share(self, array: np.ndarray) -> SharedArraySpec:
+        """
+        配列を共有メモリにコピーする
+
+        Parameters:
+        -----------
+        array : np.ndarray
+            共有する配列
+
+        Returns:
+        --------
+        SharedArraySpec
+            子プロセスでattach_shared_arrayに渡す情報
+        """
+        shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+        self._blocks.append(shm)
+        shared = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        shared[...] = array
+        return SharedArraySpec(shm.name, array.shape, array.dtype.str)
+
+    def close(self):
+        """共有メモリを解放する"""
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+
+    def __enter__(self) -> "SharedArrayStore":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def attach_shared_array(spec: SharedArraySpec) -> Tuple[np.ndarray, SharedMemory]:
+    """
+    共有メモリ上の配列を読み取り専用で参照する
+
+    Parameters:
+    -----------
+    spec : SharedArraySpec
+        SharedArrayStore.shareの戻り値
+
+    Returns:
+    --------
+    Tuple[np.ndarray, SharedMemory]
+        (配列, 共有メモリ) 配列を使用する間は共有メモリの参照を保持すること
+    """
+    # 子プロセスは親プロセスのresource_trackerを共有するため、解放は親プロセスのcloseで行われる
+    shm = SharedMemory(name=spec.name)
+    array = np.ndarray(spec.shape, dtype=np.dtype(spec.dtype), buffer=shm.buf)
+    array.flags.writeable = False
+    return array, shm
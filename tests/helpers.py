@@ -0,0 +1,112 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+"""テストで使用する合成データ一式・設定ファイルの作成と実行"""
+
+import yaml
+import numpy as np
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+from benchmarks.synthetic import make_metadata, make_synthetic_grids, write_synthetic_case
+from src.calculators.basin_extractor import BasinExtractor
+from src.calculators.flow_network import FlowNetworkIndex
+from src.main import parse_args, run_pipeline
+from src.file_io.config_manager import ConfigManager
+from src.utils.profiling import StageProfiler
+
+ROWS = 40
+COLS = 50
+THRESHOLD = 15
+DTQ = 600.0
+
+CONFIG_FILE = Path(__file__).parent.parent / 'config' / 'config.yml'
+
+@lru_cache(maxsize=None)
+def synthetic_basins(terrain: str) -> dict:
+    """
+    地形ごとの合成データと流域抽出クラス、流域の大きさが異なる5地点の流域末端
+    （作成した配列はテスト間で共有するため変更しないこと）
+    
+    Parameters:
+    -----------
+    terrain : str
+        地形の種類（benchmarks.synthetic.TERRAINS）
+    
+    Returns:
+    --------
+    dict
+        grids（ASCファイルの向きのラスタ）、metadata、direction（流向[x, y]）、network、
+        extractor（索引を使用）、search_extractor（地点ごとに探索）、outlets（行・列番号）
+    """
+    grids = make_synthetic_grids(ROWS, COLS, seed=0, terrain=terrain)
+    metadata = make_metadata(ROWS, COLS)
+    direction = BasinExtractor._to_grid(grids['dir'])
+    dem = BasinExtractor._to_grid(grids['dem'])
+    landuse = BasinExtractor._to_grid(grids['landuse'])
+    network = FlowNetworkIndex.build(direction, metadata)
+    rows, cols = np.nonzero(grids['acc'] > THRESHOLD)
+    # 上流ピクセル数の順位で等間隔に選ぶ
+    ranked = np.argsort(grids['acc'][rows, cols], kind='stable')
+    outlets = [(int(rows[k]), int(cols[k])) for k in ranked[np.linspace(0, ranked.size - 1, 5).astype(int)]]
+    return {
+        'terrain': terrain,
+        'grids': grids,
+        'metadata': metadata,
+        'direction': direction,
+        'network': network,
+        'extractor': BasinExtractor(direction, metadata, dem, landuse, network=network),
+        'search_extractor': BasinExtractor(direction, metadata, dem, landuse),
+        'outlets': outlets,
+    }
+
+def irregular_rainfall(n_steps: int = 30, seed: int = 1) -> Dict[float, float]:
+    """不規則な時刻（出力区間内でのずれが複数）の雨量 {時刻(s): 雨量(mm/h)}"""
+    rng = np.random.default_rng(seed)
+    times = np.cumsum(rng.choice([300.0, 600.0, 900.0], n_steps))
+    return {float(t): float(r) for t, r in zip(times, rng.gamma(0.8, 4.0, times.size))}
+
+def write_case(directory: Path, n_points: int = 3, hours: int = 6, terrain: str = 'terraced') -> Dict[str, str]:
+    """小さい合成データ一式（ラスタ・解析地点・雨量）を directory/data に出力"""
+    return write_synthetic_case(str(directory / 'data'), ROWS, COLS, n_points=n_points, hours=hours,
+                                threshold=THRESHOLD, dtq=DTQ, terrain=terrain)
+
+def write_config(directory: Path, paths: Dict[str, str], file_paths: Optional[dict] = None,
+                 parameters: Optional[dict] = None) -> str:
+    """
+    リポジトリのconfig.ymlを元に、合成データを入力とする設定ファイルを directory/config.yml に出力
+    出力先（log/、out/）は実行時のカレントディレクトリからの相対パス
+
+    Parameters:
+    -----------
+    directory : Path
+        出力先ディレクトリ
+    paths : Dict[str, str]
+        write_caseの戻り値
+    file_paths : dict, optional
+        file_pathsの変更（値がNoneの項目は削除）
+    parameters : dict, optional
+        parametersの変更
+    """
+    with open(CONFIG_FILE, encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    config['file_paths'].update({key: value for key, value in paths.items() if key != 'input_file'})
+    config['file_paths']['flow_results_file'] = 'out/flow_results.csv'
+    for key, value in (file_paths or {}).items():
+        if value is None:
+            config['file_paths'].pop(key, None)
+        else:
+            config['file_paths'][key] = value
+    config['analysis_points']['input_file'] = paths['input_file']
+    config['parameters']['threshold'] = THRESHOLD
+    config['parameters'].update(parameters or {})
+    config_path = directory / 'config.yml'
+    with open(config_path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f)
+    return str(config_path)
+
+def run(config_path: str, *argv: str, profiler: Optional[StageProfiler] = None):
+    """設定ファイルの条件で全地点を処理する（main.mainと同じ処理）"""
+    run_pipeline(parse_args(list(argv)), ConfigManager(config_path), profiler or StageProfiler())
@@ -0,0 +1,72 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+"""洪水到達時間（流速表・流下経路に沿った計算）を配列演算化以前の計算と比較"""
+
+import numpy as np
+import pytest
+from benchmarks.synthetic import TERRAINS
+from benchmarks.legacy import extract_dense, legacy_arrival_time, walk_path_arrival_time
+from src.file_io.gis_reader import GISDataReader
+from src.calculators.flood_arrival_calculator import FloodArrivalCalculator
+from src.calculators.rational_method_calculator import RationalMethodCalculator
+from .helpers import synthetic_basins
+
+@pytest.fixture(params=TERRAINS)
+def case(request):
+    return synthetic_basins(request.param)
+
+def test_arrival_time_matches_legacy(case):
+    for row, col in case['outlets']:
+        dense = extract_dense(case['extractor'], row, col)
+        calculator = FloodArrivalCalculator(GISDataReader(cache_max_bytes=0))
+        calculator.set_data(dense.distance, dense.elevation, dense.metadata)
+        arrival_time = calculator.calculate_arrival_time()
+        np.testing.assert_allclose(arrival_time, legacy_arrival_time(calculator), rtol=0, atol=1e-9)
+
+        basin = case['extractor'].extract_sparse(row, col)
+        sparse = calculator.calculate_sparse_arrival_time(basin)
+        np.testing.assert_array_equal(basin.to_grid(sparse), arrival_time)
+
+def test_terraced_terrain_uses_every_velocity_class(case):
+    row, col = max(case['outlets'], key=lambda cell: case['grids']['acc'][cell])
+    basin = case['extractor'].extract_sparse(row, col)
+    arrival_time = FloodArrivalCalculator(GISDataReader(cache_max_bytes=0)).calculate_sparse_arrival_time(basin)
+    moving = basin.distance > 0
+    used = set(np.round(basin.distance[moving] / arrival_time[moving], 6))
+    velocities = {velocity for _, velocity in FloodArrivalCalculator.VELOCITY_TABLE}
+    if case['terrain'] == 'terraced':
+        assert used == velocities
+    else:
+        assert used == {max(velocities)}
+
+def test_velocity_table_from_config():
+    calculator = FloodArrivalCalculator(
+        GISDataReader(cache_max_bytes=0), velocity_table=[[0.02, 5.0], [0.001, 2.0], [-np.inf, 1.0]]
+    )
+    np.testing.assert_array_equal(
+        calculator.calculate_velocity(np.array([0.5, 0.02, 0.019, 0.001, 0.0])),
+        [5.0, 5.0, 2.0, 2.0, 1.0]
+    )
+    with pytest.raises(ValueError):
+        FloodArrivalCalculator.normalize_velocity_table([[0.001, 2.0], [0.02, 5.0]])
+    with pytest.raises(ValueError):
+        FloodArrivalCalculator.normalize_velocity_table([[0.01, 0.0]])
+
+    calculator = RationalMethodCalculator(
+        GISDataReader(cache_max_bytes=0), runoff_coefficients={1: 0.3}, default_runoff_coefficient=0.9
+    )
+    assert calculator.get_runoff_coefficient(1) == 0.3
+    assert calculator.get_runoff_coefficient(4) == 0.9
+
+def test_path_travel_time_matches_walk(case):
+    calculator = FloodArrivalCalculator(GISDataReader(cache_max_bytes=0), travel_time_method='path')
+    for row, col in case['outlets']:
+        basin = case['extractor'].extract_sparse(row, col)
+        np.testing.assert_allclose(
+            calculator.calculate_sparse_arrival_time(basin),
+            walk_path_arrival_time(calculator, basin),
+            rtol=1e-12, atol=1e-6
+        )
@@ -0,0 +1,51 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+"""流域抽出（流下ネットワークの索引・流域の範囲のみの読み込み）を地点ごとの探索・外接矩形の配列と比較"""
+
+import numpy as np
+import pytest
+from benchmarks.synthetic import TERRAINS, write_asc
+from benchmarks.legacy import extract_dense
+from src.file_io.gis_reader import GISDataReader
+from src.calculators.basin_extractor import BasinExtractor
+from .helpers import synthetic_basins
+
+@pytest.fixture(params=TERRAINS)
+def case(request):
+    return synthetic_basins(request.param)
+
+def test_extract_sparse_matches_search_and_dense(case):
+    for row, col in case['outlets']:
+        basin = case['extractor'].extract_sparse(row, col)
+        searched = case['search_extractor'].extract_sparse(row, col)
+        dense = extract_dense(case['extractor'], row, col)
+
+        np.testing.assert_array_equal(basin.index, searched.index)
+        np.testing.assert_allclose(basin.distance, searched.distance, atol=1e-6)
+        np.testing.assert_array_equal(basin.downstream, searched.downstream)
+        assert basin.bounds == dense.bounds
+        np.testing.assert_array_equal(basin.to_grid(1.0), dense.basin)
+        np.testing.assert_array_equal(basin.to_grid(basin.distance), dense.distance)
+        np.testing.assert_array_equal(basin.to_grid(basin.elevation), dense.elevation)
+        np.testing.assert_array_equal(basin.to_grid(basin.landuse), dense.landuse)
+        # 流域末端は1セルのみで、全てのセルの下流セルをたどると流域末端に着く
+        assert np.sum(basin.downstream < 0) == 1
+        assert int(basin.downstream.max()) < basin.n_cells
+
+def test_windowed_extraction_reads_same_values(case, tmp_path):
+    paths = {}
+    for key, fmt in (('dem', '%.2f'), ('landuse', '%d')):
+        paths[key] = str(tmp_path / f'{key}.txt')
+        write_asc(paths[key], case['grids'][key], fmt)
+    windowed = BasinExtractor(
+        case['direction'], case['metadata'], network=case['network'],
+        dem_file=paths['dem'], landuse_file=paths['landuse'], reader=GISDataReader()
+    )
+    for row, col in case['outlets']:
+        basin = case['extractor'].extract_sparse(row, col)
+        window = windowed.extract_sparse(row, col)
+        np.testing.assert_array_equal(basin.elevation, window.elevation)
+        np.testing.assert_array_equal(basin.landuse, window.landuse)
@@ -0,0 +1,62 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+"""NumPy形式(.npz)・Parquet形式の出力と、CSV/ASC形式への変換（--convert）"""
+
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import make_metadata
+from src.file_io.binary_output import read_raster_npz, write_raster_npz
+from src.main import main
+from .helpers import run, write_case, write_config
+
+def _outputs(directory):
+    """地点ごとの流量・到達時間とマージ結果のファイル名と内容"""
+    files = list(directory.glob('out/*')) + list(directory.glob('log/flood_arrival_time_*'))
+    return {path.name: path.read_bytes() for path in files}
+
+def test_npz_outputs_convert_to_text_outputs(tmp_path, monkeypatch):
+    paths = write_case(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    run(write_config(tmp_path, paths))
+    text_outputs = _outputs(tmp_path)
+    shutil.rmtree(tmp_path / 'out')
+    shutil.rmtree(tmp_path / 'log')
+
+    run(write_config(tmp_path, paths, parameters={'output_format': 'npz'}))
+    npz_outputs = _outputs(tmp_path)
+    assert sorted(npz_outputs) == sorted(name.rsplit('.', 1)[0] + '.npz' for name in text_outputs)
+
+    # 変換するとCSV/ASC形式で出力した場合と同じ内容になる
+    main(['--convert'] + [str(path) for path in sorted(tmp_path.glob('*/*.npz'))])
+    converted = {name: content for name, content in _outputs(tmp_path).items() if not name.endswith('.npz')}
+    assert converted == text_outputs
+
+def test_raster_npz_round_trip(tmp_path):
+    metadata = make_metadata(5, 4)
+    data = np.arange(20, dtype=float).reshape(4, 5)
+    data[1, 2] = metadata.nodata
+    output_file = str(tmp_path / 'raster.npz')
+    write_raster_npz(data, metadata, output_file)
+    restored, restored_metadata = read_raster_npz(output_file)
+    np.testing.assert_array_equal(restored, data)
+    assert restored_metadata == metadata
+
+def test_convert_rejects_unknown_files(tmp_path):
+    np.savez(tmp_path / 'other.npz', values=np.zeros(3))
+    with pytest.raises(ValueError):
+        main(['--convert', str(tmp_path / 'other.npz')])
+
+def test_parquet_merged_output(tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    paths = write_case(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    run(write_config(tmp_path, paths))
+    merged = pd.read_csv(tmp_path / 'out' / 'flow_results.csv')
+    run(write_config(tmp_path, paths, parameters={'output_format': 'parquet'}))
+    table = pd.read_parquet(tmp_path / 'out' / 'flow_results.parquet')
+    np.testing.assert_allclose(table.to_numpy(), merged.to_numpy(), atol=5e-7)
@@ -0,0 +1,59 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+"""緯度ごとのセルサイズ（cell_area_method: row）"""
+
+import dataclasses
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import make_metadata
+from src.calculators import cell_size_calculator
+from src.calculators.cell_size_calculator import CellSizeCalculator
+from .helpers import run, write_case, write_config
+
+def _window(metadata, row_offset, ny):
+    """南からrow_offset行目からny行分の格子のメタデータ"""
+    return dataclasses.replace(
+        metadata, ny=ny, nx=7, yllcorner=metadata.yllcorner + metadata.cellsize * row_offset
+    )
+
+def test_window_rows_match_direct_calculation():
+    raster = make_metadata(400, 300)
+    calculator = CellSizeCalculator()
+    cell_size_calculator._row_cell_sizes.cache_clear()
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        ny = int(rng.integers(1, 60))
+        window = _window(raster, int(rng.integers(0, raster.ny - ny + 1)), ny)
+        sliced = calculator.calculate_row_cell_sizes(window, raster)
+        direct = calculator.calculate_row_cell_sizes(window)
+        for expected, actual in zip(direct, sliced):
+            assert actual.shape == (ny,)
+            # 緯度の丸め誤差の範囲で一致する
+            np.testing.assert_allclose(actual, expected, rtol=1e-9)
+    # ラスタ全体の値は最初の1回のみ計算し、以降は保持した値から取り出す
+    assert cell_size_calculator._row_cell_sizes.cache_info().hits >= 19
+
+def test_window_outside_raster_is_rejected():
+    raster = make_metadata(40, 30)
+    calculator = CellSizeCalculator()
+    with pytest.raises(ValueError):
+        calculator.calculate_row_cell_sizes(_window(raster, 35, 10), raster)
+    with pytest.raises(ValueError):
+        calculator.calculate_row_cell_sizes(dataclasses.replace(raster, cellsize=raster.cellsize / 2), raster)
+
+def test_row_areas_are_computed_once_per_raster(tmp_path, monkeypatch):
+    paths = write_case(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    cell_size_calculator._row_cell_sizes.cache_clear()
+    run(write_config(tmp_path, paths, parameters={'cell_area_method': 'row'}))
+    assert cell_size_calculator._row_cell_sizes.cache_info().misses == 1
+    merged = pd.read_csv(tmp_path / 'out' / 'flow_results.csv')
+
+    run(write_config(tmp_path, paths))
+    mean = pd.read_csv(tmp_path / 'out' / 'flow_results.csv')
+    # 緯度ごとの面積と平均面積の差は小さい
+    np.testing.assert_allclose(merged.to_numpy(), mean.to_numpy(), rtol=1e-3, atol=1e-6)
@@ -0,0 +1,73 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+"""アンサンブル降雨（rainfall_ensemble_file）の全メンバーの一括計算"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import make_metadata
+from src.calculators.rational_method_calculator import RationalMethodCalculator
+from src.file_io.binary_output import convert_to_text
+from src.file_io.gis_reader import GISDataReader
+from .helpers import DTQ, run, write_case, write_config
+
+def _calculator(rows=12, cols=9, seed=0):
+    """到達時間・土地利用を乱数で設定した計算クラス"""
+    rng = np.random.default_rng(seed)
+    metadata = make_metadata(rows, cols)
+    arrival_time = rng.uniform(0.0, 5000.0, (cols, rows))
+    landuse = rng.integers(1, 8, (cols, rows)).astype(float)
+    arrival_time[0, :3] = metadata.nodata
+    calculator = RationalMethodCalculator(GISDataReader(cache_max_bytes=0))
+    calculator.set_data(arrival_time, landuse, metadata)
+    return calculator
+
+def test_ensemble_matches_each_member():
+    calculator = _calculator()
+    rng = np.random.default_rng(1)
+    times = rng.permutation(np.arange(1, 25) * DTQ + 150.0)
+    rainfall = rng.gamma(0.8, 4.0, (5, times.size))
+
+    output_times, flows = calculator.calculate_ensemble_flow(times, rainfall, DTQ)
+    assert flows.shape == (5, output_times.size)
+    for member in range(rainfall.shape[0]):
+        member_times, member_flows = calculator.calculate_flow_array(dict(zip(times, rainfall[member])), DTQ)
+        np.testing.assert_array_equal(member_times, output_times)
+        np.testing.assert_allclose(flows[member], member_flows, rtol=1e-12, atol=1e-12)
+
+def test_ensemble_rejects_mismatched_rainfall():
+    with pytest.raises(ValueError):
+        _calculator().calculate_ensemble_flow(np.arange(3) * DTQ, np.zeros((2, 4)), DTQ)
+
+def test_pipeline_writes_ensemble_per_point(tmp_path, monkeypatch):
+    paths = write_case(tmp_path)
+    rainfall = pd.read_csv(paths['rainfall_file'])
+    ensemble_file = tmp_path / 'data' / 'ensemble.csv'
+    members = pd.DataFrame({
+        'time': rainfall['time'],
+        'base': rainfall['Rainfall'],
+        'double': rainfall['Rainfall'] * 2.0,
+        'dry': 0.0,
+    })
+    members.to_csv(ensemble_file, index=False)
+    monkeypatch.chdir(tmp_path)
+    run(write_config(tmp_path, paths, file_paths={'rainfall_ensemble_file': str(ensemble_file)}))
+
+    ensemble_files = sorted(tmp_path.glob('out/ensemble_flow_*.npz'))
+    assert len(ensemble_files) == 3
+    for ensemble_file in ensemble_files:
+        point_id = ensemble_file.stem.rsplit('_', 1)[1]
+        flows = pd.read_csv(tmp_path / 'out' / f'asuwatyuryu_flow2_{point_id}.csv')
+        with np.load(ensemble_file) as data:
+            assert list(data['members']) == ['base', 'double', 'dry']
+            np.testing.assert_array_equal(data['time'], flows['Time(s)'])
+            np.testing.assert_allclose(data['flow'][0], flows['Flow(m3/s)'], atol=5e-7)
+            np.testing.assert_allclose(data['flow'][1], 2.0 * data['flow'][0], rtol=1e-12)
+            assert not data['flow'][2].any()
+
+        # メンバーごとの列のCSV形式に変換できる
+        table = pd.read_csv(convert_to_text(str(ensemble_file)))
+        assert list(table.columns) == ['Time(s)', 'base', 'double', 'dry']
@@ -0,0 +1,74 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+"""到達時間ヒストグラムと雨量の畳み込み（配列・流域セルのみの形式・逐次計算・nowcastの分割計算）"""
+
+import numpy as np
+import pytest
+from benchmarks.synthetic import TERRAINS
+from benchmarks.legacy import extract_dense, legacy_calculate_flow
+from src.file_io.gis_reader import GISDataReader
+from src.calculators.flood_arrival_calculator import FloodArrivalCalculator
+from src.calculators.rational_method_calculator import RationalMethodCalculator
+from src.calculators.streaming_flow_accumulator import StreamingFlowAccumulator
+from .helpers import DTQ, irregular_rainfall, synthetic_basins
+
+@pytest.fixture(params=TERRAINS)
+def case(request):
+    return synthetic_basins(request.param)
+
+@pytest.fixture
+def rainfall():
+    return irregular_rainfall()
+
+def test_convolution_matches_legacy_loop(case, rainfall):
+    for row, col in case['outlets']:
+        dense = extract_dense(case['extractor'], row, col)
+        flood_calculator = FloodArrivalCalculator(GISDataReader(cache_max_bytes=0))
+        flood_calculator.set_data(dense.distance, dense.elevation, dense.metadata)
+        arrival_time = flood_calculator.calculate_arrival_time()
+
+        calculator = RationalMethodCalculator(GISDataReader(cache_max_bytes=0))
+        calculator.set_data(arrival_time, dense.landuse, dense.metadata)
+        output_times, flows = calculator.calculate_flow_array(rainfall, DTQ)
+        legacy = legacy_calculate_flow(calculator, rainfall, DTQ)
+        np.testing.assert_array_equal(output_times, sorted(legacy))
+        np.testing.assert_allclose(flows, [legacy[t] for t in sorted(legacy)], rtol=1e-9, atol=1e-12)
+
+        # 流域セルのみの形式・逐次計算でも同じ流量
+        basin = case['extractor'].extract_sparse(row, col)
+        sparse_calculator = RationalMethodCalculator(GISDataReader(cache_max_bytes=0))
+        sparse_calculator.set_sparse_data(flood_calculator.calculate_sparse_arrival_time(basin), basin)
+        np.testing.assert_array_equal(sparse_calculator.calculate_flow_array(rainfall, DTQ)[1], flows)
+        streamed = np.array(list(sparse_calculator.stream_flow(sorted(rainfall.items()), DTQ)))
+        np.testing.assert_array_equal(streamed[:, 0], output_times)
+        np.testing.assert_allclose(streamed[:, 1], flows, rtol=1e-12, atol=1e-12)
+
+def test_nowcast_split_matches_single_pass(case, rainfall):
+    row, col = case['outlets'][-1]
+    basin = case['extractor'].extract_sparse(row, col)
+    calculator = RationalMethodCalculator(GISDataReader(cache_max_bytes=0))
+    calculator.set_sparse_data(FloodArrivalCalculator(GISDataReader(cache_max_bytes=0))
+                               .calculate_sparse_arrival_time(basin), basin)
+    times = np.array(sorted(rainfall))
+    response = calculator.build_response(DTQ, RationalMethodCalculator.rainfall_phases(times, DTQ))
+    _, flows = calculator.calculate_flow_array(rainfall, DTQ)
+
+    # 1回で全ての降雨を加算
+    single = StreamingFlowAccumulator(response)
+    single_final = [single.push(t, rainfall[t])[1] for t in times]
+
+    # 途中状態を保存して2回に分けて加算
+    first = StreamingFlowAccumulator(response)
+    split_final = [first.push(t, rainfall[t])[1] for t in times[:len(times) // 2]]
+    second = StreamingFlowAccumulator(response)
+    second.restore(first.get_state())
+    split_final += [second.push(t, rainfall[t])[1] for t in times[len(times) // 2:]]
+
+    np.testing.assert_array_equal(np.concatenate(split_final), np.concatenate(single_final))
+    np.testing.assert_array_equal(second.pending()[1], single.pending()[1])
+    np.testing.assert_allclose(
+        np.concatenate(single_final + [single.finish()[1]]), flows, rtol=1e-12, atol=1e-12
+    )
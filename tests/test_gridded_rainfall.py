@@ -0,0 +1,72 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+"""格子雨量（rainfall_grid_file）による流量の計算"""
+
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import write_asc
+from src.file_io.gis_reader import GISDataReader
+from .helpers import COLS, ROWS, run, write_case, write_config
+
+def _write_grids(directory, rainfall_file):
+    """雨量ファイルの各時刻の雨量を全セルで一様な格子雨量として出力"""
+    os.makedirs(directory)
+    rainfall = pd.read_csv(rainfall_file)
+    index_file = os.path.join(directory, 'grids.csv')
+    with open(index_file, 'w') as f:
+        f.write("time,file\n")
+        for step, (time, value) in enumerate(zip(rainfall['time'], rainfall['Rainfall'])):
+            write_asc(os.path.join(directory, f'grid_{step:03d}.asc'), np.full((ROWS, COLS), value), '%.6f')
+            f.write(f"{time:g},grid_{step:03d}.asc\n")
+    return index_file, len(rainfall)
+
+@pytest.fixture
+def gridded_case(tmp_path, monkeypatch):
+    paths = write_case(tmp_path)
+    index_file, n_frames = _write_grids(str(tmp_path / 'radar'), paths['rainfall_file'])
+    monkeypatch.chdir(tmp_path)
+    # 小さいファイルでもバイナリキャッシュを作成する設定にする
+    monkeypatch.setattr(GISDataReader, 'SIDECAR_MIN_BYTES', 0)
+    return tmp_path, paths, index_file, n_frames
+
+def test_uniform_grids_match_rainfall_series(gridded_case):
+    tmp_path, paths, index_file, _ = gridded_case
+    run(write_config(tmp_path, paths))
+    series = pd.read_csv(tmp_path / 'out' / 'flow_results.csv')
+    run(write_config(tmp_path, paths, file_paths={'rainfall_file': None, 'rainfall_grid_file': index_file}))
+    gridded = pd.read_csv(tmp_path / 'out' / 'flow_results.csv')
+    assert list(gridded.columns) == list(series.columns)
+    np.testing.assert_allclose(gridded.to_numpy(), series.to_numpy(), atol=2e-6)
+
+def test_grids_are_read_once_without_sidecars(gridded_case, monkeypatch):
+    tmp_path, paths, index_file, n_frames = gridded_case
+    radar_dir = os.path.dirname(index_file)
+    grid_reads = []
+    read_gis_file = GISDataReader.read_gis_file
+
+    def counting_read(self, filepath, *args, **kwargs):
+        if os.path.dirname(os.path.abspath(filepath)) == radar_dir:
+            grid_reads.append(filepath)
+        return read_gis_file(self, filepath, *args, **kwargs)
+
+    monkeypatch.setattr(GISDataReader, 'read_gis_file', counting_read)
+    run(write_config(tmp_path, paths, file_paths={'rainfall_file': None, 'rainfall_grid_file': index_file}))
+    # 3地点とも同じ格子を使い、各時刻の格子は1回のみ読み込む
+    assert len(grid_reads) == n_frames == len(set(grid_reads))
+    assert not [name for name in os.listdir(radar_dir) if '.npy' in name]
+    # 流域のラスタはバイナリキャッシュを作成する
+    assert os.path.exists(paths['dir_file'] + '.npy')
+
+def test_parallel_workers_share_grids(gridded_case):
+    tmp_path, paths, index_file, _ = gridded_case
+    config_path = write_config(tmp_path, paths, file_paths={'rainfall_file': None, 'rainfall_grid_file': index_file})
+    outputs = []
+    for argv in ((), ('--workers', '2')):
+        run(config_path, *argv)
+        outputs.append((tmp_path / 'out' / 'flow_results.csv').read_bytes())
+    assert outputs[0] == outputs[1]
@@ -0,0 +1,61 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+"""解析地点の並列処理（--workers）と共有メモリ上の配列"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+import pytest
+from src.utils.profiling import StageProfiler
+from src.utils.shared_arrays import SharedArrayStore, attach_shared_array
+from .helpers import run, write_case, write_config
+
+def _sum_shared(spec):
+    """子プロセスで共有メモリ上の配列を参照する"""
+    array, shm = attach_shared_array(spec)
+    try:
+        return float(array.sum()), array.flags.writeable
+    finally:
+        del array
+        shm.close()
+
+def test_shared_array_round_trip():
+    arrays = [np.arange(12.0).reshape(3, 4), np.array([[1, -2], [3, 4]], dtype=np.int16), np.zeros(0)]
+    with SharedArrayStore() as store:
+        specs = [store.share(array) for array in arrays]
+        for array, spec in zip(arrays, specs):
+            attached, shm = attach_shared_array(spec)
+            np.testing.assert_array_equal(attached, array)
+            assert attached.dtype == array.dtype
+            assert not attached.flags.writeable
+            del attached
+            shm.close()
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(_sum_shared, specs))
+        assert results == [(float(array.sum()), False) for array in arrays]
+    # 終了時に共有メモリを解放する
+    for spec in specs:
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=spec.name)
+
+@pytest.mark.parametrize('parameters', [
+    {},
+    {'windowed_raster_read': False, 'flow_network_index': False},
+])
+def test_workers_match_sequential(tmp_path, monkeypatch, parameters):
+    paths = write_case(tmp_path, n_points=4)
+    monkeypatch.chdir(tmp_path)
+    config_path = write_config(tmp_path, paths, parameters=parameters)
+    outputs = []
+    for argv in ((), ('--workers', '2')):
+        profiler = StageProfiler(enabled=True)
+        run(config_path, *argv, profiler=profiler)
+        files = sorted(tmp_path.glob('out/*')) + sorted(tmp_path.glob('log/flood_arrival_time_*'))
+        outputs.append({path.name: path.read_bytes() for path in files})
+        # 子プロセスでの地点ごとの計測も集計する
+        assert len(profiler.report()['points']) == 4
+    assert len(outputs[0]) == 9
+    assert outputs[1] == outputs[0]
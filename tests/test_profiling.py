@@ -0,0 +1,82 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+"""処理段階ごとの計測（StageProfiler、--profile）"""
+
+import json
+import numpy as np
+from src.main import create_profile_path
+from src.utils.profiling import StageProfiler
+from .helpers import run, write_case, write_config
+
+def test_disabled_profiler_records_nothing(tmp_path):
+    profiler = StageProfiler()
+    profiler.start()
+    with profiler.stage('read'), profiler.point(1):
+        profiler.count('cells', 10)
+    profiler.stop()
+    assert profiler.report()['stages'] == {} and profiler.report()['points'] == {}
+    assert profiler.write_report(str(tmp_path / 'profile.json')) is None
+    assert not (tmp_path / 'profile.json').exists()
+
+def test_stages_counters_and_points(tmp_path):
+    profiler = StageProfiler(enabled=True, memory=True, cprofile=True)
+    profiler.start()
+    with profiler.stage('read'):
+        profiler.count('bytes_read', 100)
+    for point_id in (1, 2.0):
+        with profiler.point(point_id):
+            with profiler.stage('extraction'):
+                profiler.count('basin_cells', 5)
+                with profiler.stage('allocate'):
+                    np.ones(1 << 20).sum()
+    # 子プロセスの地点ごとの記録を集計する
+    worker = profiler.worker_copy()
+    with worker.point(3):
+        with worker.stage('extraction'):
+            worker.count('basin_cells', 7)
+    profiler.merge_points(worker.take_points())
+    assert worker.points == {}
+    profiler.stop()
+
+    report = profiler.report()
+    assert report['total_seconds'] > 0
+    assert report['stages']['read']['calls'] == 1
+    assert report['counters'] == {'bytes_read': 100}
+    assert sorted(report['points']) == ['1', '2.0', '3']
+    assert report['point_stages']['extraction']['calls'] == 3
+    assert report['point_stages']['total']['calls'] == 3
+    assert report['point_counters'] == {'basin_cells': 17}
+    # 内側の段階のピークメモリは外側の段階にも含める
+    allocate_peak = report['points']['1']['stages']['allocate']['peak_bytes']
+    assert allocate_peak >= 8 << 20
+    assert report['points']['1']['stages']['extraction']['peak_bytes'] >= allocate_peak
+
+    output_file = profiler.write_report(str(tmp_path / 'profile.json'))
+    with open(output_file) as f:
+        written = json.load(f)
+    assert written['point_counters'] == {'basin_cells': 17}
+    assert (tmp_path / 'profile.prof').exists()
+    assert written['cprofile_file'] == str(tmp_path / 'profile.prof')
+
+def test_pipeline_profile_report(tmp_path, monkeypatch):
+    paths = write_case(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    profiler = StageProfiler(enabled=True)
+    profiler.start()
+    run(write_config(tmp_path, paths), '--profile', profiler=profiler)
+    profiler.stop()
+    output_file = profiler.write_report(create_profile_path('out/flow_results.csv'))
+    assert output_file.endswith('flow_results_profile.json')
+
+    with open(output_file) as f:
+        report = json.load(f)
+    for name in ('read_rainfall', 'read_rasters', 'snap_points', 'points', 'merge_flow_results'):
+        assert report['stages'][name]['calls'] == 1
+    assert len(report['points']) == 3
+    for name in ('total', 'extraction', 'calculate_arrival_time', 'calculate_flow', 'publish'):
+        assert report['point_stages'][name]['calls'] == 3
+    assert report['counters']['bytes_read'] > 0
+    assert report['point_counters']['basin_cells'] > 0
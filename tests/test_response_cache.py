@@ -0,0 +1,42 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+"""保存済みの流域応答（response_cache_dir）の再利用"""
+
+import pytest
+from src.file_io.response_store import BasinResponseStore
+from src.utils.profiling import StageProfiler
+from .helpers import run, write_case, write_config
+
+@pytest.fixture
+def config_path(tmp_path, monkeypatch):
+    paths = write_case(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    return write_config(tmp_path, paths, file_paths={'response_cache_dir': 'log/response'})
+
+@pytest.mark.parametrize('argv', [(), ('--workers', '2')])
+def test_stored_responses_are_loaded_once(config_path, tmp_path, monkeypatch, capfd, argv):
+    run(config_path)
+    merged = (tmp_path / 'out' / 'flow_results.csv').read_bytes()
+    capfd.readouterr()
+
+    loads = []
+    load = BasinResponseStore.load
+
+    def counting_load(self, key):
+        loads.append(key)
+        return load(self, key)
+
+    monkeypatch.setattr(BasinResponseStore, 'load', counting_load)
+    profiler = StageProfiler(enabled=True)
+    run(config_path, *argv, profiler=profiler)
+    # 全地点で流域応答を使用し、ラスタの読み込み・流域抽出は行わない
+    assert capfd.readouterr().out.count("Using stored basin response") == 3
+    report = profiler.report()
+    assert 'read_rasters' not in report['stages']
+    assert 'extraction' not in report['point_stages']
+    # 流域応答は地点ごとに1回のみ読み込む（子プロセスでは読み込まない）
+    assert len(loads) == len(set(loads)) == 3
+    assert (tmp_path / 'out' / 'flow_results.csv').read_bytes() == merged
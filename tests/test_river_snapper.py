@@ -0,0 +1,66 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+"""解析地点の河川セルへの一括割り当て（RiverCellIndex）を総当たりの探索と比較"""
+
+import numpy as np
+import pytest
+from benchmarks.synthetic import TERRAINS, make_metadata, make_synthetic_grids
+from src.calculators.basin_extractor import BasinExtractor
+from src.calculators.river_snapper import RiverCellIndex
+from src.models.grid_geometry import GridGeometry
+from src.utils.geo_utils import calc_planar_distance, find_nearest_point_data
+from .helpers import COLS, ROWS, THRESHOLD
+
+@pytest.fixture(params=TERRAINS)
+def case(request):
+    """上流ピクセル数[x, y]とメタデータ"""
+    grids = make_synthetic_grids(ROWS, COLS, seed=0, terrain=request.param)
+    return {'upg': BasinExtractor._to_grid(grids['acc']), 'metadata': make_metadata(ROWS, COLS)}
+
+def _brute_force_snap(upg, metadata, lon, lat, radius):
+    """全ての河川セルとの距離から最も近いセルを求める（距離が等しい場合は通し番号の小さいセル）"""
+    grid = GridGeometry.from_metadata(metadata)
+    cx, cy = np.nonzero(upg > THRESHOLD)
+    center_lon, center_lat = grid.coords(cx + 0.5, cy + 0.5)
+    result = []
+    for x, y in zip(lon, lat):
+        distance = calc_planar_distance(y, x, center_lat, center_lon)
+        nearest = int(np.argmin(distance))
+        result.append((cx[nearest], cy[nearest]) if distance[nearest] <= radius else (-1, -1))
+    return np.array(result)
+
+def test_snap_matches_brute_force(case):
+    metadata, upg = case['metadata'], case['upg']
+    index = RiverCellIndex(upg, metadata, THRESHOLD)
+    rng = np.random.default_rng(2)
+    lon = metadata.xllcorner + rng.uniform(-0.005, metadata.nx * metadata.cellsize + 0.005, 300)
+    lat = metadata.yllcorner + rng.uniform(-0.005, metadata.ny * metadata.cellsize + 0.005, 300)
+
+    # 探索しない場合は地点を含むセルのみ（find_nearest_point_dataと同じ判定）
+    contained = index.snap(lon, lat, 0.0)
+    assert not contained.snapped.any()
+    rows, cols = contained.raster_cells(metadata.ny)
+    grid = GridGeometry.from_metadata(metadata)
+    for k in np.flatnonzero((lon > metadata.xllcorner) & (lat > metadata.yllcorner)
+                            & (lon < metadata.xllcorner + metadata.nx * metadata.cellsize)
+                            & (lat < metadata.yllcorner + metadata.ny * metadata.cellsize)):
+        _, _, _, is_above, num_x, num_y = find_nearest_point_data(grid, upg, lon[k], lat[k], THRESHOLD)
+        assert contained.found[k] == is_above
+        # num_x, num_yは1始まりの行・列番号
+        if is_above:
+            assert (rows[k], cols[k]) == (num_x - 1, num_y - 1)
+
+    for radius in (60.0, 250.0, 1000.0):
+        snapped = index.snap(lon, lat, radius)
+        expected = _brute_force_snap(upg, metadata, lon, lat, radius)
+        # 地点を含むセルが河川セルの場合はそのセル
+        expected[contained.found] = np.column_stack([contained.x_index, contained.y_index])[contained.found]
+        assert snapped.snapped.any()
+        np.testing.assert_array_equal(snapped.snapped, snapped.found & ~contained.found)
+        np.testing.assert_array_equal(np.column_stack([snapped.x_index, snapped.y_index]), expected)
+        rows, cols = snapped.raster_cells(metadata.ny)
+        np.testing.assert_array_equal(rows[snapped.found], metadata.ny - 1 - snapped.y_index[snapped.found])
+        assert np.all(rows[~snapped.found] == -1) and np.all(cols[~snapped.found] == -1)
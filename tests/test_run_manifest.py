@@ -0,0 +1,76 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+"""処理結果の記録（run_manifest_dir）による再実行時の処理の省略"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.file_io.run_manifest import RunManifest
+from .helpers import run, write_case, write_config
+
+@pytest.fixture
+def rerun(tmp_path, monkeypatch, capsys):
+    """処理結果を記録する設定で全地点を処理し、標準出力を返す関数"""
+    paths = write_case(tmp_path)
+    config_path = write_config(tmp_path, paths, file_paths={
+        'response_cache_dir': 'log/response',
+        'run_manifest_dir': 'log/manifest',
+    })
+    monkeypatch.chdir(tmp_path)
+
+    def run_and_capture():
+        run(config_path)
+        return capsys.readouterr().out
+
+    return run_and_capture
+
+def test_rerun_skips_points_with_current_outputs(rerun, tmp_path):
+    rerun()
+    merged = pd.read_csv('out/flow_results.csv')
+    arrival_files = sorted(tmp_path.glob('log/flood_arrival_time_*.asc'))
+    assert len(arrival_files) == 3
+    arrival_contents = {path.name: path.read_bytes() for path in arrival_files}
+
+    assert "Skipping 3 of 3 points" in rerun()
+    pd.testing.assert_frame_equal(pd.read_csv('out/flow_results.csv'), merged)
+
+    # 出力ファイルが削除された地点のみ、保存済みの流域応答から再出力する
+    arrival_files[0].unlink()
+    out = rerun()
+    assert "Skipping 2 of 3 points" in out
+    assert out.count("Using stored basin response") == 1
+    assert {path.name: path.read_bytes() for path in tmp_path.glob('log/flood_arrival_time_*.asc')} \
+        == arrival_contents
+    pd.testing.assert_frame_equal(pd.read_csv('out/flow_results.csv'), merged)
+
+def test_unreadable_flows_are_reprocessed(rerun, tmp_path):
+    rerun()
+    merged = pd.read_csv('out/flow_results.csv')
+    manifest = RunManifest('log/manifest')
+    point_id = int(pd.read_csv(tmp_path / 'data' / 'analysis_points.csv')['target_linkid'][0])
+    with open(manifest.flows_path(point_id), 'wb') as f:
+        f.write(b'truncated')
+
+    out = rerun()
+    assert "Skipping 2 of 3 points" in out
+    assert f"recorded flows for point {float(point_id)} could not be read" in out
+    # 再処理した地点もマージ結果に含まれ、流量は再び記録される
+    pd.testing.assert_frame_equal(pd.read_csv('out/flow_results.csv'), merged)
+    assert manifest.load_flows(point_id) is not None
+    assert "Skipping 3 of 3 points" in rerun()
+
+def test_manifest_requires_every_expected_output(tmp_path):
+    manifest = RunManifest(str(tmp_path / 'manifest'))
+    written = tmp_path / 'flow.csv'
+    written.write_text('0,0\n')
+    manifest.record(1, 'key', {}, {'flow': str(written), 'timedelay': str(tmp_path / 'missing.asc')}, np.zeros(3))
+    assert not manifest.is_current(1, 'key')
+
+    manifest.record(1, 'key', {}, {'flow': str(written)}, np.zeros(3))
+    assert manifest.is_current(1, 'key')
+    assert not manifest.is_current(1, 'other')
+    written.write_text('0,1\n')
+    assert not manifest.is_current(1, 'key')
@@ -0,0 +1,72 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+"""雨量ファイルを逐次処理する場合（rainfall_streaming）の流量の出力とマージ"""
+
+import numpy as np
+import pytest
+from src.file_io.binary_output import (count_flow_values, iter_flow_chunks, read_flow_npz, write_flow_csv,
+                                       write_flow_stream)
+from src.main import merge_flow_files, merge_flow_results
+from .helpers import DTQ, run, write_case, write_config
+
+def _flow_results(n_values):
+    """(時刻, 流量) を1つずつ生成する（配列は作らない）"""
+    for k in range(n_values):
+        yield k * DTQ, np.sin(k / 7.0) ** 2 * 3.0
+
+@pytest.mark.parametrize('suffix', ['.csv', '.npz'])
+def test_write_flow_stream_reads_back_in_chunks(tmp_path, suffix):
+    output_file = str(tmp_path / f'flow{suffix}')
+    assert write_flow_stream(_flow_results(1000), output_file) == 1000
+    assert count_flow_values(output_file) == 1000
+
+    expected = np.array([flow for _, flow in _flow_results(1000)])
+    chunks = list(iter_flow_chunks(output_file, chunk_size=300))
+    assert [len(chunk) for chunk in chunks] == [300, 300, 300, 100]
+    if suffix == '.npz':
+        times, flows = read_flow_npz(output_file)
+        np.testing.assert_array_equal(times, np.arange(1000) * DTQ)
+        np.testing.assert_array_equal(flows, expected)
+        np.testing.assert_array_equal(np.concatenate(chunks), expected)
+    else:
+        reference = str(tmp_path / 'reference.csv')
+        write_flow_csv(np.arange(1000) * DTQ, expected, reference)
+        assert open(output_file).read() == open(reference).read()
+        np.testing.assert_allclose(np.concatenate(chunks), expected, atol=5e-7)
+
+@pytest.mark.parametrize('output_format', ['csv', 'npz'])
+def test_merge_flow_files_matches_in_memory_merge(tmp_path, output_format, monkeypatch):
+    suffix = '.csv' if output_format == 'csv' else '.npz'
+    hydrographs = [(101, np.linspace(0.0, 2.0, 50)), (102.0, np.linspace(5.0, 1.0, 80))]
+    flow_files = []
+    for link_id, flows in hydrographs:
+        path = str(tmp_path / f'flow_{int(link_id)}{suffix}')
+        write_flow_stream(((k * DTQ, flow) for k, flow in enumerate(flows)), path)
+        flow_files.append((link_id, path))
+
+    # 出力を複数の区間に分ける
+    monkeypatch.setattr('src.main.MERGE_CHUNK_VALUES', 30)
+    merge_flow_files(flow_files, str(tmp_path / 'streamed.csv'), DTQ, output_format)
+    merge_flow_results(hydrographs, str(tmp_path / 'batch.csv'), DTQ, output_format)
+    if output_format == 'csv':
+        assert (tmp_path / 'streamed.csv').read_text() == (tmp_path / 'batch.csv').read_text()
+    else:
+        with np.load(tmp_path / 'streamed.npz') as streamed, np.load(tmp_path / 'batch.npz') as batch:
+            for key in ('time', 'flow', 'columns'):
+                np.testing.assert_array_equal(streamed[key], batch[key])
+
+@pytest.mark.parametrize('output_format', ['csv', 'npz'])
+def test_streaming_pipeline_matches_batch(tmp_path, monkeypatch, output_format):
+    paths = write_case(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    merged_file = 'out/flow_results.csv' if output_format == 'csv' else 'out/flow_results.npz'
+    outputs = {}
+    for streaming in (False, True):
+        run(write_config(tmp_path, paths, parameters={
+            'rainfall_streaming': streaming, 'output_format': output_format
+        }))
+        outputs[streaming] = (tmp_path / merged_file).read_bytes()
+    assert outputs[True] == outputs[False]
@@ -0,0 +1,83 @@
+# Copyright (c) 2024 yama-k-0129
+#
+# This software is released under the MIT License.
+# see https://opensource.org/licenses/MIT
+
+"""解析地点ごとの作業ディレクトリ（PointWorkspace）からの出力の公開"""
+
+import os
+import pytest
+from src.file_io.workspace import PointWorkspace
+from .helpers import run, write_case, write_config
+
+@pytest.fixture
+def outputs(tmp_path):
+    return {
+        'flow': str(tmp_path / 'out' / 'flow_7.csv'),
+        'timedelay': str(tmp_path / 'log' / 'arrival' / 'flood_arrival_time_7.asc'),
+    }
+
+def test_publish_moves_every_output(tmp_path, outputs):
+    os.makedirs(tmp_path / 'out')
+    with open(outputs['flow'], 'w') as f:
+        f.write('old\n')
+    with PointWorkspace(7.0, outputs, scratch_root=str(tmp_path / 'work')) as workspace:
+        scratch_dir = workspace.scratch_dir
+        assert scratch_dir.parent == tmp_path / 'work'
+        for key in outputs:
+            with open(workspace.path(key), 'w') as f:
+                f.write(f'{key}\n')
+        # 公開するまでは出力先を変更しない
+        assert open(outputs['flow']).read() == 'old\n'
+        assert not os.path.exists(outputs['timedelay'])
+        workspace.publish()
+        assert not any(scratch_dir.iterdir())
+    assert not scratch_dir.exists()
+    for key, path in outputs.items():
+        assert open(path).read() == f'{key}\n'
+
+def test_publish_requires_every_output(tmp_path, outputs):
+    with PointWorkspace(7, outputs, scratch_root=str(tmp_path / 'work')) as workspace:
+        with open(workspace.path('flow'), 'w') as f:
+            f.write('flow\n')
+        with pytest.raises(RuntimeError, match='timedelay'):
+            workspace.publish()
+        # 一部のみの公開はしない
+        assert not os.path.exists(outputs['flow'])
+        workspace.publish(['flow'])
+        assert os.path.exists(outputs['flow'])
+    assert not any((tmp_path / 'work').iterdir())
+
+def test_publish_copies_across_file_systems(tmp_path, outputs, monkeypatch):
+    replace = os.replace
+
+    def cross_device_replace(src, dst):
+        if 'work' in str(src):
+            raise OSError('cross-device link')
+        replace(src, dst)
+
+    monkeypatch.setattr(os, 'replace', cross_device_replace)
+    with PointWorkspace(7, outputs, scratch_root=str(tmp_path / 'work')) as workspace:
+        for key in outputs:
+            with open(workspace.path(key), 'w') as f:
+                f.write(f'{key}\n')
+        workspace.publish()
+        assert not any(workspace.scratch_dir.iterdir())
+    for key, path in outputs.items():
+        assert open(path).read() == f'{key}\n'
+        assert not [name for name in os.listdir(os.path.dirname(path)) if name.endswith('.tmp')]
+
+def test_failed_point_leaves_no_partial_outputs(tmp_path, monkeypatch):
+    paths = write_case(tmp_path)
+    monkeypatch.chdir(tmp_path)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('interrupted')
+
+    # 到達時間の出力後、流量の計算中に中断する
+    monkeypatch.setattr('src.main.calculate_and_export_flows', fail)
+    with pytest.raises(RuntimeError, match='interrupted'):
+        run(write_config(tmp_path, paths))
+    assert not list(tmp_path.glob('log/flood_arrival_time_*'))
+    assert not list(tmp_path.glob('out/*'))
+    assert not any((tmp_path / 'log' / 'work').iterdir())